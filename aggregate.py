@@ -0,0 +1,266 @@
+import argparse
+import datetime
+import logging
+import multiprocessing
+import os
+import sys
+from collections import OrderedDict
+
+import binary_datastore
+import datastore
+import export
+import sqlite_datastore
+import summary
+
+"""
+Combines the time tracked in several tracker files, e.g. one per member of a team, into per-task, per-week totals and
+weekly summaries, without a display.
+
+Each file is loaded and reduced to the time tracked against each of its subtasks in a separate worker process, so the
+files are read in parallel across the CPU cores, and only the reduced data is sent back to be merged. Tasks and subtasks
+with the same names in different files are treated as the same, and their time added together.
+
+The files may have different first dates. Merged weeks are numbered from the earliest first date, and each week of a
+file is placed in the merged week that it begins in, so files whose weeks begin on different days of the week are
+aligned to the nearest whole week.
+Run as:
+python aggregate.py <directory> [--processes N] [--first-week N] [--last-week N] [--csv <output file>]
+"""
+
+TRACKER_EXTENSIONS = ('.trk',) + binary_datastore.BINARY_EXTENSIONS + sqlite_datastore.SQLITE_EXTENSIONS
+
+
+def find_tracker_files(directory):
+    """
+    :param str directory: Directory to search. Subdirectories aren't searched.
+    :return list[str]: Tracker files in the directory, sorted by name.
+    """
+    return sorted(os.path.join(directory, filename) for filename in os.listdir(directory)
+                  if filename.lower().endswith(TRACKER_EXTENSIONS) and
+                  os.path.isfile(os.path.join(directory, filename)))
+
+
+def reduce_file(filename):
+    """
+    Loads a tracker file and reduces it to the time tracked against each subtask. Runs in a worker process.
+    The stored data is read directly from the file's datastore, without creating a tracker or its tasks.
+    :param str filename: Tracker file.
+    :return dict: {filename: <str>,
+                   first_date: <str>,  # YYYY-MM-DD
+                   tasks: [(task name, [(subtask name, estimate, {week_index: time tracked})])],  # In task order.
+                   error: <str>,  # Only if the file couldn't be read, in which case there are no tasks.
+                   }
+                   Only tasks and subtasks with time tracked are included.
+    """
+    logging.debug("Reducing tracker file: %s" % filename)
+    _datastore = None
+    tasks = []
+    try:
+        _datastore = export.open_datastore(filename)
+        first_date = _datastore.first_date
+        for task_name in _datastore.task_order:
+            raw_task = _datastore.get_raw_task(task_name)
+            first_week_id = raw_task['first_week_id']
+            subtasks = [(subtask_name, subtask_details.get('estimate', 0), {})
+                        for subtask_name, subtask_details in raw_task['subtasks'].iteritems()]
+            for offset, values in enumerate(raw_task['weeks']):
+                for (_, _, weeks), hours in zip(subtasks, values):
+                    if hours:
+                        weeks[first_week_id + offset] = hours
+
+            subtasks = [subtask_tuple for subtask_tuple in subtasks if subtask_tuple[2]]
+            if subtasks:
+                tasks.append((task_name, subtasks))
+    except (IOError, OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        # A file that can't be opened, or a malformed task in it, skips only that file.
+        logging.error("Couldn't read %s: %s" % (filename, e))
+        return {'filename': filename, 'error': str(e), 'tasks': []}
+    finally:
+        # The binary and SQLite datastores hold the file open.
+        if hasattr(_datastore, 'close'):
+            _datastore.close()
+
+    return {'filename': filename,
+            'first_date': first_date.strftime("%Y-%m-%d"),
+            'tasks': tasks}
+
+
+class Aggregate(object):
+    """
+    Time tracked in several tracker files, merged. Add each file's reduced data with add_file, in the order the files
+    should appear in; tasks and subtasks are kept in the order they are first seen.
+    """
+    def __init__(self, first_date):
+        """
+        :param datetime.datetime first_date: Date of the first merged week. Must be no later than any file's first date.
+        :return:
+        """
+        self.first_date = first_date
+        # {task name: {subtask name: [estimate, {week_index: time tracked}]}}, in the order first seen.
+        self.tasks = OrderedDict()
+        self.filenames = []  # Files merged.
+        self.errors = {}  # {filename: error}, for files that couldn't be read.
+        self.week_index = 0  # Number of merged weeks up to and including the latest with time tracked.
+
+    def get_week_offset(self, first_date):
+        """
+        :param datetime.datetime first_date: First date of a file.
+        :return int: Merged week index of the file's first week.
+        """
+        return (first_date - self.first_date).days // 7
+
+    def add_file(self, result):
+        """
+        Adds the time tracked in a file.
+        :param dict result: File's reduced data, from reduce_file.
+        """
+        if 'error' in result:
+            self.errors[result['filename']] = result['error']
+            return
+        self.filenames.append(result['filename'])
+
+        offset = self.get_week_offset(datetime.datetime.strptime(result['first_date'], "%Y-%m-%d"))
+        for task_name, subtasks in result['tasks']:
+            merged_subtasks = self.tasks.setdefault(task_name, OrderedDict())
+            for subtask_name, estimate, weeks in subtasks:
+                merged = merged_subtasks.get(subtask_name)
+                if merged is None:
+                    merged = merged_subtasks[subtask_name] = [0, {}]
+                # Each person's estimate is for their share of the work, so the estimates add up too.
+                merged[0] += estimate
+                merged_weeks = merged[1]
+                for week_index, hours in weeks.iteritems():
+                    merged_weeks[week_index + offset] = merged_weeks.get(week_index + offset, 0) + hours
+                    self.week_index = max(self.week_index, week_index + offset + 1)
+
+    def get_week_name(self, week_index):
+        """
+        :param int week_index: Merged week index.
+        :return str: Date the week begins, in the same form as tracker.Tracker.get_week_name.
+        """
+        return (self.first_date + datetime.timedelta(days=7 * week_index)).strftime("%d %b")
+
+    def get_week_totals(self, task_name):
+        """
+        :param str task_name:
+        :return dict: {week_index: time tracked}, for the weeks with time tracked against the task.
+        """
+        totals = {}
+        for estimate, weeks in self.tasks[task_name].itervalues():
+            for week_index, hours in weeks.iteritems():
+                totals[week_index] = totals.get(week_index, 0) + hours
+        return totals
+
+    def iter_rows(self, first_week=None, last_week=None):
+        """
+        Generates the merged time tracked as rows, in the same form as export.iter_rows, e.g. for export.write_csv.
+        :param int first_week: Index of the first merged week. Defaults to the first week.
+        :param int last_week: Index of the last merged week, inclusive. Defaults to the latest week.
+        :return: Generator of (task name, subtask name, week index, week date, hours, estimate) tuples.
+        """
+        if first_week is None:
+            first_week = 0
+        if last_week is None:
+            last_week = self.week_index - 1
+        for task_name, subtasks in self.tasks.iteritems():
+            for subtask_name, (estimate, weeks) in subtasks.iteritems():
+                for week_index in sorted(weeks):
+                    if first_week <= week_index <= last_week:
+                        yield (task_name, subtask_name, week_index, self.get_week_name(week_index), weeks[week_index],
+                               estimate)
+
+    def get_summary(self, first_week_index, last_week_index):
+        """
+        :param int first_week_index: Index of the first merged week to summarise.
+        :param int last_week_index: Index of the last merged week to summarise, inclusive.
+        :return dict: Summary data, in the form described in summary.py.
+        """
+        tasks = []
+        for task_name, subtasks in self.tasks.iteritems():
+            subtask_times = [[subtask_name, sum(hours for week_index, hours in weeks.iteritems()
+                                                if first_week_index <= week_index <= last_week_index)]
+                             for subtask_name, (estimate, weeks) in subtasks.iteritems()]
+            total = sum(time_spent for _, time_spent in subtask_times)
+            if total > 0:
+                tasks.append({'name': task_name, 'total': total, 'subtasks': subtask_times})
+
+        return {'week_index': first_week_index,
+                'last_week_index': last_week_index,
+                'week_name': self.get_week_name(first_week_index),
+                'last_week_name': self.get_week_name(last_week_index),
+                'total': sum(task_summary['total'] for task_summary in tasks),
+                'tasks': tasks}
+
+    def get_summary_text(self, first_week_index, last_week_index):
+        """
+        :param int first_week_index:
+        :param int last_week_index:
+        :return str: Formatted summary of the tasks with time tracked in any of the weeks.
+        """
+        return ''.join(summary.iter_summary_text(self.get_summary(first_week_index, last_week_index)))
+
+
+def aggregate(filenames, processes=None):
+    """
+    Loads and merges tracker files, in parallel.
+    :param list[str] filenames: Tracker files, in the order their tasks should appear in.
+    :param int processes: Number of worker processes. Defaults to the number of CPU cores. With 1, the files are read
+        in this process instead.
+    :return Aggregate:
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(min(processes, len(filenames)), 1)
+    logging.debug("Aggregating %d tracker files with %d processes" % (len(filenames), processes))
+
+    if processes == 1:
+        results = [reduce_file(filename) for filename in filenames]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            # Ordered, so that the merged tasks and the sums are the same however many processes are used.
+            results = pool.map(reduce_file, filenames, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    first_dates = [datetime.datetime.strptime(result['first_date'], "%Y-%m-%d")
+                   for result in results if 'error' not in result]
+    _aggregate = Aggregate(min(first_dates) if first_dates else
+                           datetime.datetime.combine(datetime.date.today(), datetime.time()))
+    for result in results:
+        _aggregate.add_file(result)
+    return _aggregate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Combine the time tracked in a directory of tracker files.")
+    parser.add_argument('directory', help="Directory of tracker files (.trk, .trkb, .db).")
+    parser.add_argument('--processes', type=int, help="Number of worker processes. Defaults to the number of cores.")
+    parser.add_argument('--first-week', type=int, help="Index of the first merged week to summarise.")
+    parser.add_argument('--last-week', type=int, help="Index of the last merged week to summarise.")
+    parser.add_argument('--csv', help="Also write the merged time tracked to this CSV file.")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        parser.error("%s is not a directory" % args.directory)
+    filenames = find_tracker_files(args.directory)
+    if not filenames:
+        parser.error("No tracker files in %s" % args.directory)
+
+    _aggregate = aggregate(filenames, args.processes)
+    for filename, error in sorted(_aggregate.errors.iteritems()):
+        print >> sys.stderr, "Skipped %s: %s" % (filename, error)
+
+    last_week = args.last_week if args.last_week is not None else _aggregate.week_index - 1
+    first_week = args.first_week if args.first_week is not None else last_week
+    for week_index in range(max(first_week, 0), last_week + 1):
+        print export.encode(_aggregate.get_summary_text(week_index, week_index))
+
+    if args.csv:
+        with datastore.open_atomically(args.csv) as output_file:
+            export.write_csv(_aggregate.iter_rows(), output_file)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
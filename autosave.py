@@ -0,0 +1,137 @@
+import logging
+import Queue
+import threading
+import time
+
+
+class AutoSaver(object):
+    """
+    Saves a tracker in the background whenever it changes.
+    A Tk timer checks the tracker's change count. Once changes have stopped for DELAY_MS (or have carried on for
+    MAX_DELAY_MS), the datastore captures what needs saving on the Tk thread, and a worker thread writes it. Only one
+    write is in flight at a time, so a burst of edits made while writing is coalesced into the next save.
+    """
+    CHECK_INTERVAL_MS = 250
+    DELAY_MS = 2000  # Time to wait after the last change before saving.
+    MAX_DELAY_MS = 15000  # Longest time to leave changes unsaved while edits carry on.
+
+    def __init__(self, tracker, tkinter_root):
+        """
+        :param tracker.Tracker tracker: Tracker to save.
+        :param Tkinter.Tk tkinter_root: Root display object, used to schedule the checks on the Tk thread.
+        :return:
+        """
+        self.tracker = tracker
+        self.tkinter_root = tkinter_root
+        self.after_id = None
+
+        self.saved_change_count = tracker.change_count  # Change count when the last save was captured.
+        self.seen_change_count = tracker.change_count  # Change count when the last check was made.
+        self.first_change_time = None  # When the first unsaved change was seen.
+        self.last_change_time = None  # When the latest unsaved change was seen.
+        self.retry = False  # Set by the worker if a write fails, so that it is tried again.
+
+        self.write_queue = Queue.Queue()
+        self.writing = threading.Event()
+        self.worker = threading.Thread(target=self.run_worker, name="autosave")
+        self.worker.daemon = True
+
+        self.metrics = {'saves': 0,  # Number of saves captured.
+                        'failed_saves': 0,
+                        'coalesced_changes': 0,  # Number of changes saved by a save of a later change.
+                        'last_capture_ms': 0,  # Time spent capturing a save on the Tk thread.
+                        'max_capture_ms': 0,
+                        'last_write_ms': 0,  # Time spent writing a save on the worker thread.
+                        'max_write_ms': 0,
+                        'total_write_ms': 0}
+
+    def start(self):
+        """
+        Start checking for changes.
+        """
+        self.worker.start()
+        self.schedule_check()
+
+    def stop(self):
+        """
+        Stop checking for changes, and wait for any write in progress to finish. Doesn't save any unsaved changes, so
+        follow with a save of the tracker when closing.
+        """
+        if self.after_id is not None:
+            self.tkinter_root.after_cancel(self.after_id)
+            self.after_id = None
+        if self.worker.is_alive():
+            self.write_queue.put(None)
+            self.worker.join()
+
+    def schedule_check(self):
+        self.after_id = self.tkinter_root.after(self.CHECK_INTERVAL_MS, self.check)
+
+    def check(self):
+        """
+        Called on the Tk thread every CHECK_INTERVAL_MS. Saves if there are changes that are due to be saved.
+        """
+        now = time.time()
+        change_count = self.tracker.change_count
+        if change_count != self.seen_change_count:
+            self.seen_change_count = change_count
+            self.last_change_time = now
+            if self.first_change_time is None:
+                self.first_change_time = now
+
+        if self.retry and self.first_change_time is None:
+            self.first_change_time = self.last_change_time = now
+
+        # Don't save while loading in the background, since saving would wait for loading to finish.
+        if self.first_change_time is not None and not self.writing.is_set() and self.tracker.loader is None:
+            quiet_ms = (now - self.last_change_time) * 1000
+            waiting_ms = (now - self.first_change_time) * 1000
+            if quiet_ms >= self.DELAY_MS or waiting_ms >= self.MAX_DELAY_MS:
+                self.save()
+
+        self.schedule_check()
+
+    def save(self):
+        """
+        Capture the tracker's changes on this (the Tk) thread, and hand them to the worker to write.
+        """
+        start_time = time.time()
+        write = self.tracker.datastore.prepare_save(self.tracker)
+        capture_ms = (time.time() - start_time) * 1000
+
+        change_count = self.tracker.change_count
+        self.metrics['saves'] += 1
+        self.metrics['coalesced_changes'] += max(change_count - self.saved_change_count - 1, 0)
+        self.metrics['last_capture_ms'] = capture_ms
+        self.metrics['max_capture_ms'] = max(self.metrics['max_capture_ms'], capture_ms)
+        self.saved_change_count = self.seen_change_count = change_count
+        self.first_change_time = self.last_change_time = None
+        self.retry = False
+
+        self.writing.set()
+        self.write_queue.put(write)
+
+    def run_worker(self):
+        """
+        Runs on the worker thread, writing each save that is handed over until stopped.
+        """
+        while True:
+            write = self.write_queue.get()
+            if write is None:
+                return
+
+            start_time = time.time()
+            try:
+                write()
+            except Exception:
+                logging.exception("Autosave failed, will try again")
+                self.metrics['failed_saves'] += 1
+                self.retry = True
+            write_ms = (time.time() - start_time) * 1000
+
+            self.metrics['last_write_ms'] = write_ms
+            self.metrics['max_write_ms'] = max(self.metrics['max_write_ms'], write_ms)
+            self.metrics['total_write_ms'] += write_ms
+            logging.debug("Autosaved in %.1fms (%.1fms capturing). Metrics: %s" %
+                          (write_ms, self.metrics['last_capture_ms'], self.metrics))
+            self.writing.clear()
@@ -0,0 +1,126 @@
+import logging
+import Queue
+import threading
+import time
+
+
+# Messages passed from the worker thread to the Tk thread.
+DETAILS = 'details'  # (highest week ID, first date, archived week index, number of tasks)
+TASK = 'task'  # Task (or proxy) ready to be added to the tracker.
+ERROR = 'error'  # Exception raised by the worker.
+DONE = 'done'
+
+
+class BackgroundLoader(object):
+    """
+    Loads a tracker from its datastore without holding up the UI.
+    A worker thread reads the file and creates the tasks, passing each one over as it is ready. A Tk timer adds them to
+    the tracker in batches, so the display fills in progressively and rows that have been loaded can be used straight
+    away. The datastore is used by the worker until loading finishes, so the tracker mustn't be saved until then; see
+    finish.
+    """
+    POLL_INTERVAL_MS = 20
+    BATCH_MS = 30  # Longest time to spend adding tasks on the Tk thread before giving the UI a turn.
+
+    def __init__(self, tracker, tkinter_root, on_progress=None):
+        """
+        :param tracker.Tracker tracker: Tracker to load. Should be empty, e.g. just reinitialised.
+        :param Tkinter.Tk tkinter_root: Root display object, used to schedule adding tasks on the Tk thread.
+        :param on_progress: Called on the Tk thread after each batch of tasks is added, with the number of tasks loaded,
+            the total number of tasks (None until known), and whether loading has finished.
+        :return:
+        """
+        self.tracker = tracker
+        self.tkinter_root = tkinter_root
+        self.on_progress = on_progress
+        self.after_id = None
+
+        self.loaded_count = 0
+        self.task_count = None
+        self.finished = False
+
+        self.queue = Queue.Queue()
+        self.worker = threading.Thread(target=self.run_worker, name="background load")
+        self.worker.daemon = True
+
+    def start(self):
+        """
+        Start loading.
+        """
+        self.worker.start()
+        self.after_id = self.tkinter_root.after(self.POLL_INTERVAL_MS, self.poll)
+
+    def run_worker(self):
+        """
+        Runs on the worker thread. Reads the datastore's file and creates each task in order.
+        """
+        _datastore = self.tracker.datastore
+        try:
+            _datastore.load_from_file()
+            task_order = list(_datastore.task_order)
+            self.queue.put((DETAILS, (_datastore.get_highest_week_id(),
+                                      _datastore.first_date,
+                                      _datastore.archived_week_index,
+                                      len(task_order))))
+            for task_name in task_order:
+                self.queue.put((TASK, self.tracker.create_stored_task(task_name)))
+        except Exception as e:
+            logging.exception("Loading failed")
+            self.queue.put((ERROR, e))
+        self.queue.put((DONE, None))
+
+    def poll(self):
+        """
+        Called on the Tk thread every POLL_INTERVAL_MS. Adds the tasks that are ready, for up to BATCH_MS.
+        """
+        self.after_id = None
+        end_time = time.time() + self.BATCH_MS / 1000.0
+        while not self.finished and time.time() < end_time:
+            try:
+                message = self.queue.get_nowait()
+            except Queue.Empty:
+                break
+            self.apply(*message)
+
+        if not self.finished:
+            self.after_id = self.tkinter_root.after(self.POLL_INTERVAL_MS, self.poll)
+        self.report_progress()
+
+    def finish(self):
+        """
+        Block until loading has finished, adding all of the remaining tasks. Must be called on the Tk thread.
+        """
+        if self.after_id is not None:
+            self.tkinter_root.after_cancel(self.after_id)
+            self.after_id = None
+        while not self.finished:
+            self.apply(*self.queue.get())
+        self.report_progress()
+
+    def apply(self, kind, value):
+        """
+        Apply a message from the worker to the tracker.
+        :param str kind: One of the message kinds at the top of this file.
+        :param value: Details of the message.
+        """
+        if kind == DETAILS:
+            highest_week_id, first_date, archived_week_index, self.task_count = value
+            self.tracker.restore_details(highest_week_id, first_date, archived_week_index)
+        elif kind == TASK:
+            self.tracker._handle_new_task(value)
+            self.loaded_count += 1
+        elif kind == DONE:
+            self.finished = True
+            self.tracker.loader = None
+            logging.debug("Finished loading %d tasks" % self.loaded_count)
+        elif kind == ERROR:
+            # The traceback has already been logged by the worker. Raising it here reports it in the UI, as loading
+            # on the Tk thread would have.
+            self.finished = True
+            self.tracker.loader = None
+            self.report_progress()
+            raise value
+
+    def report_progress(self):
+        if self.on_progress is not None:
+            self.on_progress(self.loaded_count, self.task_count, self.finished)
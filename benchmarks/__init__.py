@@ -0,0 +1,4 @@
+"""
+Benchmarks for the tracker. Run each one as a module from the top level of the repository, e.g.
+python -m benchmarks.week_lookup
+"""
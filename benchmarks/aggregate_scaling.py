@@ -0,0 +1,56 @@
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import aggregate
+from benchmarks import generate
+
+"""
+Measures how aggregate.py scales with the number of worker processes, on a directory of synthetic tracker files, e.g.
+one per member of a large team. The speedup can't be more than the number of CPU cores, so run on a machine with at
+least as many cores as the largest number of processes. Run as:
+python -m benchmarks.aggregate_scaling [files] [tasks per file] [weeks per file]
+"""
+
+FILES = 32
+TASKS = 300
+WEEKS = 150
+PROCESSES = (1, 2, 4, 8)
+
+
+def main(number_of_files=FILES, number_of_tasks=TASKS, number_of_weeks=WEEKS, repeats=3):
+    directory = tempfile.mkdtemp()
+    try:
+        for file_index in range(number_of_files):
+            generate.write_tracker_file(os.path.join(directory, "member%d.trk" % file_index),
+                                        tasks=number_of_tasks, weeks=number_of_weeks, seed=file_index)
+        filenames = aggregate.find_tracker_files(directory)
+        print "%d files of %d tasks x %d weeks, %d CPU cores, best of %d" % (
+            number_of_files, number_of_tasks, number_of_weeks, multiprocessing.cpu_count(), repeats)
+
+        expected_rows = None
+        single_process_time = None
+        for processes in PROCESSES:
+            times = []
+            for _ in range(repeats):
+                start_time = time.time()
+                _aggregate = aggregate.aggregate(filenames, processes)
+                times.append(time.time() - start_time)
+            rows = list(_aggregate.iter_rows())
+            if expected_rows is None:
+                expected_rows = rows
+            assert rows == expected_rows, "Results differ with %d processes" % processes
+
+            best_time = min(times)
+            if single_process_time is None:
+                single_process_time = best_time
+            print "%d processes: %7.2fs, speedup %4.2fx" % (processes, best_time, single_process_time / best_time)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
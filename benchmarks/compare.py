@@ -0,0 +1,60 @@
+import argparse
+import json
+import sys
+
+"""
+Compares two sets of results from benchmarks.run, and reports any that have slowed down.
+Run as:
+python -m benchmarks.compare <baseline.json> <new.json> [--threshold 1.2]
+Exits with a non-zero status if any benchmark is slower than the baseline by more than the threshold.
+"""
+
+
+def compare(baseline, new, threshold):
+    """
+    Compares the best times of two sets of results.
+    :param dict baseline: Results from benchmarks.run.
+    :param dict new: Results from benchmarks.run.
+    :param float threshold: Ratio of new to baseline time above which a benchmark counts as a regression.
+    :return list[str]: Names of the benchmarks that have regressed.
+    """
+    if baseline['parameters'] != new['parameters']:
+        print "Warning: the results were generated with different parameters."
+
+    regressions = []
+    for name in sorted(set(baseline['results']) | set(new['results'])):
+        if name not in baseline['results'] or name not in new['results']:
+            print "%-40s only in one set of results" % name
+            continue
+
+        old_ms = baseline['results'][name]['best_ms']
+        new_ms = new['results'][name]['best_ms']
+        ratio = new_ms / old_ms if old_ms else float('inf') if new_ms else 1.0
+        flag = ""
+        if ratio > threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        print "%-40s %10.2fms %10.2fms %6.2fx %s" % (name, old_ms, new_ms, ratio, flag)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two sets of benchmark results.")
+    parser.add_argument('baseline')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=1.2)
+    args = parser.parse_args()
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    with open(args.new) as new_file:
+        new = json.load(new_file)
+
+    if compare(baseline, new, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import argparse
+import datetime
+import json
+import random
+
+"""
+Generates synthetic tracker files, in the .trk format described in datastore.py, for benchmarking.
+Run as:
+python -m benchmarks.generate <filename> [--tasks N] [--subtasks N] [--weeks N] [--sparsity F] [--archived F]
+"""
+
+DEFAULTS = {'tasks': 300,
+            'subtasks': 5,
+            'weeks': 150,
+            'sparsity': 0.7,
+            'archived': 0.5,
+            'seed': 0}
+
+
+def generate_raw_data(tasks=DEFAULTS['tasks'], subtasks=DEFAULTS['subtasks'], weeks=DEFAULTS['weeks'],
+                      sparsity=DEFAULTS['sparsity'], archived=DEFAULTS['archived'], seed=DEFAULTS['seed']):
+    """
+    Generates the raw data for a synthetic tracker.
+    Each task starts in a random week and runs until the latest week. Subtasks are added part way through a task's
+    life, so earlier weeks have fewer values, as they do in real files.
+    :param int tasks: Number of tasks.
+    :param int subtasks: Number of subtasks per task.
+    :param int weeks: Number of weeks in the tracker.
+    :param float sparsity: Fraction of cells that have no time tracked.
+    :param float archived: Fraction of tasks that are archived.
+    :param int seed: Random seed, so the same parameters always give the same data.
+    :return dict: Raw data, as stored by datastore.DataStore.
+    """
+    rng = random.Random(seed)
+
+    raw_tasks = {}
+    task_order = []
+    for task_id in range(tasks):
+        task_name = "Task %d" % task_id
+        first_week_id = rng.randrange(weeks)
+        task_weeks = weeks - first_week_id
+
+        # The week in which each subtask was added, relative to the start of the task.
+        subtask_starts = sorted(rng.randrange(max(task_weeks // 2, 1)) for _ in range(subtasks))
+
+        raw_weeks = []
+        for offset in range(task_weeks):
+            width = sum(1 for start in subtask_starts if start <= offset)
+            raw_weeks.append([0 if rng.random() < sparsity else rng.randint(1, 16) * 0.25 for _ in range(width)])
+
+        raw_tasks[task_name] = {'weeks': raw_weeks,
+                                'first_week_id': first_week_id,
+                                'subtasks': dict(("Subtask %d" % i, {'estimate': rng.randint(0, 40)})
+                                                 for i in range(subtasks)),
+                                'archived': rng.random() < archived}
+        task_order.append(task_name)
+
+    first_date = datetime.date(2015, 1, 5) + datetime.timedelta(days=rng.randrange(7))
+    return {'tasks': raw_tasks,
+            'task_order': task_order,
+            'first_date': first_date.strftime("%Y-%m-%d"),
+            'archived_week_index': max(weeks - 12, 0)}
+
+
+def write_tracker_file(filename, **parameters):
+    """
+    Writes a synthetic tracker file.
+    :param str filename: File to write.
+    :param parameters: Parameters for generate_raw_data.
+    """
+    with open(filename, 'w') as tracker_file:
+        json.dump(generate_raw_data(**parameters), tracker_file)
+
+
+def add_arguments(parser):
+    """
+    Adds the generator parameters to an argument parser.
+    :param argparse.ArgumentParser parser:
+    """
+    parser.add_argument('--tasks', type=int, default=DEFAULTS['tasks'])
+    parser.add_argument('--subtasks', type=int, default=DEFAULTS['subtasks'])
+    parser.add_argument('--weeks', type=int, default=DEFAULTS['weeks'])
+    parser.add_argument('--sparsity', type=float, default=DEFAULTS['sparsity'])
+    parser.add_argument('--archived', type=float, default=DEFAULTS['archived'])
+    parser.add_argument('--seed', type=int, default=DEFAULTS['seed'])
+
+
+def get_parameters(args):
+    """
+    Gets the generator parameters from parsed arguments.
+    :param argparse.Namespace args:
+    :return dict: Parameters for generate_raw_data.
+    """
+    return dict((name, getattr(args, name)) for name in DEFAULTS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic tracker file.")
+    parser.add_argument('filename')
+    add_arguments(parser)
+    args = parser.parse_args()
+    write_tracker_file(args.filename, **get_parameters(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import export
+import importer
+
+"""
+Measures the throughput of importer.py on a synthetic CSV file, by default of a million rows: every subtask of every
+task, for every week, in a random order so that rows for a task arrive spread across the whole file. Run as:
+python -m benchmarks.import_throughput [rows] [tasks] [subtasks]
+"""
+
+ROWS = 1000000
+TASKS = 200
+SUBTASKS = 5
+
+
+def write_csv(filename, number_of_rows, number_of_tasks, number_of_subtasks):
+    """
+    :param str filename: CSV file to write.
+    :param int number_of_rows: Rows to write. Rounded up to a whole number of weeks.
+    :param int number_of_tasks:
+    :param int number_of_subtasks: Subtasks in each task.
+    :return int: Rows written.
+    """
+    number_of_weeks = -(-number_of_rows // (number_of_tasks * number_of_subtasks))
+    entries = [(task_index, subtask_index) for task_index in range(number_of_tasks)
+               for subtask_index in range(number_of_subtasks)]
+    count = 0
+    with open(filename, 'wb') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(('task', 'subtask', 'week_index', 'hours'))
+        for week_index in range(number_of_weeks):
+            random.shuffle(entries)
+            for task_index, subtask_index in entries:
+                writer.writerow(("Task %d" % task_index, "Subtask %d" % subtask_index, week_index,
+                                 random.choice((0.5, 1, 1.5, 2))))
+                count += 1
+    return count
+
+
+def main(number_of_rows=ROWS, number_of_tasks=TASKS, number_of_subtasks=SUBTASKS):
+    random.seed(0)
+    directory = tempfile.mkdtemp()
+    try:
+        csv_filename = os.path.join(directory, "import.csv")
+        count = write_csv(csv_filename, number_of_rows, number_of_tasks, number_of_subtasks)
+        print "%d rows, %d tasks x %d subtasks" % (count, number_of_tasks, number_of_subtasks)
+
+        tracker = export.open_tracker(os.path.join(directory, "import.trk"))
+        report = importer.import_csv(tracker, csv_filename)
+        assert report['rows'] == count and not report['rejected_rows']
+        print "Import:  %6.1fs, %8.0f rows/s" % (report['seconds'], report['rows_per_second'])
+
+        start_time = time.time()
+        tracker.save()
+        print "Save:    %6.1fs" % (time.time() - start_time)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import datastore
+import streaming_json
+import generate
+
+"""
+Measures peak memory (RSS) while loading and saving a large synthetic tracker file, comparing the streaming reader and
+writer in streaming_json with decoding and encoding the whole file as one string. Each measurement is made in a fresh
+interpreter, since peak RSS can't be reset. Run as:
+python -m benchmarks.memory [--size-mb 200] [--output results.json]
+Needs the resource module, so doesn't run on Windows.
+"""
+
+MODES = ('load_whole', 'load_streaming', 'save_whole', 'save_streaming')
+
+# Number of distinct tasks generated. The file is filled up to size by repeating these under new names, which is much
+# quicker than generating every task.
+TEMPLATE_TASKS = 200
+
+
+def write_large_tracker_file(filename, size_mb, weeks):
+    """
+    Writes a synthetic tracker file of at least the given size, a task at a time.
+    :param str filename: File to write.
+    :param int size_mb: Size of file to write, in megabytes.
+    :param int weeks: Number of weeks in the tracker.
+    :return int: Number of tasks written.
+    """
+    template = generate.generate_raw_data(tasks=TEMPLATE_TASKS, weeks=weeks)
+    template_tasks = [template['tasks'][task_name] for task_name in template['task_order']]
+
+    task_count = 0
+    with open(filename, 'w') as tracker_file:
+        tracker_file.write('{"tasks": {')
+        while tracker_file.tell() < size_mb * 1024 * 1024:
+            if task_count:
+                tracker_file.write(', ')
+            tracker_file.write(json.dumps("Task %d" % task_count) + ': ' +
+                               json.dumps(template_tasks[task_count % TEMPLATE_TASKS]))
+            task_count += 1
+        tracker_file.write('}, "task_order": ')
+        tracker_file.write(json.dumps(["Task %d" % i for i in range(task_count)]))
+        tracker_file.write(', "first_date": %s, "archived_week_index": %d}' %
+                           (json.dumps(template['first_date']), template['archived_week_index']))
+    return task_count
+
+
+def get_peak_rss_mb():
+    """
+    Gets the peak resident set size of this process so far.
+    :return float: Peak RSS in megabytes.
+    """
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak / (1024.0 * 1024)  # Bytes
+    return peak / 1024.0  # Kilobytes
+
+
+def measure(mode, filename):
+    """
+    Loads or saves a tracker file in this process, and reports how much the peak RSS rose.
+    Saving is measured on top of loading, so the rise is the memory needed by the save alone.
+    :param str mode: One of MODES.
+    :param str filename: Tracker file.
+    :return dict: Peak RSS before and after, in megabytes.
+    """
+    before = get_peak_rss_mb()
+    if mode == 'load_whole':
+        with open(filename, 'r') as tracker_file:
+            json.loads(''.join(tracker_file.readlines()))
+    elif mode == 'load_streaming':
+        with open(filename, 'r') as tracker_file:
+            streaming_json.load(tracker_file)
+    else:
+        raw_data = datastore.DataStore(filename).raw_data
+        before = get_peak_rss_mb()
+        with open(filename + '.saved', 'w') as tracker_file:
+            if mode == 'save_whole':
+                tracker_file.writelines(json.dumps(raw_data))
+            else:
+                streaming_json.dump(raw_data, tracker_file)
+        os.remove(filename + '.saved')
+
+    after = get_peak_rss_mb()
+    return {'peak_rss_before_mb': before, 'peak_rss_after_mb': after, 'peak_rss_increase_mb': after - before}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure peak memory while loading and saving a large tracker file.")
+    parser.add_argument('--size-mb', type=int, default=200)
+    parser.add_argument('--weeks', type=int, default=520)
+    parser.add_argument('--output', help="File to write the JSON results to. Printed if not given.")
+    # Used internally to make each measurement in a fresh interpreter.
+    parser.add_argument('--measure', nargs=2, metavar=('MODE', 'FILENAME'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        mode, filename = args.measure
+        print json.dumps(measure(mode, filename))
+        return
+
+    work_folder = tempfile.mkdtemp(prefix='tracker_memory')
+    filename = os.path.join(work_folder, 'tracker.trk')
+    try:
+        task_count = write_large_tracker_file(filename, args.size_mb, args.weeks)
+        results = {}
+        for mode in MODES:
+            output = subprocess.check_output([sys.executable, '-m', 'benchmarks.memory', '--measure', mode, filename])
+            results[mode] = json.loads(output)
+        report = {'parameters': {'size_mb': args.size_mb, 'weeks': args.weeks, 'tasks': task_count},
+                  'file_size_mb': os.path.getsize(filename) / (1024.0 * 1024),
+                  'results': results}
+    finally:
+        if os.path.exists(filename):
+            os.remove(filename)
+        os.rmdir(work_folder)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output)
+    else:
+        print output
+
+
+if __name__ == '__main__':
+    sys.exit(main())
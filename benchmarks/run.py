@@ -0,0 +1,300 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import binary_datastore
+import datastore
+import export
+import journal_datastore
+import migrate
+import sqlite_datastore
+import timematrix
+import tracker
+import weekslot
+import generate
+
+"""
+Times the main operations of the tracker against a synthetic tracker file, and prints the results as JSON.
+Run as:
+python -m benchmarks.run [--tasks N] [--weeks N] ... [--repeats N] [--output results.json]
+
+Display benchmarks are run if a display is available, e.g. under a virtual X server:
+xvfb-run python -m benchmarks.run
+Compare two sets of results with benchmarks.compare.
+"""
+
+
+def measure(function, repeats, setup=None):
+    """
+    Times a function.
+    :param function: Function to time. Called with the result of setup, if given.
+    :param int repeats: Number of times to call it.
+    :param setup: Function called (untimed) before each call to prepare its argument.
+    :return dict: Best and mean times in milliseconds.
+    """
+    times = []
+    for _ in range(repeats):
+        args = (setup(),) if setup is not None else ()
+        start_time = time.time()
+        function(*args)
+        times.append((time.time() - start_time) * 1000)
+    return {'best_ms': min(times), 'mean_ms': sum(times) / len(times), 'repeats': repeats}
+
+
+def edit_one_cell(_tracker):
+    """
+    Changes the latest week of the first displayed task, as a user typing into a single entry would.
+    :param tracker.Tracker _tracker:
+    :return task.Task: The task that was changed.
+    """
+    for task_name in _tracker.task_order:
+        _task = _tracker.tasks[task_name]
+        if not _task.archived and _task.weeks and _task.weeks[-1].width:
+            _week = _task.weeks[-1]
+            _week.update_values([_week.get_time_in_entry(0) + 0.25])
+            return _task
+
+
+def run_model_benchmarks(filename, work_folder, repeats):
+    """
+    Times loading, saving, summaries and aggregate queries.
+    :param str filename: Synthetic tracker file.
+    :param str work_folder: Folder to save copies of the tracker file in.
+    :param int repeats: Number of times to run each benchmark.
+    :return dict: {benchmark name: timings}
+    """
+    results = {}
+    loaded = datastore.DataStore(filename)
+    _tracker = tracker.Tracker(loaded)
+
+    results['datastore_load_from_file'] = measure(loaded.load_from_file, repeats)
+    results['tracker_load'] = measure(_tracker.load, repeats)
+
+    save_filename = os.path.join(work_folder, 'save.trk')
+    save_datastore = datastore.DataStore(save_filename)
+
+    def mark_all_dirty():
+        for _task in _tracker.tasks.itervalues():
+            _task.mark_dirty()
+        return _tracker
+
+    results['datastore_save_to_file_full'] = measure(save_datastore.save_to_file, repeats, mark_all_dirty)
+
+    def edit():
+        edit_one_cell(_tracker)
+        return _tracker
+
+    results['datastore_save_to_file_one_cell'] = measure(save_datastore.save_to_file, repeats, edit)
+    # The part of an autosave that blocks the UI; the write itself happens on a worker thread.
+    results['datastore_prepare_save_one_cell'] = measure(save_datastore.prepare_save, repeats, edit)
+
+    journal_filename = os.path.join(work_folder, 'journal.trk')
+    shutil.copy(filename, journal_filename)
+    journal = journal_datastore.JournalDataStore(journal_filename)
+    journal_tracker = tracker.Tracker(journal)
+
+    def journal_edit():
+        edit_one_cell(journal_tracker)
+        return journal_tracker
+
+    results['journal_save_to_file_one_cell'] = measure(journal.save_to_file, repeats, journal_edit)
+    # Checking for changes made elsewhere, done before every save, when there are none.
+    results['journal_merge_check'] = measure(lambda: journal.merge_changes_on_disk(journal_tracker), repeats)
+
+    # Another copy of the app saving the same cell in between each save, so that every save has a merge to do.
+    other = journal_datastore.JournalDataStore(journal_filename)
+    other_tracker = tracker.Tracker(other)
+
+    def journal_edit_both():
+        edit_one_cell(other_tracker)
+        other.save_to_file(other_tracker)
+        return journal_edit()
+
+    results['journal_save_to_file_merge_one_cell'] = measure(journal.save_to_file, repeats, journal_edit_both)
+    other.wait_for_compaction()
+    results['journal_prepare_save_one_cell'] = measure(journal.prepare_save, repeats, journal_edit)
+    journal.wait_for_compaction()
+
+    sqlite_filename = os.path.join(work_folder, 'tracker.db')
+    migrate.migrate(filename, sqlite_filename)
+    sqlite = sqlite_datastore.SqliteDataStore(sqlite_filename)
+    results['sqlite_tracker_load'] = measure(lambda: tracker.Tracker(sqlite), repeats)
+    sqlite_tracker = tracker.Tracker(sqlite)
+
+    def sqlite_edit():
+        edit_one_cell(sqlite_tracker)
+        return sqlite_tracker
+
+    results['sqlite_save_to_file_one_cell'] = measure(sqlite.save_to_file, repeats, sqlite_edit)
+    results['sqlite_get_week_totals'] = measure(sqlite.get_week_totals, repeats)
+    sqlite.close()
+
+    binary_filename = os.path.join(work_folder, 'tracker.trkb')
+    migrate.migrate(filename, binary_filename)
+    binary = binary_datastore.BinaryDataStore(binary_filename)
+    results['binary_datastore_load_from_file'] = measure(binary.load_from_file, repeats)
+    results['binary_tracker_load'] = measure(lambda: tracker.Tracker(binary), repeats)
+    binary_tracker = tracker.Tracker(binary)
+
+    def binary_edit():
+        edit_one_cell(binary_tracker)
+        return binary_tracker
+
+    results['binary_save_to_file_one_cell'] = measure(binary.save_to_file, repeats, binary_edit)
+    binary.close()
+
+    latest_week = _tracker.week_index - 1
+
+    def invalidate_summaries():
+        # Summaries are cached until the tracker changes, so pretend it has.
+        _tracker.change_count += 1
+
+    results['create_weekly_summary'] = measure(lambda _: _tracker.create_weekly_summary(latest_week), repeats,
+                                               invalidate_summaries)
+    results['create_weekly_summary_cached'] = measure(lambda: _tracker.create_weekly_summary(latest_week), repeats)
+    results['create_weekly_summary_all_weeks'] = measure(
+        lambda _: [_tracker.create_weekly_summary(week_index) for week_index in range(_tracker.week_index)], repeats,
+        invalidate_summaries)
+    results['create_range_summary_all_weeks'] = measure(
+        lambda _: _tracker.create_range_summary(0, latest_week), repeats, invalidate_summaries)
+
+    tasks = _tracker.tasks.values()
+    results['task_get_total_time_spent'] = measure(lambda: [t.get_total_time_spent() for t in tasks], repeats)
+    results['task_get_total_subtask_times'] = measure(lambda: [t.get_total_subtask_times() for t in tasks], repeats)
+    results['task_get_time_for_week'] = measure(
+        lambda: [t.get_time_for_week(w) for t in tasks for w in range(_tracker.week_index)], repeats)
+    results['tracker_get_week_total'] = measure(
+        lambda: [_tracker.get_week_total(w) for w in range(_tracker.week_index)], repeats)
+
+    results['export_csv'] = measure(lambda: export.export(_tracker, os.path.join(work_folder, 'export.csv')), repeats)
+    results['export_columnar'] = measure(lambda: export.export(_tracker, os.path.join(work_folder, 'export.trkc')),
+                                         repeats)
+
+    def edit_and_commit():
+        edit_one_cell(_tracker)
+        _tracker.update()
+
+    results['tracker_undo_one_cell'] = measure(lambda _: _tracker.undo(), repeats, edit_and_commit)
+    results['tracker_undo_add_week'] = measure(lambda _: _tracker.undo(), repeats, lambda: _tracker.add_week())
+
+    def fill_days():
+        # Track every day of every subtask in the latest week of each task, the worst case for the daily breakdown.
+        for _task in tasks:
+            if not _task.archived and _task.weeks:
+                _week = _task.weeks[-1]
+                for column in range(_week.width):
+                    for day in range(weekslot.DAYS_PER_WEEK):
+                        _week.set_time_for_day(column, day, 0.5)
+
+    results['weekslot_set_time_for_day_latest_weeks'] = measure(fill_days, repeats)
+
+    return results
+
+
+def run_display_benchmarks(filename, repeats):
+    """
+    Times building and updating the display. Needs a display, e.g. a virtual X server.
+    :param str filename: Synthetic tracker file.
+    :param int repeats: Number of times to run each benchmark.
+    :return dict: {benchmark name: timings}
+    """
+    import Tkinter
+
+    results = {}
+    root = Tkinter.Tk()
+    _tracker = tracker.Tracker(datastore.DataStore(filename))
+
+    def build():
+        if _tracker.tracker_display is not None:
+            _tracker.tracker_display.destroy()
+        _tracker.attach_display(root)
+        root.update_idletasks()
+
+    results['tracker_display_construct'] = measure(build, repeats)
+
+    def update(_task):
+        _tracker.tracker_display.update()
+        root.update_idletasks()
+
+    def edit():
+        return edit_one_cell(_tracker)
+
+    results['tracker_display_update_one_cell'] = measure(update, repeats, edit)
+
+    def scroll():
+        _tracker.tracker_display.scroll_weeks('scroll', -1, 'units')
+        root.update_idletasks()
+
+    results['tracker_display_scroll_week'] = measure(scroll, repeats)
+
+    def load():
+        _tracker.load()
+        _tracker.update()
+        root.update_idletasks()
+
+    # Loading as the Load button used to, all on the Tk thread.
+    results['tracker_display_load_blocking'] = measure(load, repeats)
+
+    def longest_block_while_loading():
+        _tracker.tracker_display._load()
+        longest = 0
+        while _tracker.loader is not None:
+            start_time = time.time()
+            root.update()
+            longest = max(longest, time.time() - start_time)
+        return longest * 1000
+
+    # Longest the UI is unresponsive for while loading in the background.
+    blocks = [longest_block_while_loading() for _ in range(repeats)]
+    results['tracker_display_load_longest_block'] = {'best_ms': min(blocks),
+                                                     'mean_ms': sum(blocks) / len(blocks),
+                                                     'repeats': repeats}
+
+    root.destroy()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tracker against a synthetic tracker file.")
+    generate.add_arguments(parser)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', help="File to write the JSON results to. Printed if not given.")
+    parser.add_argument('--no-display', action='store_true', help="Skip the display benchmarks.")
+    args = parser.parse_args()
+
+    parameters = generate.get_parameters(args)
+    work_folder = tempfile.mkdtemp(prefix='tracker_benchmark')
+    try:
+        filename = os.path.join(work_folder, 'tracker.trk')
+        generate.write_tracker_file(filename, **parameters)
+
+        results = run_model_benchmarks(filename, work_folder, args.repeats)
+        display_available = os.name == 'nt' or bool(os.environ.get('DISPLAY'))
+        if display_available and not args.no_display:
+            results.update(run_display_benchmarks(filename, args.repeats))
+
+        report = {'parameters': parameters,
+                  'file_size_bytes': os.path.getsize(filename),
+                  'environment': {'python': platform.python_version(),
+                                  'platform': platform.platform(),
+                                  'numpy': timematrix.use_numpy(),
+                                  'display': display_available and not args.no_display},
+                  'results': results}
+    finally:
+        shutil.rmtree(work_folder)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output)
+    else:
+        print output
+
+
+if __name__ == '__main__':
+    sys.exit(main())
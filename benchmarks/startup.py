@@ -0,0 +1,47 @@
+import subprocess
+import sys
+import time
+
+"""
+Measures how long it takes to import the headless tracker modules in a fresh interpreter, and checks that doing so
+doesn't pull in Tkinter. Exits with a non-zero status if the import takes longer than the budget.
+"""
+
+# Time allowed for importing the headless modules, on top of the interpreter's own startup time.
+BUDGET_MS = 100
+
+HEADLESS_IMPORT = ("import sys, tracker, datastore, journal_datastore, task, weekslot, subtask; "
+                   "assert 'Tkinter' not in sys.modules, 'Headless import pulled in Tkinter'")
+
+
+def time_interpreter(code, repeats):
+    """
+    Runs some code in fresh interpreters and times them.
+    :param str code: Code to run.
+    :param int repeats: Number of times to run it.
+    :return float: Fastest time, in milliseconds.
+    """
+    times = []
+    for _ in range(repeats):
+        start_time = time.time()
+        subprocess.check_call([sys.executable, "-c", code])
+        times.append((time.time() - start_time) * 1000)
+    return min(times)
+
+
+def main(repeats=10):
+    interpreter_ms = time_interpreter("pass", repeats)
+    headless_ms = time_interpreter(HEADLESS_IMPORT, repeats)
+    import_ms = headless_ms - interpreter_ms
+
+    print "Interpreter startup:    %6.1fms" % interpreter_ms
+    print "Headless import:        %6.1fms" % headless_ms
+    print "Import cost:            %6.1fms (budget %dms)" % (import_ms, BUDGET_MS)
+
+    if import_ms > BUDGET_MS:
+        print "Over budget!"
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,180 @@
+import StringIO
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import export
+import streaming_json
+import sync_client
+import sync_server
+
+"""
+Load test for sync_server.py: dozens of clients, each with their own tracker, sync concurrently with a server on
+localhost. Each client starts with a year of time tracked against a few of the team's tasks, then makes a few changes
+and syncs, over and over. Checks that every client ends up with every task definition and the same team time, and
+reports the sync latency and the bytes sent compared with the size of the whole tracker file. Run as:
+python -m benchmarks.sync_load [clients] [rounds]
+"""
+
+CLIENTS = 48
+ROUNDS = 20
+WEEKS = 52
+TEAM_TASKS = 30  # Tasks shared across the team.
+TASKS_PER_CLIENT = 8
+SUBTASKS = ("Design", "Build", "Test", "Review", "Support")
+CHANGES_PER_ROUND = 5
+
+
+def create_tracker(directory, user, rng):
+    """
+    Creates a tracker with time tracked against some of the team's tasks. Never saved.
+    :return tracker.Tracker:
+    """
+    tracker = export.open_tracker(os.path.join(directory, "%s.trk" % user))
+    for _ in range(WEEKS):
+        tracker.add_week()
+    for task_index in rng.sample(range(TEAM_TASKS), TASKS_PER_CLIENT):
+        task_name = "Task %d" % task_index
+        tracker.create_new_task(task_name)
+        _task = tracker.tasks[task_name]
+        for subtask_name in rng.sample(SUBTASKS, 3):
+            _task.add_subtask(subtask_name)
+        for week_index in range(WEEKS - 12, WEEKS):
+            _week = _task.get_or_insert_weekslot(week_index)
+            _week.widen(len(_task.subtasks))
+            for column in range(len(_task.subtasks)):
+                if rng.random() < 0.5:
+                    _week.set_time_in_entry(column, rng.randint(1, 16) * 0.25)
+    tracker.update()
+    return tracker
+
+
+def make_changes(tracker, rng):
+    """
+    Changes a few entries in the latest weeks, as a user would between syncs.
+    """
+    for _ in range(CHANGES_PER_ROUND):
+        _task = tracker.tasks[rng.choice(tracker.task_order)]
+        _week = _task.weeks[-1 - rng.randrange(min(4, len(_task.weeks)))]
+        _week.set_time_in_entry(rng.randrange(_week.width), rng.randint(0, 16) * 0.25)
+    tracker.update()
+
+
+def get_file_size(tracker):
+    """
+    :return int: Size of the tracker's .trk file, were it saved.
+    """
+    tracker.datastore.update_raw_data(tracker)
+    output = StringIO.StringIO()
+    streaming_json.dump(tracker.datastore.raw_data, output)
+    return len(output.getvalue())
+
+
+def run_client(client, rng, rounds, barrier, latencies, errors):
+    try:
+        barrier.wait()
+        for _ in range(rounds):
+            make_changes(client.tracker, rng)
+            start_time = time.time()
+            client.sync()
+            latencies.append(time.time() - start_time)
+    except Exception as e:
+        errors.append(e)
+        raise
+
+
+class Barrier(object):
+    """
+    Holds threads until all of them are ready, so that the clients start syncing at the same time.
+    """
+    def __init__(self, count):
+        self.count = count
+        self.condition = threading.Condition()
+
+    def wait(self):
+        with self.condition:
+            self.count -= 1
+            if self.count <= 0:
+                self.condition.notify_all()
+            while self.count > 0:
+                self.condition.wait()
+
+
+def main(number_of_clients=CLIENTS, rounds=ROUNDS):
+    directory = tempfile.mkdtemp()
+    server = sync_server.SyncServer(('127.0.0.1', 0))
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+    clients = []
+    try:
+        for client_index in range(number_of_clients):
+            user = "user%d" % client_index
+            tracker = create_tracker(directory, user, random.Random(client_index))
+            clients.append(sync_client.SyncClient(tracker, user, server.url))
+        file_size = sum(get_file_size(client.tracker) for client in clients) / len(clients)
+
+        # The first sync sends everything, so it is timed separately.
+        start_time = time.time()
+        for client in clients:
+            client.push()
+        first_sync_bytes = sum(client.bytes_sent for client in clients) / len(clients)
+        print "%d clients, first push: %.2fs, %d bytes each (tracker file: %d bytes)" % (
+            number_of_clients, time.time() - start_time, first_sync_bytes, file_size)
+
+        latencies = []
+        errors = []
+        barrier = Barrier(number_of_clients)
+        sent_before = sum(client.bytes_sent for client in clients)
+        received_before = sum(client.bytes_received for client in clients)
+        threads = [threading.Thread(target=run_client,
+                                    args=(client, random.Random(1000 + index), rounds, barrier, latencies, errors))
+                   for index, client in enumerate(clients)]
+        start_time = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start_time
+        assert not errors, errors
+
+        latencies.sort()
+        syncs = len(latencies)
+        sent_per_sync = (sum(client.bytes_sent for client in clients) - sent_before) / syncs
+        received_per_sync = (sum(client.bytes_received for client in clients) - received_before) / syncs
+        print "%d concurrent syncs in %.2fs: %.0f syncs/s" % (syncs, elapsed, syncs / elapsed)
+        print "Latency: median %.1fms, 95th percentile %.1fms, max %.1fms" % (
+            latencies[syncs // 2] * 1000, latencies[int(syncs * 0.95)] * 1000, latencies[-1] * 1000)
+        # Without the service, each user would send their whole file, and receive everyone else's.
+        print "Bytes per sync: %d sent (vs %d for the whole file), %d received (vs %d for every other file)" % (
+            sent_per_sync, file_size, received_per_sync, file_size * (number_of_clients - 1))
+
+        # Everyone catches up, then must agree on the definitions and the team's time.
+        for client in clients:
+            client.sync()
+        expected_time = {}
+        for client in clients:
+            for task_name, entries in client.synced.iteritems():
+                for (subtask_name, week_index), hours in entries.iteritems():
+                    expected_time[(client.user, task_name, subtask_name, week_index)] = hours
+        for client in clients:
+            client.pull()
+            assert dict((key, hours) for key, hours in client.team_time.iteritems() if hours) == expected_time
+            assert set(client.tracker.task_order) == set(clients[0].definitions)
+            for task_name, subtask_names in client.definitions.iteritems():
+                assert set(subtask_names) <= set(_subtask.name for _subtask in client.tracker.tasks[task_name].subtasks)
+        print "All clients agree on %d tasks and %d time entries" % (len(clients[0].definitions), len(expected_time))
+    finally:
+        for client in clients:
+            client.close()
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,77 @@
+import random
+import sys
+import timeit
+
+import task
+import subtask
+
+"""
+Measures per-week queries on Task against a synthetic tracker, comparing Task.get_weekslot with the linear scan over
+Task.weeks that it replaced.
+"""
+
+TASKS = 500
+WEEKS = 260
+SUBTASKS = 4
+
+
+def create_tasks(number_of_tasks, number_of_weeks, number_of_subtasks):
+    """
+    Creates tasks starting in random weeks, each running until the latest week.
+    :param int number_of_tasks: Number of tasks to create.
+    :param int number_of_weeks: Number of weeks in the tracker.
+    :param int number_of_subtasks: Number of subtasks in each task.
+    :return list[task.Task]:
+    """
+    tasks = []
+    for i in range(number_of_tasks):
+        first_week_id = random.randrange(number_of_weeks)
+        subtasks = [subtask.Subtask("Subtask %d" % j) for j in range(number_of_subtasks)]
+        weeks = [[random.choice([0, 0, 0.5, 1, 2]) for _ in subtasks] for _ in range(first_week_id, number_of_weeks)]
+        tasks.append(task.Task("Task %d" % i, first_week_id, subtasks, weeks))
+    return tasks
+
+
+def linear_get_weekslot(_task, week_index):
+    """
+    The original implementation of Task.get_weekslot, for comparison.
+    """
+    for _week in _task.weeks:
+        if _week.index == week_index:
+            return _week
+    return None
+
+
+def week_totals(tasks, number_of_weeks, get_weekslot):
+    """
+    Totals each week across all tasks, as is done for the week labels.
+    """
+    totals = []
+    for week_index in range(number_of_weeks):
+        counter = 0
+        for _task in tasks:
+            _week = get_weekslot(_task, week_index)
+            if _week is not None:
+                counter += _week.get_total_time_spent()
+        totals.append(counter)
+    return totals
+
+
+def main(number_of_tasks=TASKS, number_of_weeks=WEEKS, repeats=3):
+    random.seed(0)
+    tasks = create_tasks(number_of_tasks, number_of_weeks, SUBTASKS)
+
+    assert week_totals(tasks, number_of_weeks, linear_get_weekslot) == \
+        week_totals(tasks, number_of_weeks, task.Task.get_weekslot)
+
+    print "%d tasks x %d weeks, best of %d" % (number_of_tasks, number_of_weeks, repeats)
+    for name, get_weekslot in (("linear scan", linear_get_weekslot), ("indexed", task.Task.get_weekslot)):
+        timer = timeit.Timer(lambda: week_totals(tasks, number_of_weeks, get_weekslot))
+        print "%-12s week totals: %8.1fms" % (name, min(timer.repeat(repeats, 1)) * 1000)
+
+    timer = timeit.Timer(lambda: [_task.week_summary(number_of_weeks - 1) for _task in tasks])
+    print "%-12s summaries:   %8.1fms" % ("indexed", min(timer.repeat(repeats, 1)) * 1000)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,349 @@
+import array
+import logging
+import json
+import mmap
+import os
+import struct
+from collections import OrderedDict
+import datastore
+import timematrix
+
+"""
+Binary tracker files are laid out as follows. All numbers are little-endian.
+header:    magic ('TRKB'), version (uint16), reserved (uint16), metadata length in bytes (uint32)
+metadata:  UTF-8 JSON: {task_order: [task_name],
+                        first_date: <date>,
+                        archived_week_index: <int>,
+                        tasks: [{name: <task_name>,
+                                 first_week_id: <int>,
+                                 archived: <boolean>,
+                                 subtasks: [[<subtask name>, <estimate>]],  # In subtask order.
+                                 weeks: <int>,  # Number of weeks stored.
+                                 columns: <int>,  # Number of values stored per week.
+                                 value_type: 'f' or 'd',  # float32 if it holds every value exactly, else float64.
+                                 offset: <int>,  # Offset of the task's data from the start of the data section.
+                                 days: {<week offset>: [[<subtask index>, <day>, <time tracked>]]}
+                                 # Optional, as in datastore.py. Rare, so kept in the metadata rather than the data.
+                                 }]
+                        }
+data:      Starts at the first multiple of 8 bytes after the metadata. For each task, at its offset:
+           widths: uint16 per week, the number of subtasks the week has values for. Padded to a multiple of 8 bytes.
+           values: weeks x columns matrix of value_type, in row order. Values beyond a week's width are zero.
+
+Time is normally tracked in fractions of an hour that float32 holds exactly, which halves the size of the matrices.
+Any task with a value that float32 can't hold exactly is stored as float64, so nothing is lost.
+The matrices are 8 byte aligned, so a task's history can be read straight out of the memory-mapped file without
+decoding anything else. Holds the same information as the JSON format described in datastore.py.
+"""
+
+MAGIC = 'TRKB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')
+BINARY_EXTENSIONS = ('.trkb',)
+
+
+def is_binary_file(filename):
+    """
+    Whether a tracker file should be stored with BinaryDataStore, judging by its extension.
+    :param str filename:
+    :return bool:
+    """
+    return filename.lower().endswith(BINARY_EXTENSIONS)
+
+
+def padded(length):
+    """
+    Rounds a length in bytes up to the next multiple of 8.
+    :param int length:
+    :return int:
+    """
+    return (length + 7) // 8 * 8
+
+
+def get_data_length(entry):
+    """
+    Gets the number of bytes that a task's data takes up.
+    :param dict entry: Metadata entry for the task.
+    :return int:
+    """
+    value_size = struct.calcsize(entry['value_type'])
+    return padded(2 * entry['weeks']) + padded(value_size * entry['weeks'] * entry['columns'])
+
+
+def encode_task(task_name, raw_task):
+    """
+    Packs a task into the binary format.
+    :param str task_name:
+    :param dict raw_task: Raw task details, as stored by datastore.DataStore.
+    :return tuple: (Metadata entry without an offset, packed data)
+    """
+    weeks = raw_task['weeks']
+    columns = max([len(values) for values in weeks] or [0])
+    entry = {'name': task_name,
+             'first_week_id': raw_task['first_week_id'],
+             'archived': raw_task['archived'],
+             'subtasks': [[name, details.get('estimate', 0)] for name, details in raw_task['subtasks'].iteritems()],
+             'weeks': len(weeks),
+             'columns': columns}
+    if raw_task.get('days'):
+        entry['days'] = raw_task['days']
+
+    widths = struct.pack('<%dH' % len(weeks), *[len(values) for values in weeks])
+    matrix = []
+    for values in weeks:
+        matrix.extend(values)
+        matrix.extend([0] * (columns - len(values)))
+    entry['value_type'] = 'f' if array.array('f', matrix).tolist() == matrix else 'd'
+    values = struct.pack('<%d%s' % (len(matrix), entry['value_type']), *matrix)
+    data = widths + '\0' * (padded(len(widths)) - len(widths)) + values + '\0' * (padded(len(values)) - len(values))
+    return entry, data
+
+
+def write(tracker_file, metadata, task_data):
+    """
+    Writes a complete binary tracker file.
+    :param file tracker_file: File to write to.
+    :param dict metadata: Metadata, as described at the top of this file, with the offsets filled in.
+    :param task_data: Iterable of the packed data for each task, in the order of metadata['tasks'].
+    """
+    encoded_metadata = json.dumps(metadata, separators=(',', ':'))
+    tracker_file.write(HEADER.pack(MAGIC, VERSION, 0, len(encoded_metadata)))
+    tracker_file.write(encoded_metadata)
+    header_length = HEADER.size + len(encoded_metadata)
+    tracker_file.write('\0' * (padded(header_length) - header_length))
+    for data in task_data:
+        tracker_file.write(data)
+
+
+def set_offsets(entries):
+    """
+    Lays the tasks' data out one after the other, filling in the offset of each metadata entry.
+    :param list[dict] entries: Metadata entries for each task.
+    """
+    offset = 0
+    for entry in entries:
+        entry['offset'] = offset
+        offset += get_data_length(entry)
+
+
+def write_raw_data(filename, raw_data):
+    """
+    Writes a binary tracker file from raw data, e.g. from a .trk file, one task at a time.
+    :param str filename: File to write.
+    :param dict raw_data: Raw data, in the form described in datastore.py.
+    """
+    entries = []
+    for task_name, raw_task in raw_data['tasks'].iteritems():
+        entry, _ = encode_task(task_name, raw_task)
+        entries.append(entry)
+    set_offsets(entries)
+
+    metadata = {'task_order': raw_data['task_order'],
+                'first_date': raw_data['first_date'],
+                'archived_week_index': raw_data['archived_week_index'],
+                'tasks': entries}
+    task_data = (encode_task(entry['name'], raw_data['tasks'][entry['name']])[1] for entry in entries)
+    with datastore.open_atomically(filename) as tracker_file:
+        write(tracker_file, metadata, task_data)
+
+
+class BinaryDataStore(datastore.DataStore):
+    """
+    DataStore for the binary format described at the top of this file.
+    The file is memory mapped, and only the metadata is decoded when it is loaded. Each task's weeks are unpacked
+    straight from the mapped file when the task is created.
+    Saving rewrites the file, copying the data of any tasks that haven't changed byte for byte.
+    """
+    def __init__(self, filename):
+        """
+        :param str filename: Filename with file path for where to load/save.
+        :return:
+        """
+        self.mapped_file = None
+        self.data_start = 0  # Offset of the data section in the file.
+        self.task_entries = {}  # {task_name: metadata entry}
+
+        datastore.DataStore.__init__(self, filename)
+
+    @property
+    def tasks(self):
+        """
+        Read-only access to the raw task data. Unpacks every task, so use get_raw_task where possible.
+        :return dict: Dict of {task_name: task_details}
+        """
+        return dict((task_name, self.get_raw_task(task_name)) for task_name in self.task_entries)
+
+    def load_from_file(self):
+        """
+        Map the file into memory and decode the metadata. Tasks are unpacked as they are created.
+        """
+        logging.debug("Loading datastore from binary file: %s" % self.filename)
+        self.close()
+        with open(self.filename, 'rb') as tracker_file:
+            self.mapped_file = mmap.mmap(tracker_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, metadata_length = HEADER.unpack_from(self.mapped_file, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a binary tracker file" % self.filename)
+        if version > VERSION:
+            raise ValueError("%s is version %d, only versions up to %d can be read" %
+                             (self.filename, version, VERSION))
+
+        metadata = json.loads(self.mapped_file[HEADER.size:HEADER.size + metadata_length])
+        self.data_start = padded(HEADER.size + metadata_length)
+        self.task_entries = dict((entry['name'], entry) for entry in metadata.pop('tasks'))
+        self.raw_data = metadata
+        self.raw_data['tasks'] = {}
+
+    def get_week_matrix(self, task_name):
+        """
+        Gets the time tracked against a task as a matrix of weeks by subtasks, straight from the mapped file.
+        With NumPy, this is a read-only array that shares memory with the file, so it must not be used after the file
+        is next saved or loaded. Otherwise it is a list of tuples.
+        :param str task_name:
+        :return numpy.ndarray|list[tuple]:
+        """
+        entry = self.task_entries[task_name]
+        offset = self.data_start + entry['offset'] + padded(2 * entry['weeks'])
+        weeks, columns, value_type = entry['weeks'], entry['columns'], entry['value_type']
+        if timematrix.use_numpy():
+            return timematrix.numpy.frombuffer(self.mapped_file, dtype='<' + value_type, count=weeks * columns,
+                                               offset=offset).reshape((weeks, columns))
+
+        row = struct.Struct('<%d%s' % (columns, value_type))
+        return [row.unpack_from(self.mapped_file, offset + week * row.size) for week in range(weeks)]
+
+    def get_week_widths(self, task_name):
+        """
+        Gets the number of subtasks that each week of a task has values for.
+        :param str task_name:
+        :return tuple: Tuple of ints, one per week.
+        """
+        entry = self.task_entries[task_name]
+        return struct.unpack_from('<%dH' % entry['weeks'], self.mapped_file, self.data_start + entry['offset'])
+
+    def get_raw_task(self, task_name):
+        """
+        Unpacks the raw task details associated with a given task name.
+        :param str task_name:
+        :return dict: Dict of raw task details, in the same form as stored by datastore.DataStore.
+        """
+        entry = self.task_entries[task_name]
+        matrix = self.get_week_matrix(task_name)
+        if timematrix.use_numpy():
+            matrix = matrix.tolist()
+        weeks = [list(values[:width]) for values, width in zip(matrix, self.get_week_widths(task_name))]
+
+        # Ordered, so that subtasks are created in the order they were stored.
+        subtasks = OrderedDict((name, {'estimate': estimate}) for name, estimate in entry['subtasks'])
+        raw_task = {'weeks': weeks,
+                    'first_week_id': entry['first_week_id'],
+                    'subtasks': subtasks,
+                    'archived': entry['archived']}
+        if entry.get('days'):
+            raw_task['days'] = entry['days']
+        return raw_task
+
+    def get_raw_data(self):
+        """
+        Unpacks everything in the file.
+        :return dict: Raw data, in the form described in datastore.py.
+        """
+        raw_data = dict(self.raw_data)
+        raw_data['tasks'] = self.tasks
+        raw_data['task_order'] = list(self.task_order)
+        return raw_data
+
+    def is_task_archived(self, task_name):
+        """
+        Whether a stored task is archived, without unpacking the task.
+        :param str task_name:
+        :return bool:
+        """
+        return self.task_entries[task_name]['archived']
+
+    def get_task_week_totals(self, task_name):
+        """
+        Totals the time tracked in each week of a stored task, straight from the mapped file.
+        :param str task_name:
+        :return dict: {week_index: time tracked}
+        """
+        first_week_id = self.task_entries[task_name]['first_week_id']
+        matrix = self.get_week_matrix(task_name)
+        if timematrix.use_numpy():
+            week_totals = matrix.sum(axis=1).tolist()
+        else:
+            week_totals = [sum(values) for values in matrix]
+        return dict((first_week_id + offset, total) for offset, total in enumerate(week_totals))
+
+    def get_highest_week_id(self):
+        """
+        Returns the ID of the latest week. This tells us how many weeks exist.
+        :return int: Highest stored week index.
+        """
+        return max([entry['first_week_id'] + entry['weeks'] for entry in self.task_entries.itervalues()] or [0])
+
+    def save_to_file(self, tracker):
+        """
+        Rewrites the file from a tracker. Tasks that haven't changed since they were last saved are copied from the
+        existing file without being unpacked.
+        :param tracker.Tracker tracker: Tracker object to store.
+        """
+        logging.debug("Saving datastore to binary file: %s" % self.filename)
+        self.save_archived_week_index(tracker.archived_week_index)
+        self.save_first_date(tracker.first_date)
+        self.save_task_order(tracker.task_order)
+
+        entries = []
+        sources = []  # Packed data, or the stored entry to copy the data from, for each task.
+        for _task in tracker.tasks.itervalues():
+            stored_entry = self.task_entries.get(_task.task_name)
+            if _task.is_dirty or stored_entry is None:
+                entry, data = encode_task(_task.task_name, self.generate_task_dict(_task))
+                sources.append(data)
+            else:
+                entry = dict(stored_entry)
+                sources.append(stored_entry)
+            entries.append(entry)
+        set_offsets(entries)
+        logging.debug("Writing %d tasks, %d unchanged" % (len(entries), sum(isinstance(s, dict) for s in sources)))
+
+        metadata = dict(self.raw_data)
+        metadata.pop('tasks', None)
+        metadata['tasks'] = entries
+        with datastore.open_atomically(self.filename) as tracker_file:
+            write(tracker_file, metadata, (self.get_task_data(source) for source in sources))
+            # The file can't be replaced while it is mapped on some platforms.
+            self.close()
+
+        self.load_from_file()
+        self.mark_saved(tracker)
+
+    def prepare_save(self, tracker):
+        """
+        Tasks are read from the mapped file as they are created, so the file is replaced straight away rather than on
+        another thread.
+        :param tracker.Tracker tracker: Tracker object to store.
+        :return: Function that does nothing, since the file has already been written.
+        """
+        self.save_to_file(tracker)
+        return lambda: None
+
+    def get_task_data(self, source):
+        """
+        Gets the packed data for a task.
+        :param str|dict source: Packed data, or the stored metadata entry of a task to copy from the mapped file.
+        :return str: Packed data.
+        """
+        if not isinstance(source, dict):
+            return source
+        start = self.data_start + source['offset']
+        return self.mapped_file[start:start + get_data_length(source)]
+
+    def close(self):
+        """
+        Unmap the file.
+        """
+        if self.mapped_file is not None:
+            self.mapped_file.close()
+            self.mapped_file = None
@@ -1,10 +1,13 @@
 import logging
-import json
 import task
 import subtask
 import datetime
 import os
-from collections import defaultdict
+import contextlib
+import threading
+import merge
+import streaming_json
+from collections import defaultdict, OrderedDict
 
 """
 Data stored as follows:
@@ -14,6 +17,9 @@ Data stored as follows:
                      first_week_id: <int>,  # ID of first week this task appears in.
                      subtasks: [<sub tasks>],  # Defines name and ordering of subtasks.
                      archived: <boolean>  # Defines whether task is to be displayed.
+                     days: {<week offset>: [[<subtask index>, <day>, <time tracked>], ...]}
+                     # Optional. Time tracked on individual days, only for weeks that have any. Week offsets are
+                     # strings, as they are JSON keys. Already included in the totals in weeks.
                      }
         }
 task_order = [task_name]  # list of task names which is the order in which they are shown.
@@ -23,6 +29,11 @@ archived_week_index = <int>
 """
 
 
+# Flags for MoveFileEx, used to replace files on Windows.
+MOVEFILE_REPLACE_EXISTING = 0x1
+MOVEFILE_WRITE_THROUGH = 0x8
+
+
 class DataStore(object):
     """
     Object that saves and loads text files.
@@ -35,6 +46,15 @@ class DataStore(object):
         :return:
         """
         self.filename = filename
+        # Held while writing to the file, so that saves from different threads don't interleave.
+        self.write_lock = threading.Lock()
+
+        # State of the file (see get_disk_state) when it was last loaded or written, so that changes made to it by
+        # anything else can be spotted before saving over them. See merge_changes_on_disk.
+        self.disk_state = None
+        self.disk_state_lock = threading.Lock()
+        # Number of saves prepared but not yet written, during which the file is expected to change.
+        self.writes_pending = 0
 
         self.raw_data = {}
 
@@ -47,6 +67,8 @@ class DataStore(object):
             self.raw_data['tasks'] = {}
             self.raw_data['first_date'] = datetime.datetime.strftime(datetime.datetime.today(), "%Y-%m-%d")
             self.raw_data['archived_week_index'] = 0
+            if self.filename:
+                self.disk_state = self.get_disk_state()
 
     @property
     def tasks(self):
@@ -84,28 +106,122 @@ class DataStore(object):
         """
         Load from preconfigured filename. Populates self.raw_data dictionary from the file contents.
         Expects a file in JSON format, following the structure described at the top of this file.
+        The file is decoded a task at a time, so it is never held in memory as a whole.
         """
         logging.debug("Loading datastore from file: %s" % self.filename)
+        # Taken before reading, so that anything written while reading is merged in on the next save, not missed.
+        self.disk_state = self.get_disk_state()
         with open(self.filename, 'r') as save_file:
-            file_contents = ''.join(save_file.readlines())
-
             # Make raw_data have default entries of None to cope with old save files.
             # This allows for adding new entries to the save files.
             self.raw_data = defaultdict(lambda: None)
-            self.raw_data.update(json.loads(file_contents))
+            self.raw_data.update(streaming_json.load(save_file))
 
     def save_to_file(self, tracker):
         """
         Saves the raw_data dict to pre-specified filename. Stores in JSON format, according to structure at the top of
-        this file.
+        this file. The file is encoded a task at a time, so it is never held in memory as a whole.
+        The file is replaced atomically, so a crash part way through a save leaves the previous save intact.
+        :param tracker.Tracker tracker: Tracker object to store.
+        """
+        self.prepare_save(tracker)()
+
+    def prepare_save(self, tracker):
+        """
+        Captures everything that needs saving from a tracker, without writing anything. Must be called on the thread
+        that changes the tracker, but the write it returns can be run on any thread, e.g. so the UI isn't held up.
+        The tracker is marked as saved straight away, so changes made after this are picked up by the next save.
         :param tracker.Tracker tracker: Tracker object to store.
+        :return: Function that writes the captured data to the file.
         """
-        logging.debug("Saving datastore to file: %s" % self.filename)
+        self.merge_changes_on_disk(tracker)
         self.update_raw_data(tracker)
-        json_to_save = json.dumps(self.raw_data)
+        self.mark_saved(tracker)
+        snapshot = self.snapshot_raw_data()
+        self.writes_pending += 1
 
-        with open(self.filename, 'w') as save_file:
-            save_file.writelines(json_to_save)
+        def write():
+            logging.debug("Saving datastore to file: %s" % self.filename)
+            with self.write_lock:
+                unchanged = self.get_disk_state() == self.disk_state
+                written = False
+                try:
+                    with open_atomically(self.filename) as save_file:
+                        streaming_json.dump(snapshot, save_file)
+                    written = True
+                finally:
+                    self.write_finished(written and unchanged)
+        return write
+
+    def get_disk_state(self):
+        """
+        :return tuple: State of the files this datastore is stored in, which changes whenever any of them is written.
+        """
+        return merge.get_file_states([self.filename])
+
+    def write_finished(self, unchanged):
+        """
+        Called once a save prepared by prepare_save has been written, or has failed to be.
+        :param bool unchanged: Whether the file was written, and was as this datastore last left it beforehand, so that
+            the file now matches the raw data that was saved.
+        """
+        with self.disk_state_lock:
+            self.writes_pending -= 1
+            if unchanged:
+                self.disk_state = self.get_disk_state()
+
+    def read_raw_data_from_disk(self):
+        """
+        Reads the raw data currently stored in the file, without changing this datastore.
+        :return dict: Raw data, in the form described at the top of this file.
+        """
+        return DataStore(self.filename).raw_data
+
+    def has_unwritten_changes(self):
+        """
+        :return bool: Whether changes already taken from the tracker have yet to be written to the file.
+        """
+        return False
+
+    def merge_changes_on_disk(self, tracker):
+        """
+        Checks whether anything else (e.g. another instance of the app) has written to the file since this datastore
+        last loaded or wrote it, and if so, merges their changes into the tracker so the save doesn't lose them. See
+        merge.py. Checking costs a stat of the file, so this is done before every save.
+        Skipped while this datastore's own writes are pending, since the file is expected to change then, and while the
+        tracker is loading in the background.
+        :param tracker.Tracker tracker: Tracker about to be saved.
+        :return dict: Report of what was merged (see merge.merge), or None if nothing was.
+        """
+        if not self.filename or tracker.loader is not None:
+            return None
+        with self.disk_state_lock:
+            if self.writes_pending or self.has_unwritten_changes():
+                return None
+            disk_state = self.get_disk_state()
+            if disk_state == self.disk_state or not os.path.exists(self.filename):
+                return None
+
+        logging.debug("File has been changed elsewhere, merging: %s" % self.filename)
+        try:
+            theirs = self.read_raw_data_from_disk()
+        except (IOError, ValueError) as e:
+            logging.warning("Couldn't read changes made elsewhere to %s: %s" % (self.filename, e))
+            return None
+        report = merge.merge(tracker, self, theirs)
+        self.disk_state = disk_state
+        return report
+
+    def snapshot_raw_data(self):
+        """
+        Takes a copy of the raw data that won't change as the raw data is updated.
+        Raw tasks are replaced rather than changed when they are updated, so only the containers need copying.
+        :return dict: Raw data, in the form described at the top of this file.
+        """
+        snapshot = dict(self.raw_data)
+        snapshot['tasks'] = dict(self.raw_data['tasks'])
+        snapshot['task_order'] = list(self.raw_data['task_order'])
+        return snapshot
 
     def get_raw_task(self, task_name):
         """
@@ -135,9 +251,15 @@ class DataStore(object):
         :return task.Task: Task object for given task name.
         """
         logging.debug("Creating task from raw data: %s" % task_name)
-        # Get the raw task dict
-        raw_task = self.get_raw_task(task_name)
+        return self.create_task_from_raw(task_name, self.get_raw_task(task_name))
 
+    def create_task_from_raw(self, task_name, raw_task):
+        """
+        Creates a Task object from raw task details, e.g. those stored in another copy of the file.
+        :param str task_name: Name of the task.
+        :param dict raw_task: Raw task details, in the form described at the top of this file.
+        :return task.Task: Task object matching the raw details.
+        """
         # Pluck out required information.
         # When adding a new field to data storage, make sure to use raw_task.get(name, default_value)
         # to ensure back compatibility
@@ -145,6 +267,7 @@ class DataStore(object):
         subtasks_dict = raw_task['subtasks']
         weeks = raw_task['weeks']
         archived = raw_task['archived']
+        days = dict((int(offset), day_values) for offset, day_values in (raw_task.get('days') or {}).iteritems())
 
         subtasks = []
         for subtask_name, subtask_details in subtasks_dict.iteritems():
@@ -153,25 +276,97 @@ class DataStore(object):
             sub_estimate = subtask_details.get('estimate', 0)
             subtasks.append(subtask.Subtask(subtask_name, estimate=sub_estimate))
 
-        # Create the new task and store it.
-        return task.Task(task_name, first_week_id, subtasks, weeks, archived)
+        # Create the new task and store it. It matches what is stored, so has no changes to save.
+        _task = task.Task(task_name, first_week_id, subtasks, weeks, archived, days)
+        _task.mark_clean()
+        return _task
+
+    def is_task_archived(self, task_name):
+        """
+        Whether a stored task is archived, without creating the task.
+        :param str task_name:
+        :return bool:
+        """
+        return self.get_raw_task(task_name)['archived']
+
+    def get_task_week_totals(self, task_name):
+        """
+        Totals the time tracked in each week of a stored task, without creating the task.
+        :param str task_name:
+        :return dict: {week_index: time tracked}
+        """
+        raw_task = self.get_raw_task(task_name)
+        first_week_id = raw_task['first_week_id']
+        return dict((first_week_id + offset, sum(values)) for offset, values in enumerate(raw_task['weeks']))
 
     def save_task(self, _task):
         """
         Converts a live instance of a task into an entry in the raw_data dict.
+        Only the parts of the task that have changed since it was last saved are written. The entry is replaced rather
+        than changed, so that snapshots of the raw data are unaffected.
         :param task.Task _task: Task to be stored.
+        :return int: Number of weeks written.
         """
-        subtask_dict = defaultdict(None)
+        raw_task = self.tasks.get(_task.task_name)
+        if _task.dirty or raw_task is None or raw_task['first_week_id'] != _task.first_week_id:
+            self.raw_data['tasks'][_task.task_name] = self.generate_task_dict(_task)
+            return len(_task.weeks)
+
+        raw_task = dict(raw_task)
+        self.raw_data['tasks'][_task.task_name] = raw_task
         for sub in _task.subtasks:
-            subtask_dict[sub.name] = self.generate_subtask_dict(sub)
+            if sub.dirty:
+                raw_task['subtasks'] = self.generate_subtasks_dict(_task)
+                break
+
+        raw_weeks = raw_task['weeks'] = list(raw_task['weeks'])
+        for _week in _task.dirty_weeks:
+            offset = _week.index - _task.first_week_id
+            if offset >= len(_task.weeks) or _task.weeks[offset] is not _week:
+                # Weeks aren't contiguous, e.g. if weeks were added while the task was archived.
+                offset = _task.weeks.index(_week)
+
+            if offset == len(raw_weeks):
+                raw_weeks.append(list(_week.time_tracked))
+            elif offset < len(raw_weeks):
+                raw_weeks[offset] = list(_week.time_tracked)
+            else:
+                # Weeks are added in order, so a gap means the raw data is out of step. Store the task in full.
+                self.raw_data['tasks'][_task.task_name] = self.generate_task_dict(_task)
+                return len(_task.weeks)
+            set_raw_days(raw_task, offset, _week.get_daily_values())
 
+        return len(_task.dirty_weeks)
+
+    def generate_task_dict(self, _task):
+        """
+        Generates a dict for a task in a suitable form for saving.
+        The week lists are copied so that the raw data doesn't change as the task is edited.
+        :param task.Task _task: Task to be stored
+        :return dict: JSON-serializable dict containing all the details of the task
+        """
         task_dict = {'archived': _task.archived,
-                     'subtasks': subtask_dict,
+                     'subtasks': self.generate_subtasks_dict(_task),
                      'first_week_id': _task.first_week_id,
-                     'weeks': [week.time_tracked for week in _task.weeks]
+                     'weeks': [list(week.time_tracked) for week in _task.weeks]
                      }
+        # Only stored if there are any, so that weekly-only tasks are no bigger.
+        days = dict((str(offset), week.get_daily_values()) for offset, week in enumerate(_task.weeks) if week.days)
+        if days:
+            task_dict['days'] = days
+        return task_dict
 
-        self.raw_data['tasks'][_task.task_name] = task_dict
+    def generate_subtasks_dict(self, _task):
+        """
+        Generates a dict of all the subtasks of a task in a suitable form for saving.
+        The dict is ordered, so that formats that can keep the order of subtasks do.
+        :param task.Task _task: Task whose subtasks are to be stored
+        :return OrderedDict: Dict of {subtask_name: subtask_details}, in subtask order.
+        """
+        subtask_dict = OrderedDict()
+        for sub in _task.subtasks:
+            subtask_dict[sub.name] = self.generate_subtask_dict(sub)
+        return subtask_dict
 
     def generate_subtask_dict(self, _subtask):
         """
@@ -201,19 +396,120 @@ class DataStore(object):
         Stores the order that tasks are displayed in.
         :param list[str] task_order: String list of task names.
         """
-        self.raw_data['task_order'] = task_order
+        self.raw_data['task_order'] = list(task_order)
 
     def update_raw_data(self, tracker):
         """
         Saves all members of a tracker object to this datastores raw_data.
+        Tasks that haven't changed since they were last saved are skipped.
         :param tracker.Tracker tracker: Tracker object to store.
-        :return:
+        :return tuple: (Number of tasks written, number of weeks written)
         """
         logging.debug("Updating current datastore data")
+        tasks_written = 0
+        weeks_written = 0
         for _task in tracker.tasks.itervalues():
-            self.save_task(_task)
+            if _task.is_dirty or _task.task_name not in self.tasks:
+                weeks_written += self.save_task(_task)
+                tasks_written += 1
+
+        # Remove any tasks that no longer exist, e.g. because they have been renamed.
+        for task_name in self.tasks.keys():
+            if task_name not in tracker.tasks:
+                del self.tasks[task_name]
 
         self.save_archived_week_index(tracker.archived_week_index)
         self.save_first_date(tracker.first_date)
         self.save_task_order(tracker.task_order)
 
+        logging.debug("Wrote %d tasks and %d weeks" % (tasks_written, weeks_written))
+        return tasks_written, weeks_written
+
+    def mark_saved(self, tracker):
+        """
+        Clears the change tracking of every task in a tracker, once it has been saved.
+        :param tracker.Tracker tracker: Tracker object that has been stored.
+        """
+        for _task in tracker.tasks.itervalues():
+            if _task.is_dirty:
+                _task.mark_clean()
+
+
+def set_raw_days(raw_task, offset, day_values):
+    """
+    Stores the time tracked on individual days of one week of a raw task. The task's days dict is replaced rather than
+    changed, so that snapshots of the raw data are unaffected.
+    :param dict raw_task: Raw task details, in the form described at the top of this file.
+    :param int offset: Offset of the week in the task's weeks.
+    :param list day_values: [[<subtask index>, <day>, <time tracked>], ...], or an empty list if there are none.
+    """
+    raw_days = raw_task.get('days') or {}
+    key = str(offset)
+    if raw_days.get(key, []) == day_values:
+        return
+
+    raw_days = dict(raw_days)
+    if day_values:
+        raw_days[key] = day_values
+    else:
+        del raw_days[key]
+    if raw_days:
+        raw_task['days'] = raw_days
+    else:
+        raw_task.pop('days', None)
+
+
+def write_file_atomically(filename, contents):
+    """
+    Writes a file such that a crash part way through leaves either the old or the new contents, never a mixture.
+    :param str filename: File to write.
+    :param str contents: Contents of the file.
+    """
+    with open_atomically(filename) as temp_file:
+        temp_file.write(contents)
+
+
+@contextlib.contextmanager
+def open_atomically(filename):
+    """
+    Context manager giving a file to write to, such that a crash part way through leaves either the old or the new
+    contents, never a mixture.
+    The contents are written and synced to a temporary file alongside the target, which is renamed over it on exit.
+    If an exception is raised, the target is left as it was.
+    :param str filename: File to write.
+    """
+    temp_filename = filename + '.tmp'
+    try:
+        with open(temp_filename, 'wb') as temp_file:
+            yield temp_file
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        replace_file(temp_filename, filename)
+    except:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+        raise
+
+
+def replace_file(source, destination):
+    """
+    Renames a file over another in a single step, so that the destination always has either its old or its new
+    contents, and makes the rename durable.
+    :param str source: File to rename.
+    :param str destination: File to replace. Needn't exist.
+    """
+    if os.name == 'nt':
+        # os.rename won't replace an existing file on Windows, so MoveFileEx is used, which can.
+        import ctypes
+        flags = MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH
+        if not ctypes.windll.kernel32.MoveFileExW(unicode(source), unicode(destination), flags):
+            raise ctypes.WinError()
+        return
+
+    os.rename(source, destination)
+    # The rename is only durable once the directory holding the file is synced.
+    directory = os.open(os.path.dirname(os.path.abspath(destination)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
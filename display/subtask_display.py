@@ -5,24 +5,63 @@ from misc_display_functions import prompt_for_value
 
 class SubTaskDisplay(object):
     def __init__(self, parent, subtask):
+        self.task = parent.task
         self.subtask = subtask
+        self.tracker_display = parent.parent
         self.name_button = SubTaskButton(parent, self.subtask)
+        self.timer_button = Tkinter.Button(parent, text="Time", command=self.open_timer)
 
-        total_spent = parent.task.get_time_for_subtask(self.subtask)
-        self.spent_label = Tkinter.Label(parent, text=str(total_spent))
+        self.total_spent = parent.task.get_time_for_subtask(self.subtask)
+        self.spent_label = Tkinter.Label(parent, text=str(self.total_spent))
         self.estimate_entry = Tkinter.Entry(parent, width=5)
         self.estimate_entry.insert(0, self.subtask.estimate)
-        self.remaining_label = Tkinter.Label(parent, text=str(self.subtask.estimate - total_spent))
+        self.entry_estimate = self.subtask.estimate  # Estimate in the entry when it was last written or gathered.
+        self.estimate = self.subtask.estimate
+        self.remaining_label = Tkinter.Label(parent, text=str(self.subtask.estimate - self.total_spent))
+
+    def refresh(self, total_spent):
+        """
+        Reconcile the displayed name and totals with the subtask. Widgets are only reconfigured if their value changed.
+        :param float total_spent: Time tracked against this subtask across all weeks.
+        """
+        self.name_button.refresh()
+
+        # Pick up an estimate changed other than by typing into the entry, e.g. by undo.
+        if self.subtask.estimate != self.entry_estimate:
+            self.entry_estimate = self.subtask.estimate
+            self.estimate_entry.delete(0, Tkinter.END)
+            self.estimate_entry.insert(0, self.subtask.estimate)
+
+        spent_changed = total_spent != self.total_spent
+        if spent_changed:
+            self.total_spent = total_spent
+            self.spent_label.configure(text=str(total_spent))
+
+        if spent_changed or self.subtask.estimate != self.estimate:
+            self.estimate = self.subtask.estimate
+            self.remaining_label.configure(text=str(self.subtask.estimate - total_spent))
 
     def gather_input(self):
         try:
             float_value = float(self.estimate_entry.get())
         except ValueError:
             float_value = 0.0
-        self.subtask.estimate = float_value
+        self.entry_estimate = float_value
+        self.task.set_subtask_estimate(self.subtask, float_value)
+
+    def open_timer(self):
+        self.tracker_display.open_timer(self.task, self.subtask)
+
+    def destroy(self):
+        self.name_button.destroy()
+        self.timer_button.destroy()
+        self.spent_label.destroy()
+        self.estimate_entry.destroy()
+        self.remaining_label.destroy()
 
     def draw(self, row, column_offset):
         self.name_button.grid(row=row, sticky=Tkinter.W, padx=10)
+        self.timer_button.grid(row=row, column=1)
         self.estimate_entry.grid(row=row, column=column_offset)
         self.spent_label.grid(row=row, column=column_offset + 1)
         self.remaining_label.grid(row=row, column=column_offset + 2)
@@ -37,6 +76,7 @@ class SubTaskButton(Tkinter.Button):
         """
         self.parent = parent_task_display
         self.subtask = subtask
+        self.name = subtask.name
 
         # Create a button whose action is to rename the subtask
         Tkinter.Button.__init__(self,
@@ -44,6 +84,14 @@ class SubTaskButton(Tkinter.Button):
                                 text=self.subtask.name,
                                 command=prompt_for_value(self, self.set_name, "Enter new subtask name"))
 
+    def refresh(self):
+        """
+        Update the button text if the subtask has been renamed.
+        """
+        if self.subtask.name != self.name:
+            self.name = self.subtask.name
+            self.configure(text=self.name)
+
     def set_name(self, name):
         """
         Change the name of this subtask.
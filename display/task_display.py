@@ -1,7 +1,6 @@
 import Tkinter
 import logging
 import subtask_display
-import week_display
 from misc_display_functions import prompt_for_value, ROW_OFFSET
 
 
@@ -20,10 +19,6 @@ class TaskDisplay(Tkinter.Frame):
 
         self.task = _task
 
-        if self.task.archived:
-            logging.debug("Aborting display for task %s as it is archived." % _task)
-            return
-
         self.parent = parent
         self.row_id = row_id
         Tkinter.Frame.__init__(self,
@@ -53,24 +48,25 @@ class TaskDisplay(Tkinter.Frame):
         self.remaining_header = Tkinter.Label(self, text="Gain")
 
         # Create the labels/entries for the total, estimate and remaining for the entire task.
-        total_spent = self.task.get_total_time_spent()
-        self.spent_value = Tkinter.Label(self, text=str(total_spent))
-        self.estimate_entry = Tkinter.Label(self, text=str(self.task.estimate))
-        self.remaining_value = Tkinter.Label(self, text=str(self.task.estimate - total_spent))
+        # The values currently shown, so that refresh only reconfigures labels that are out of date.
+        self.name = self.task.task_name
+        self.total_spent = self.task.get_total_time_spent()
+        self.estimate = self.task.estimate
+        self.spent_value = Tkinter.Label(self, text=str(self.total_spent))
+        self.estimate_entry = Tkinter.Label(self, text=str(self.estimate))
+        self.remaining_value = Tkinter.Label(self, text=str(self.estimate - self.total_spent))
 
         # Create a label for each subtask.
         self.subtask_displays = []
         for subtask in self.task.subtasks:
             self.add_subtask_display(subtask)
 
-        # Create a set of entries (a week display) for each week this task exists for
-        self.week_displays = []
-        for _week in self.task.weeks:
-            self.add_week(_week)
-
+        self.shown = False
         self.draw()
 
     def set_name(self, name):
+        # A task with the name may not have been loaded yet.
+        self.parent.tracker.finish_loading()
         if self.parent.tracker.check_task_name_validity(name):
             self.parent.tracker.rename_task(self.task, name)
             self.parent.update()
@@ -98,16 +94,57 @@ class TaskDisplay(Tkinter.Frame):
         """
         self.subtask_displays.append(subtask_display.SubTaskDisplay(self, subtask))
 
-    def add_week(self, _week):
-        self.week_displays.append(week_display.WeekDisplay(self.parent, _week, self.row_id, _week.index))
-
     def archive_self(self):
         self.task.archived = True
         self.parent.update()
 
+    def refresh(self, row_id, show=True):
+        """
+        Reconcile this display with its task without recreating it.
+        Creates displays for new subtasks, moves the task if its row has changed and reconfigures only the labels
+        whose values are out of date. The task's weeks are drawn by the WeekGrid.
+        :param int row_id: Row the task should now be displayed in.
+        :param bool show: Whether the task is within the visible part of the grid.
+        """
+        moved = row_id != self.row_id
+        self.row_id = row_id
+
+        if self.task.task_name != self.name:
+            self.name = self.task.task_name
+            self.task_name.configure(text=self.name)
+
+        # Subtasks are only ever appended (or removed from the end by undo), so anything beyond the existing displays is
+        # new.
+        while len(self.subtask_displays) > len(self.task.subtasks):
+            self.subtask_displays.pop().destroy()
+        for subtask in self.task.subtasks[len(self.subtask_displays):]:
+            self.add_subtask_display(subtask)
+            self.subtask_displays[-1].draw(len(self.subtask_displays) - 1 + self.SUBTASK_ROW_OFFSET,
+                                           self.TOTAL_COLUMN_OFFSET)
+
+        for _subtask_display, total_spent in zip(self.subtask_displays, self.task.get_total_subtask_times()):
+            _subtask_display.refresh(total_spent)
+
+        total_spent = self.task.get_total_time_spent()
+        estimate = self.task.estimate
+        if total_spent != self.total_spent or estimate != self.estimate:
+            self.total_spent = total_spent
+            self.estimate = estimate
+            self.spent_value.configure(text=str(total_spent))
+            self.estimate_entry.configure(text=str(estimate))
+            self.remaining_value.configure(text=str(estimate - total_spent))
+
+        if show and (moved or not self.shown):
+            self.grid(row=self.row_id + ROW_OFFSET, sticky=Tkinter.W)
+            self.shown = True
+        elif not show and self.shown:
+            self.grid_remove()
+            self.shown = False
+
     def draw(self):
         # Draw task details onto main grid in correct row based on defined task order.
         self.grid(row=self.row_id + ROW_OFFSET, sticky=Tkinter.W)
+        self.shown = True
         # Draw task label in sub-grid that belongs to this task.
         self.task_name.grid(row=1, sticky=Tkinter.W)
         # Draw add subtask button next to label.
@@ -128,15 +165,10 @@ class TaskDisplay(Tkinter.Frame):
             _subtask.draw(row, self.TOTAL_COLUMN_OFFSET)
 
     def gather_input(self):
-        if not self.task.archived:
-            logging.debug("Gathering input from entries.")
-            for _week_display in self.week_displays:
-                _week_display.update_values()
-
-            for _subtask_display in self.subtask_displays:
-                _subtask_display.gather_input()
-
-        # Archive the tasks if it has been flagged for archiving
-        if self.task.archive_after_update:
-            self.task.archived = False
-            self.task.archive_after_update = False
+        """
+        Store the subtask estimates entered against this task.
+        Week values are gathered separately by the parent, from only those week displays that have been edited.
+        """
+        logging.debug("Gathering input from entries.")
+        for _subtask_display in self.subtask_displays:
+            _subtask_display.gather_input()
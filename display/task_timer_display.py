@@ -1,25 +1,29 @@
 import Tkinter
 import logging
-import time
+import live_timer
 
 
 class TaskTimer(Tkinter.Toplevel):
     """
-    Window that contains a timer to actively track time against a task.
+    Window that contains a timer to actively track time against a subtask.
+    The timer itself is run by the tracker display's live_timer.TimerManager, which refreshes this window as it ticks.
     """
-    def __init__(self, parent, _task):
+    def __init__(self, parent, timer):
         """
         :param TrackerDisplay parent: Parent Tkinter object.
-        :param task.Task _task: Task to actively track time for.
+        :param live_timer.Timer timer: Timer to show.
         """
         self.parent = parent
-        self.task = _task
-        self.last_unpause_time = 0
-        self.total_time_tracked = 0
-        self.paused = False
+        self.timer = timer
+        # The text and state currently shown, so that the widgets are only reconfigured when they change.
+        self.timer_text = ""
+        self.running = None
 
         Tkinter.Toplevel.__init__(self, parent)
-        self.wm_title(str(_task))
+        self.wm_title("%s: %s" % (timer.task, timer.subtask.name))
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.timer_label = Tkinter.Label(self, width=16)
 
         self.pause_timer_button = Tkinter.Button(self,
                                                  text="Pause",
@@ -29,25 +33,42 @@ class TaskTimer(Tkinter.Toplevel):
                                                  text="Start",
                                                  command=self.start_timer)
 
-        self.rounded_timer_entry = Tkinter.Entry(self, width=5)
+        self.timer_label.pack()
+        self.start_timer_button.pack(side=Tkinter.LEFT)
+        self.pause_timer_button.pack(side=Tkinter.RIGHT)
 
-        self.timer_text = Tkinter.StringVar()
-        self.timer_label = Tkinter.Label(self, textvariable=self.timer_text)
+        self.parent.timers.add_listener(self.update_timer_label)
+        self.update_timer_label()
 
     def pause_timer(self):
-        self.total_time_tracked += time.time() - self.last_unpause_time
-        self.update_timer_label()
+        logging.debug("Pausing timer for %s" % self.timer.subtask.name)
+        self.parent.timers.pause(self.timer)
 
     def start_timer(self):
-        self.last_unpause_time = time.time()
+        logging.debug("Starting timer for %s" % self.timer.subtask.name)
+        self.parent.timers.start(self.timer)
+
+    def close(self):
+        """
+        Stop the timer, keeping the time it has tracked, and close the window.
+        """
+        self.parent.timers.remove_listener(self.update_timer_label)
+        self.parent.timers.remove_timer(self.timer)
+        del self.parent.timer_windows[self.timer]
+        self.destroy()
 
     def update_timer_label(self):
         """
-        Updates the label that displays the current length that the timer has been running.
+        Updates the label that displays the current length that the timer has been running, and which buttons are
+        enabled.
         """
-        temp_total_time = self.total_time_tracked
-        if not self.paused:
-            temp_total_time += time.time() - self.last_unpause_time
+        timer_text = live_timer.format_elapsed(self.timer.get_elapsed())
+        if timer_text != self.timer_text:
+            self.timer_text = timer_text
+            self.timer_label.configure(text=timer_text)
 
-        temp_total_time_str = time.strftime("%Hhr %Mmin", time.localtime(temp_total_time))
-        self.timer_text.set(temp_total_time_str)
+        running = not self.timer.paused
+        if running != self.running:
+            self.running = running
+            self.start_timer_button.configure(state=Tkinter.DISABLED if running else Tkinter.NORMAL)
+            self.pause_timer_button.configure(state=Tkinter.NORMAL if running else Tkinter.DISABLED)
@@ -1,12 +1,19 @@
 import Tkinter
 import logging
-from misc_display_functions import prompt_for_value
+import time
+from misc_display_functions import prompt_for_value, ROW_OFFSET, COLUMN_OFFSET
 import task_display
-import week_display
+import task_timer_display
+import week_grid
 import archive_display
+import live_timer
 
 
 class TrackerDisplay(Tkinter.Frame):
+    # Size of the viewport onto the grid of tasks and weeks. Only these (plus a small overscan) have widgets.
+    VISIBLE_TASKS = 15
+    VISIBLE_WEEKS = 12
+
     def __init__(self, parent, _tracker):
         """
         :param Tkinter.Tk parent: Tkinter root.
@@ -48,26 +55,38 @@ class TrackerDisplay(Tkinter.Frame):
                                           text="Load",
                                           command=self._load)
 
+        # Shown while loading in the background.
+        self.load_progress_label = Tkinter.Label(self.button_frame)
+
         self.archive_display = None
 
-        self.parent.bind('<Return>', self.update)
+        # Scrollbars for the task rows and week columns. The first week shown is the tracker's archived week index.
+        self.task_scrollbar = Tkinter.Scrollbar(self, orient=Tkinter.VERTICAL, command=self.scroll_tasks)
+        self.week_scrollbar = Tkinter.Scrollbar(self, orient=Tkinter.HORIZONTAL, command=self.scroll_weeks)
+        self.first_task_row = 0
 
+        self.parent.bind('<Return>', self.update)
+        self.parent.bind('<Control-z>', self.undo)
+        self.parent.bind('<Control-y>', self.redo)
+        self.parent.bind('<Control-Shift-Z>', self.redo)
+        self.parent.bind('<MouseWheel>', self._on_mouse_wheel)
+        self.parent.bind('<Shift-MouseWheel>', self._on_mouse_wheel)
+        self.parent.bind('<Button-4>', self._on_mouse_wheel)
+        self.parent.bind('<Button-5>', self._on_mouse_wheel)
+        self.parent.bind('<Shift-Button-4>', self._on_mouse_wheel)
+        self.parent.bind('<Shift-Button-5>', self._on_mouse_wheel)
+
+        # {task.Task: task_display.TaskDisplay}, for tasks within the viewport (and overscan) only.
         self.task_displays = {}
-        self.week_labels = []
-
-        for task_name in self.tracker.task_order:
-            self.add_task_display(task_name)
-
-        for week_index in range(self.tracker.week_index):
-            self.add_week_label(self.tracker.get_week_name(week_index), week_index)
-
-        for week_index, week_label in enumerate(self.week_labels):
-            counter = 0
-            for _task_display in self.task_displays.itervalues():
-                counter += _task_display.task.get_time_for_week(week_index)
+        self.week_grid = week_grid.WeekGrid(self)
+        # Week displays that have been typed into since their values were last gathered.
+        self.dirty_week_displays = set()
 
-            week_label.update_to_value(counter)
+        # Timers for tracking time live, all driven by one Tk timer. Each has a window while it exists.
+        self.timers = live_timer.TimerManager(self.tracker, self.parent)
+        self.timer_windows = {}  # {live_timer.Timer: task_timer_display.TaskTimer}
 
+        self.refresh()
         self.draw()
 
     def add_task(self, name):
@@ -85,13 +104,58 @@ class TrackerDisplay(Tkinter.Frame):
         _task, task_index = self.tracker.get_task_and_index(task_name)
         self.task_displays[_task] = task_display.TaskDisplay(self, _task, task_index)
 
-    def add_week_label(self, week_name, week_index):
-        logging.debug("Adding week label at index %d, with name %s" % (week_index, week_name))
-        self.week_labels.append(week_display.WeekLabel(self, week_name, week_index))
+    def remove_task_display(self, _task):
+        logging.debug("Removing task display for task %s" % _task)
+        _task_display = self.task_displays.pop(_task)
+        _task_display.gather_input()
+        _task_display.destroy()
+
+    def scroll_tasks(self, *args):
+        """
+        Called by the task scrollbar. Moves the viewport up or down the list of tasks.
+        :param args: Scrollbar command arguments.
+        """
+        total = len(self.get_displayed_tasks())
+        self.first_task_row = week_grid.scroll_position(args, self.first_task_row, self.VISIBLE_TASKS, total)
+        self.refresh()
+
+    def scroll_weeks(self, *args):
+        """
+        Called by the week scrollbar. Moves the viewport along the weeks, changing which weeks are archived.
+        :param args: Scrollbar command arguments.
+        """
+        self.tracker.archived_week_index = week_grid.scroll_position(args,
+                                                                     self.tracker.archived_week_index,
+                                                                     self.VISIBLE_WEEKS,
+                                                                     self.tracker.week_index)
+        self.refresh()
+
+    def _on_mouse_wheel(self, event):
+        """
+        Scroll the tasks with the mouse wheel, or the weeks if shift is held.
+        :param event: Tkinter event. Windows supplies the wheel direction in delta, X11 uses buttons 4 and 5.
+        """
+        if event.num == 4 or event.delta > 0:
+            units = -1
+        else:
+            units = 1
 
-    def add_week_slot(self, _task, week):
-        logging.debug("Adding week slot to task %s for week %s" % (_task, week))
-        self.task_displays[_task].add_week(week)
+        if event.state & 0x1:  # Shift
+            self.scroll_weeks('scroll', units, 'units')
+        else:
+            self.scroll_tasks('scroll', units, 'units')
+
+    def get_displayed_tasks(self):
+        """
+        Gets the tasks that can be displayed, i.e. those that are not archived.
+        :return list: List of (row_id, task.Task) in task order.
+        """
+        displayed = []
+        for row_id, task_name in enumerate(self.tracker.task_order):
+            _task = self.tracker.tasks[task_name]
+            if not _task.archived:
+                displayed.append((row_id, _task))
+        return displayed
 
     def increment_week_archive(self):
         """
@@ -121,19 +185,84 @@ class TrackerDisplay(Tkinter.Frame):
         """
         self.archive_display.destroy()
 
+    def copy_week_summary_to_clipboard(self, week_index):
+        """
+        Copy a summary of a week's tracking to the system clipboard.
+        :param int week_index: Index of the week to summarise.
+        """
+        self.parent.clipboard_clear()
+        self.parent.clipboard_append(self.tracker.create_weekly_summary(week_index))
+
+    def undo(self, _=None):
+        """
+        Undo the last change. Anything typed but not yet stored counts as the last change.
+        :param _: Dummy parameter. Tkinter passes in the event object that we don't care about.
+        """
+        logging.debug("Undoing...")
+        self.update()
+        self.tracker.undo()
+
+    def redo(self, _=None):
+        """
+        Redo the last change that was undone.
+        :param _: Dummy parameter. Tkinter passes in the event object that we don't care about.
+        """
+        logging.debug("Redoing...")
+        self.update()
+        self.tracker.redo()
+
+    def open_timer(self, _task, _subtask):
+        """
+        Show the timer for a subtask, opening a window for it if it doesn't have one already.
+        :param task.Task _task:
+        :param subtask.Subtask _subtask:
+        """
+        timer = self.timers.get_timer(_task, _subtask)
+        if timer not in self.timer_windows:
+            self.timer_windows[timer] = task_timer_display.TaskTimer(self, timer)
+
+    def stop_timers(self):
+        """
+        Pause every timer, adding the time they have tracked to the tracker, e.g. before closing.
+        """
+        self.timers.stop()
+
     def _save(self):
         """
-        Called when the save button is pressed. Triggers Tracker object to save.
+        Called when the save button is pressed. Triggers Tracker object to save, including time tracked by any running
+        timers.
         """
         logging.debug("Saving...")
+        self.timers.flush_all()
         self.tracker.save()
 
     def _load(self):
         """
-        Called when the load button is pressed. Triggers Tracker object to load.
+        Called when the load button is pressed. Triggers Tracker object to load in the background, filling in the
+        display as tasks are loaded.
         """
-        self.tracker.load()
-        self.tracker.update()
+        logging.debug("Loading...")
+        # The timers' tasks are about to be replaced.
+        for window in self.timer_windows.values():
+            window.close()
+        self.load_button.configure(state=Tkinter.DISABLED)
+        self.tracker.load_in_background(self.parent, self.show_load_progress)
+        self.refresh()
+
+    def show_load_progress(self, loaded_count, task_count, finished):
+        """
+        Called as each batch of tasks is loaded in the background. Shows the tasks loaded so far, and the progress.
+        :param int loaded_count: Number of tasks loaded so far.
+        :param int task_count: Total number of tasks to load, or None if not yet known.
+        :param bool finished: Whether loading has finished.
+        """
+        if finished:
+            self.load_progress_label.pack_forget()
+            self.load_button.configure(state=Tkinter.NORMAL)
+        else:
+            self.load_progress_label.configure(text="Loading %d/%s tasks" % (loaded_count, task_count or "?"))
+            self.load_progress_label.pack(side=Tkinter.LEFT)
+        self.refresh()
 
     def draw(self):
         """
@@ -152,17 +281,92 @@ class TrackerDisplay(Tkinter.Frame):
 
         self.button_frame.grid(row=0, column=0, sticky=Tkinter.W)
 
+    def refresh(self):
+        """
+        Reconcile the displayed widgets with the tracker.
+        Rather than rebuilding the UI, only the widgets affected by changes to the tracker are created, moved,
+        reconfigured or destroyed.
+        """
+        start_time = time.time()
+
+        displayed_tasks = self.get_displayed_tasks()
+        self.first_task_row = max(min(self.first_task_row, len(displayed_tasks) - self.VISIBLE_TASKS), 0)
+
+        row_window, shown_row_window = self.week_grid.window(self.first_task_row,
+                                                             self.VISIBLE_TASKS,
+                                                             len(displayed_tasks))
+        rows = [displayed_tasks[i] for i in row_window]
+        shown_rows = set(displayed_tasks[i][0] for i in shown_row_window)
+
+        # Remove displays for tasks that have left the viewport, been archived, or no longer exist (e.g. after loading).
+        wanted_tasks = set(_task for _, _task in rows)
+        for _task in self.task_displays.keys():
+            if _task not in wanted_tasks:
+                self.remove_task_display(_task)
+
+        for row_id, _task in rows:
+            if _task not in self.task_displays:
+                self.add_task_display(_task.task_name)
+            self.task_displays[_task].refresh(row_id, row_id in shown_rows)
+
+        columns, shown_columns = self.week_grid.window(self.tracker.archived_week_index,
+                                                       self.VISIBLE_WEEKS,
+                                                       self.tracker.week_index)
+        self.week_grid.refresh(rows, shown_rows, columns, shown_columns)
+
+        self.draw_scrollbars(shown_rows, shown_columns, len(displayed_tasks))
+
+        logging.debug("Refreshed UI in %.1fms" % ((time.time() - start_time) * 1000))
+
+    def draw_scrollbars(self, shown_rows, shown_columns, total_tasks):
+        """
+        Place the scrollbars alongside the visible part of the grid and update their positions.
+        :param set shown_rows: Row IDs that are within the viewport.
+        :param xrange shown_columns: Week indexes that are within the viewport.
+        :param int total_tasks: Number of tasks that can be displayed.
+        """
+        if shown_rows:
+            self.task_scrollbar.grid(row=min(shown_rows) + ROW_OFFSET,
+                                     column=COLUMN_OFFSET - 1,
+                                     rowspan=max(shown_rows) - min(shown_rows) + 1,
+                                     sticky=Tkinter.N + Tkinter.S)
+        else:
+            self.task_scrollbar.grid_remove()
+
+        if shown_columns:
+            self.week_scrollbar.grid(row=ROW_OFFSET - 1,
+                                     column=shown_columns[0] + COLUMN_OFFSET,
+                                     columnspan=len(shown_columns),
+                                     sticky=Tkinter.E + Tkinter.W)
+        else:
+            self.week_scrollbar.grid_remove()
+
+        week_grid.set_scrollbar(self.task_scrollbar, self.first_task_row, self.VISIBLE_TASKS, total_tasks)
+        week_grid.set_scrollbar(self.week_scrollbar,
+                                self.tracker.archived_week_index,
+                                self.VISIBLE_WEEKS,
+                                self.tracker.week_index)
+
     def update(self, _=None):
         """
-        Trigger re-draw of the entire UI.
-        Also gathers the input in all of the entries and stores it.
+        Trigger a refresh of the UI.
+        Also gathers the input in all of the edited entries and stores it.
         :param _: Dummy parameter. Tkinter passes in the event object that we don't care about.
         """
-        logging.debug("Updating entire UI...")
-        # Gather the data entered in each entry and store it.
+        logging.debug("Updating UI...")
+        # Gather the data entered in each edited entry and store it.
+        for _week_display in self.dirty_week_displays:
+            _week_display.update_values()
+        self.dirty_week_displays.clear()
+
         for _task_display in self.task_displays.itervalues():
             _task_display.gather_input()
 
-        # Trigger redrawing of entire UI
+        # Restore any tasks that have been flagged for un-archiving
+        for _task in self.tracker.get_archived_task_list():
+            if _task.archive_after_update:
+                _task.archived = False
+                _task.archive_after_update = False
+
         self.tracker.update()
 
@@ -11,6 +11,7 @@ class WeekDisplay(Tkinter.Frame):
         """
         Displays a single task/week grid space.
         Has an entry per subtask (and one for the general task).
+        Week displays are recycled by the WeekGrid as the user scrolls, so the week drawn can be changed with assign.
         :param TrackerDisplay parent: Tkinter Frame within which this frame resides.
         :param weekslot.WeekSlot _week: Datastore that this class will draw.
         """
@@ -23,32 +24,117 @@ class WeekDisplay(Tkinter.Frame):
         for i in range(self.ENTRY_ROW_OFFSET):
             self.rowconfigure(i, minsize=self.ROW_HEIGHT)
 
-        self.row_index = row_index
-        self.column_index = column_index
+        # Entries are kept when a week with fewer subtasks is assigned, so only the first entry_count are in use.
+        self.entries = []
+        self.entry_values = []  # Tkinter.StringVar per entry, traced so we know which weeks have been edited.
+        self.entry_count = 0
+
+        # The values currently shown in the entries, used to spot changes made to the week outside of this display.
+        self.values = []
+        # Whether the user has typed into any entry since the values were last gathered.
+        self.dirty = False
+        self._writing = False
+        # Whether this week display is currently gridded.
+        self.shown = False
 
+        self.week = None
+        self.row_index = None
+        self.column_index = None
+        self.assign(_week, row_index, column_index)
+
+    def assign(self, _week, row_index, column_index):
+        """
+        Point this display at a (possibly different) week, reusing the existing entry widgets.
+        Any edits to the previously assigned week must have been gathered first.
+        :param weekslot.WeekSlot _week: Week to draw.
+        :param int row_index: Row of the task that owns the week.
+        :param int column_index: Column (global week index) to draw the week in.
+        """
         self.week = _week
-        self.entries = []
+        self.row_index = row_index
+        self.column_index = column_index
+        self.dirty = False
 
-        # Add a subtask text entry box for each value in the week.
-        for time in self.week.time_tracked:
-            self.add_subtask(time)
+        # Hide any entries not needed by this week. The rest are rewritten by the next refresh.
+        for entry in self.entries[len(_week.time_tracked):self.entry_count]:
+            entry.grid_remove()
+        self.entry_count = min(self.entry_count, len(_week.time_tracked))
+        self.values = [None] * self.entry_count
 
-        # Only display if this week is not archived.
-        if self.column_index >= self.parent.tracker.archived_week_index:
+        if self.shown:
             self.draw()
-        else:
-            logging.debug("Not displaying week slot in column %d because it is archived." % self.column_index)
 
     def add_subtask(self, init_value):
         """
-        Creates a new entry field for the new subtask.
+        Shows an entry field for a new subtask. Reuses a hidden entry if there is one.
         :param float init_value: Initial value for the entry to be filled with.
         """
-        new_entry = Tkinter.Entry(self, width=5)
-        if init_value != 0:
-            # insert the supplied value into the entry. Leave blank if value is 0
-            new_entry.insert(0, str(init_value))
-        self.entries.append(new_entry)
+        if self.entry_count == len(self.entries):
+            value = Tkinter.StringVar(self)
+            value.trace('w', self._mark_dirty)
+            self.entry_values.append(value)
+            self.entries.append(Tkinter.Entry(self, width=5, textvariable=value))
+
+        index = self.entry_count
+        self.entry_count += 1
+        self.values.append(0)
+        self._set_entry(index, init_value)
+
+        if self.shown:
+            self.entries[index].grid(row=index + self.ENTRY_ROW_OFFSET, pady=5)
+
+    def _set_entry(self, index, value):
+        """
+        Show a value in an entry without marking this week as edited.
+        :param int index: Index of the entry to set.
+        :param float value: Value to show. 0 is shown as a blank entry.
+        """
+        self.values[index] = value
+        self._writing = True
+        # insert the supplied value into the entry. Leave blank if value is 0
+        self.entry_values[index].set(str(value) if value != 0 else "")
+        self._writing = False
+
+    def _mark_dirty(self, *_):
+        """
+        Called whenever the text of one of the entries changes.
+        Registers this week display with the parent so only edited weeks are gathered on the next update.
+        :param _: Dummy parameters. Tkinter passes in the variable name, index and mode that we don't care about.
+        """
+        if not self.dirty and not self._writing:
+            self.dirty = True
+            self.parent.dirty_week_displays.add(self)
+
+    def refresh(self, row_index, show):
+        """
+        Reconcile this display with the week object it draws.
+        Only touches widgets that are out of date: entries are added for new subtasks, changed values are written
+        into the entries and the frame is moved, shown or hidden as required.
+        :param int row_index: Row that the owning task is now displayed in.
+        :param bool show: Whether the week is within the visible part of the grid.
+        """
+        # Add entries for any subtasks added since the last refresh, and hide any that have been removed (e.g. by undo).
+        for time in self.week.time_tracked[self.entry_count:]:
+            self.add_subtask(time)
+        for entry in self.entries[self.week.width:self.entry_count]:
+            entry.grid_remove()
+        if self.entry_count > self.week.width:
+            self.entry_count = self.week.width
+            del self.values[self.entry_count:]
+
+        # Pick up any values that were changed in the week object rather than typed into this display.
+        if not self.dirty and self.values != self.week.time_tracked:
+            for index, time in enumerate(self.week.time_tracked):
+                if time != self.values[index]:
+                    self._set_entry(index, time)
+
+        moved = row_index != self.row_index
+        self.row_index = row_index
+
+        if show and (moved or not self.shown):
+            self.draw()
+        elif not show and self.shown:
+            self.hide()
 
     def draw(self):
         """
@@ -59,16 +145,28 @@ class WeekDisplay(Tkinter.Frame):
                   column=self.column_index + COLUMN_OFFSET,
                   sticky=Tkinter.N)
 
-        for index, entry in enumerate(self.entries):
+        for index, entry in enumerate(self.entries[:self.entry_count]):
             entry.grid(row=index + self.ENTRY_ROW_OFFSET, pady=5)
+        self.shown = True
+
+    def hide(self):
+        """
+        Removes this week display from the grid, keeping its widgets so it can be shown again or recycled.
+        """
+        self.grid_remove()
+        self.shown = False
 
     def update_values(self):
         """
         Gather the values from the displayed entries and put into the week object.
+        Does nothing if none of the entries have been edited since the last time values were gathered.
         """
+        if not self.dirty:
+            return
+
         logging.debug("Updating values for week slot in row %d, column %d" % (self.row_index, self.column_index))
         values = []
-        for entry in self.entries:
+        for entry in self.entries[:self.entry_count]:
             # Try convert the string value stored in the entry to a float. If this fails, assume it is 0.
             # Specifically this covers the case where the field is an empty string which signifies 0.
             try:
@@ -78,6 +176,8 @@ class WeekDisplay(Tkinter.Frame):
             values.append(float_value)
 
         self.week.update_values(values)
+        self.values = values
+        self.dirty = False
 
 
 class WeekLabel(Tkinter.Button):
@@ -96,14 +196,41 @@ class WeekLabel(Tkinter.Button):
         self.text = Tkinter.StringVar()
         Tkinter.Button.__init__(self, parent, textvariable=self.text, command=self.copy_summary)
 
+        self.date_string = None
+        self.column_index = None
+        self.value = None
+        self.shown = False
+
+        self.assign(date_string, column_index)
+
+    def assign(self, date_string, column_index):
+        """
+        Point this label at a (possibly different) week column.
+        :param str date_string: Date in string format
+        :param int column_index: Grid index to draw this label.
+        """
         self.date_string = date_string
         self.column_index = column_index
+        self.value = None
 
-        # Only display if this week is not archived.
-        if self.column_index >= parent.tracker.archived_week_index:
+        if self.shown:
             self.draw()
-        else:
-            logging.debug("Not displaying week label in column %d because it is archived." % self.column_index)
+
+    def refresh(self, date_string, value, show):
+        """
+        Reconcile this label with the tracker. Only reconfigures the label if its text has changed.
+        :param str date_string: Date in string format.
+        :param float value: Value to display.
+        :param bool show: Whether the week is within the visible part of the grid.
+        """
+        if date_string != self.date_string or value != self.value:
+            self.date_string = date_string
+            self.update_to_value(value)
+
+        if show and not self.shown:
+            self.draw()
+        elif not show and self.shown:
+            self.hide()
 
     def update_to_value(self, value):
         """
@@ -112,6 +239,7 @@ class WeekLabel(Tkinter.Button):
         :return:
         """
         logging.debug("Updating week label %s to value %.2f" % (self.date_string, value))
+        self.value = value
         if value == 5:
             self.text.set("%s" % self.date_string)
         else:
@@ -123,9 +251,17 @@ class WeekLabel(Tkinter.Button):
         :return:
         """
         self.grid(row=0, column=self.column_index + COLUMN_OFFSET)
+        self.shown = True
+
+    def hide(self):
+        """
+        Removes this label from the grid, keeping it so it can be shown again or recycled.
+        """
+        self.grid_remove()
+        self.shown = False
 
     def copy_summary(self):
         """
         When the week label is clicked, copy a summary of the weeks tracking to the system clipboard.
         """
-        self.parent.tracker.copy_week_summary_to_clipboard(self.column_index)
+        self.parent.copy_week_summary_to_clipboard(self.column_index)
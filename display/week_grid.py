@@ -0,0 +1,151 @@
+import logging
+import week_display
+
+
+class WeekGrid(object):
+    """
+    Manages the week displays and week labels of a TrackerDisplay as a virtualized (windowed) grid.
+    Widgets only exist for the tasks and weeks in the viewport, plus a small overscan either side which is kept
+    hidden so that scrolling by a row or column doesn't have to fill in new entries.
+    Widgets that leave the window are recycled for the weeks that enter it, rather than being destroyed.
+    """
+    OVERSCAN = 2
+
+    def __init__(self, parent):
+        """
+        :param TrackerDisplay parent: Tkinter Frame that the week displays and labels are drawn in.
+        """
+        self.parent = parent
+
+        self.week_displays = {}  # {(task.Task, week_index): week_display.WeekDisplay}
+        self.week_labels = {}  # {week_index: week_display.WeekLabel}
+        self.free_week_displays = []
+        self.free_week_labels = []
+
+    def window(self, first, visible, total):
+        """
+        Works out which indexes should have widgets, and which of those should be shown.
+        :param int first: First index in the viewport.
+        :param int visible: Number of indexes in the viewport.
+        :param int total: Number of indexes that exist.
+        :return tuple: (materialized indexes, shown indexes) as xrange objects.
+        """
+        materialized = xrange(max(first - self.OVERSCAN, 0), min(first + visible + self.OVERSCAN, total))
+        shown = xrange(max(first, 0), min(first + visible, total))
+        return materialized, shown
+
+    def refresh(self, rows, shown_rows, columns, shown_columns):
+        """
+        Reconcile the week displays and labels with the tracker for the current viewport.
+        :param list rows: List of (row_id, task.Task) for every task row that should have widgets.
+        :param set shown_rows: Row IDs that are within the viewport.
+        :param xrange columns: Week indexes that should have widgets.
+        :param xrange shown_columns: Week indexes that are within the viewport.
+        """
+        tracker = self.parent.tracker
+
+        wanted = {}
+        for row_id, _task in rows:
+            for week_index in columns:
+                _week = _task.get_weekslot(week_index)
+                if _week is not None:
+                    wanted[(_task, week_index)] = (_week, row_id)
+
+        # Release week displays that have left the window so they can be recycled.
+        for key in self.week_displays.keys():
+            if key not in wanted:
+                self.release_week_display(key)
+
+        for key, (_week, row_id) in wanted.iteritems():
+            _week_display = self.week_displays.get(key)
+            if _week_display is None:
+                _week_display = self.acquire_week_display(key, _week, row_id)
+            _week_display.refresh(row_id, row_id in shown_rows and key[1] in shown_columns)
+
+        for week_index in self.week_labels.keys():
+            if week_index not in columns:
+                self.free_week_labels.append(self.week_labels.pop(week_index))
+                self.free_week_labels[-1].hide()
+
+        for week_index in columns:
+            week_name = tracker.get_week_name(week_index)
+            week_label = self.week_labels.get(week_index)
+            if week_label is None:
+                week_label = self.acquire_week_label(week_name, week_index)
+
+            week_label.refresh(week_name, tracker.get_week_total(week_index), week_index in shown_columns)
+
+    def acquire_week_display(self, key, _week, row_id):
+        """
+        Get a week display for a week entering the window, recycling a free one if possible.
+        :param tuple key: (task.Task, week_index) the week display is for.
+        :param weekslot.WeekSlot _week: Week to display.
+        :param int row_id: Row of the task that owns the week.
+        :return week_display.WeekDisplay:
+        """
+        if self.free_week_displays:
+            _week_display = self.free_week_displays.pop()
+            _week_display.assign(_week, row_id, key[1])
+        else:
+            _week_display = week_display.WeekDisplay(self.parent, _week, row_id, key[1])
+        self.week_displays[key] = _week_display
+        return _week_display
+
+    def release_week_display(self, key):
+        """
+        Hide a week display that has left the window and keep it for reuse. Any edits are stored first.
+        :param tuple key: (task.Task, week_index) the week display is for.
+        """
+        _week_display = self.week_displays.pop(key)
+        _week_display.update_values()
+        self.parent.dirty_week_displays.discard(_week_display)
+        _week_display.hide()
+        self.free_week_displays.append(_week_display)
+
+    def acquire_week_label(self, week_name, week_index):
+        """
+        Get a label for a week column entering the window, recycling a free one if possible.
+        :param str week_name: Date of the week in string format.
+        :param int week_index: Index of the week.
+        :return week_display.WeekLabel:
+        """
+        if self.free_week_labels:
+            week_label = self.free_week_labels.pop()
+            week_label.assign(week_name, week_index)
+        else:
+            logging.debug("Adding week label at index %d, with name %s" % (week_index, week_name))
+            week_label = week_display.WeekLabel(self.parent, week_name, week_index)
+        self.week_labels[week_index] = week_label
+        return week_label
+
+
+def scroll_position(args, first, visible, total):
+    """
+    Translates the arguments of a Tkinter.Scrollbar command into a new first index.
+    :param tuple args: Either ('moveto', fraction) or ('scroll', number, 'units' or 'pages').
+    :param int first: Current first index in the viewport.
+    :param int visible: Number of indexes in the viewport.
+    :param int total: Number of indexes that exist.
+    :return int: New first index, clamped so the viewport stays full where possible.
+    """
+    if args[0] == 'moveto':
+        first = int(round(float(args[1]) * total))
+    elif args[0] == 'scroll':
+        step = visible if args[2] == 'pages' else 1
+        first += int(args[1]) * step
+
+    return max(min(first, total - visible), 0)
+
+
+def set_scrollbar(scrollbar, first, visible, total):
+    """
+    Update a scrollbar to show the viewport.
+    :param Tkinter.Scrollbar scrollbar: Scrollbar to update.
+    :param int first: First index in the viewport.
+    :param int visible: Number of indexes in the viewport.
+    :param int total: Number of indexes that exist.
+    """
+    if total == 0:
+        scrollbar.set(0, 1)
+    else:
+        scrollbar.set(float(first) / total, min(float(first + visible) / total, 1))
@@ -0,0 +1,273 @@
+import argparse
+import array
+import csv
+import logging
+import os
+import struct
+import sys
+
+import binary_datastore
+import datastore
+import journal_datastore
+import sqlite_datastore
+import tracker
+
+"""
+Exports all of the time tracked in a tracker as a table in long format, one row per subtask per week with time tracked:
+(task name, subtask name, week index, week date, hours, estimate)
+The week date is the week's name, as shown in the display (see tracker.Tracker.get_week_name). Rows are generated a
+task at a time and written as they are produced, so the table is never held in memory.
+
+Two formats are supported, chosen by the output file's extension:
+.csv:  Comma separated values with a header row, e.g. for spreadsheets.
+.trkc: Compact columnar format, laid out as follows. All numbers are little-endian.
+       header:    magic ('TRKC'), version (uint16), reserved (uint16)
+       row group: Repeated until the end of the file, each holding up to ROW_GROUP_SIZE rows:
+                  row count (uint32), number of new strings (uint32),
+                  new strings: for each, length in bytes (uint16) then UTF-8 bytes. Strings are numbered in the order
+                               they first appear in the file, and the task, subtask and week date columns hold these
+                               numbers rather than repeating the strings.
+                  task: uint32 per row, subtask: uint32 per row, week index: int32 per row,
+                  week date: uint32 per row, hours: float64 per row, estimate: float64 per row.
+Run as:
+python export.py <tracker file> <output file> [--first-week <index>] [--last-week <index>]
+                 [--archived include|exclude|only] [--task <task name> ...] [--force]
+"""
+
+COLUMNS = ('task', 'subtask', 'week_index', 'week_date', 'hours', 'estimate')
+
+CSV_EXTENSIONS = ('.csv',)
+COLUMNAR_EXTENSIONS = ('.trkc',)
+
+MAGIC = 'TRKC'
+VERSION = 1
+HEADER = struct.Struct('<4sHH')
+ROW_GROUP_HEADER = struct.Struct('<II')
+STRING_LENGTH = struct.Struct('<H')
+ROW_GROUP_SIZE = 4096
+
+# Array type codes of the columns in the columnar format.
+COLUMN_TYPES = ('I', 'I', 'i', 'I', 'd', 'd')
+STRING_COLUMNS = (0, 1, 3)  # Columns that hold string numbers.
+NUMBER_COLUMNS = (2, 4, 5)
+
+
+def is_columnar_file(filename):
+    return os.path.splitext(filename)[1].lower() in COLUMNAR_EXTENSIONS
+
+
+def open_datastore(filename):
+    """
+    Opens a tracker file in any format, choosing the datastore by the file's extension.
+    :param str filename: Tracker file.
+    :return datastore.DataStore:
+    """
+    if sqlite_datastore.is_sqlite_file(filename):
+        return sqlite_datastore.SqliteDataStore(filename)
+    if binary_datastore.is_binary_file(filename):
+        return binary_datastore.BinaryDataStore(filename)
+    # Includes any changes journalled since the .trk file was last written.
+    return journal_datastore.JournalDataStore(filename)
+
+
+def open_tracker(filename):
+    """
+    Loads a tracker from a file in any format, without a display.
+    :param str filename: Tracker file.
+    :return tracker.Tracker:
+    """
+    return tracker.Tracker(open_datastore(filename))
+
+
+def iter_rows(_tracker, first_week=None, last_week=None, archived='include', task_names=None):
+    """
+    Generates the rows of the table, a task at a time, in task order.
+    :param tracker.Tracker _tracker: Tracker to export.
+    :param int first_week: Index of the first week to export. Defaults to the first week.
+    :param int last_week: Index of the last week to export, inclusive. Defaults to the latest week.
+    :param str archived: 'include' to export all tasks, 'exclude' to leave out archived tasks, or 'only' to export
+        only archived tasks.
+    :param task_names: Names of the tasks to export. Defaults to all tasks.
+    :return: Generator of (task name, subtask name, week index, week date, hours, estimate) tuples.
+    """
+    if first_week is None:
+        first_week = 0
+    if last_week is None:
+        last_week = _tracker.week_index - 1
+    if task_names is not None:
+        task_names = set(task_names)
+
+    week_dates = {}  # {week_index: week date}, as each is needed.
+    for task_name in list(_tracker.task_order):
+        if task_names is not None and task_name not in task_names:
+            continue
+        _task = _tracker.tasks[task_name]
+        if (archived == 'exclude' and _task.archived) or (archived == 'only' and not _task.archived):
+            continue
+
+        # Checked from the week totals first, so that archived tasks with nothing to export aren't created.
+        if not any(total and first_week <= week_index <= last_week
+                   for week_index, total in _task.get_week_totals().iteritems()):
+            continue
+
+        subtasks = _task.subtasks
+        for _week in _task.weeks:
+            if not first_week <= _week.index <= last_week:
+                continue
+            week_date = week_dates.get(_week.index)
+            if week_date is None:
+                week_date = week_dates[_week.index] = _tracker.get_week_name(_week.index)
+            for _subtask, hours in zip(subtasks, _week.time_tracked):
+                if hours:
+                    yield task_name, _subtask.name, _week.index, week_date, hours, _subtask.estimate
+
+
+def write_csv(rows, output_file):
+    """
+    Writes rows to a CSV file as they are generated.
+    :param rows: Iterable of rows, as produced by iter_rows.
+    :param file output_file: File open for writing in binary mode.
+    :return int: Number of rows written.
+    """
+    writer = csv.writer(output_file)
+    writer.writerow(COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow([encode(value) for value in row])
+        count += 1
+    return count
+
+
+def write_columnar(rows, output_file):
+    """
+    Writes rows to a columnar file, a row group at a time, as they are generated.
+    :param rows: Iterable of rows, as produced by iter_rows.
+    :param file output_file: File open for writing in binary mode.
+    :return int: Number of rows written.
+    """
+    output_file.write(HEADER.pack(MAGIC, VERSION, 0))
+    string_ids = {}  # {string: number}, for every string written so far.
+    count = 0
+
+    columns = [array.array(type_code) for type_code in COLUMN_TYPES]
+    new_strings = []
+    for row in rows:
+        for position in NUMBER_COLUMNS:
+            columns[position].append(row[position])
+        for position in STRING_COLUMNS:
+            string = row[position]
+            string_id = string_ids.get(string)
+            if string_id is None:
+                string_id = string_ids[string] = len(string_ids)
+                new_strings.append(string)
+            columns[position].append(string_id)
+        count += 1
+
+        if len(columns[0]) == ROW_GROUP_SIZE:
+            write_row_group(output_file, columns, new_strings)
+            columns = [array.array(type_code) for type_code in COLUMN_TYPES]
+            new_strings = []
+
+    if len(columns[0]):
+        write_row_group(output_file, columns, new_strings)
+    return count
+
+
+def write_row_group(output_file, columns, new_strings):
+    """
+    :param file output_file:
+    :param list[array.array] columns: Values of each column, in the order of COLUMNS.
+    :param list new_strings: Strings first used in this row group, in the order they were numbered.
+    """
+    output_file.write(ROW_GROUP_HEADER.pack(len(columns[0]), len(new_strings)))
+    for string in new_strings:
+        encoded = encode(string)
+        output_file.write(STRING_LENGTH.pack(len(encoded)))
+        output_file.write(encoded)
+    for column in columns:
+        if sys.byteorder != 'little':
+            column.byteswap()
+        output_file.write(column.tostring())
+
+
+def read_columnar(input_file):
+    """
+    Reads rows back from a columnar file, a row group at a time.
+    :param file input_file: File open for reading in binary mode.
+    :return: Generator of (task name, subtask name, week index, week date, hours, estimate) tuples.
+    """
+    magic, version, _ = HEADER.unpack(input_file.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("Not a columnar export file")
+    if version > VERSION:
+        raise ValueError("Columnar export file is version %d, only up to %d is supported" % (version, VERSION))
+
+    strings = []
+    while True:
+        header = input_file.read(ROW_GROUP_HEADER.size)
+        if not header:
+            return
+        row_count, string_count = ROW_GROUP_HEADER.unpack(header)
+        for _ in range(string_count):
+            length, = STRING_LENGTH.unpack(input_file.read(STRING_LENGTH.size))
+            strings.append(input_file.read(length).decode('utf-8'))
+
+        columns = []
+        for type_code in COLUMN_TYPES:
+            column = array.array(type_code)
+            column.fromstring(input_file.read(column.itemsize * row_count))
+            if sys.byteorder != 'little':
+                column.byteswap()
+            columns.append(column)
+        for position in STRING_COLUMNS:
+            columns[position] = [strings[string_id] for string_id in columns[position]]
+
+        for row in zip(*columns):
+            yield row
+
+
+def encode(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def export(_tracker, output_filename, **filters):
+    """
+    Writes a tracker's time tracked to a CSV or columnar file, chosen by the file's extension.
+    The file is replaced atomically, so a failed export doesn't leave a partial file behind.
+    :param tracker.Tracker _tracker: Tracker to export.
+    :param str output_filename: File to write.
+    :param filters: Any of the filters taken by iter_rows.
+    :return int: Number of rows written.
+    """
+    write = write_columnar if is_columnar_file(output_filename) else write_csv
+    with datastore.open_atomically(output_filename) as output_file:
+        count = write(iter_rows(_tracker, **filters), output_file)
+    logging.debug("Exported %d rows to %s" % (count, output_filename))
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the time tracked in a tracker to a .csv or .trkc file.")
+    parser.add_argument('source')
+    parser.add_argument('destination')
+    parser.add_argument('--first-week', type=int, help="Index of the first week to export.")
+    parser.add_argument('--last-week', type=int, help="Index of the last week to export.")
+    parser.add_argument('--archived', choices=('include', 'exclude', 'only'), default='include',
+                        help="Whether to export archived tasks.")
+    parser.add_argument('--task', action='append', dest='task_names', help="Task to export. Can be repeated.")
+    parser.add_argument('--force', action='store_true', help="Overwrite the destination if it already exists.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        parser.error("%s does not exist" % args.source)
+    if os.path.exists(args.destination) and not args.force:
+        parser.error("%s already exists, use --force to overwrite it" % args.destination)
+
+    export(open_tracker(args.source), args.destination, first_week=args.first_week, last_week=args.last_week,
+           archived=args.archived, task_names=args.task_names)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import Tkinter
+import logging
+import os
+import sys
+
+from autosave import AutoSaver
+from binary_datastore import BinaryDataStore, is_binary_file
+from journal_datastore import JournalDataStore
+from sqlite_datastore import SqliteDataStore, is_sqlite_file
+from tracker import Tracker
+
+"""
+Entry point for the Time Tracker window. Run as:
+python gui.py [<tracker file>]
+Files with an SQLite extension (e.g. .db) are stored in SQLite, .trkb files in the binary format, and anything else in
+the .trk format.
+"""
+
+# logging.basicConfig(level=logging.DEBUG)
+
+save_folder = os.path.join(os.path.expanduser("~"), "Documents", "Status reports")
+filename = "time_tracker.trk"
+
+
+def main(tracker_filename=None):
+    """
+    Open the Time Tracker window and run until it is closed.
+    :param str tracker_filename: File to load from and save to. Defaults to save_folder/filename.
+    """
+    if tracker_filename is None:
+        if not os.path.exists(save_folder):
+            os.makedirs(save_folder)
+        tracker_filename = os.path.join(save_folder, filename)
+    logging.debug("Using tracker file: %s" % tracker_filename)
+
+    root = Tkinter.Tk()
+    root.wm_title("Time Tracker")
+    root.resizable()
+
+    if is_sqlite_file(tracker_filename):
+        datastore = SqliteDataStore(tracker_filename)
+    elif is_binary_file(tracker_filename):
+        datastore = BinaryDataStore(tracker_filename)
+    else:
+        datastore = JournalDataStore(tracker_filename)
+    tracker = Tracker(datastore)
+    tracker_display = tracker.attach_display(root)
+    # Time tracked by any timers still running when the app last stopped.
+    tracker_display.timers.recover_checkpoint()
+    autosaver = AutoSaver(tracker, root)
+    autosaver.start()
+
+    def save_and_exit():
+        tracker_display.stop_timers()
+        autosaver.stop()
+        tracker.save()
+        exit()
+
+    root.protocol("WM_DELETE_WINDOW", save_and_exit)
+    root.mainloop()
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
@@ -0,0 +1,369 @@
+import collections
+import contextlib
+import logging
+
+"""
+Undo and redo for a tracker. Every change to the tracker is recorded as a small operation that knows how to reverse
+itself (e.g. a single cell's old and new values), rather than as a snapshot, so the cost of undoing a change depends
+only on the size of the change.
+
+Operations are recorded by the model as changes are made, and grouped into one undoable step each time the tracker is
+updated (i.e. once per user action).
+"""
+
+
+def reverse_change(current, changed_to, changed_from):
+    """
+    Works out the value of an entry of time tracked once a change to it is undone (or redone). If the entry has since
+    been changed by something not recorded (e.g. a running timer; see CommandLog.without_undo), that change is kept.
+    :param float current: Current value of the entry.
+    :param float changed_to: Value the change set the entry to.
+    :param float changed_from: Value of the entry before the change, to go back to.
+    :return float:
+    """
+    if current == changed_to:
+        return changed_from
+    return max(current + changed_from - changed_to, 0)
+
+
+class Operation(object):
+    """
+    A single reversible change.
+    """
+    __slots__ = ()
+    SIZE = 64  # Rough estimate of the memory used by an operation, in bytes.
+
+    @property
+    def size(self):
+        return self.SIZE
+
+    @property
+    def tasks(self):
+        """
+        :return list[task.Task]: Tasks changed by this operation.
+        """
+        return [self.task]
+
+    def undo(self):
+        raise NotImplementedError
+
+    def redo(self):
+        raise NotImplementedError
+
+
+class SetCell(Operation):
+    __slots__ = ('task', 'week_index', 'column', 'old_value', 'new_value')
+
+    def __init__(self, _task, week_index, column, old_value, new_value):
+        self.task = _task
+        self.week_index = week_index
+        self.column = column
+        self.old_value = old_value
+        self.new_value = new_value
+
+    def undo(self):
+        _week = self.task.get_weekslot(self.week_index)
+        _week.set_time_in_entry(self.column, reverse_change(_week.get_time_in_entry(self.column), self.new_value,
+                                                            self.old_value))
+
+    def redo(self):
+        _week = self.task.get_weekslot(self.week_index)
+        _week.set_time_in_entry(self.column, reverse_change(_week.get_time_in_entry(self.column), self.old_value,
+                                                            self.new_value))
+
+
+class SetDay(Operation):
+    __slots__ = ('task', 'week_index', 'column', 'day', 'old_value', 'new_value')
+
+    def __init__(self, _task, week_index, column, day, old_value, new_value):
+        self.task = _task
+        self.week_index = week_index
+        self.column = column
+        self.day = day
+        self.old_value = old_value
+        self.new_value = new_value
+
+    def undo(self):
+        _week = self.task.get_weekslot(self.week_index)
+        _week.set_time_for_day(self.column, self.day, reverse_change(_week.get_time_for_day(self.column, self.day),
+                                                                     self.new_value, self.old_value))
+
+    def redo(self):
+        _week = self.task.get_weekslot(self.week_index)
+        _week.set_time_for_day(self.column, self.day, reverse_change(_week.get_time_for_day(self.column, self.day),
+                                                                     self.old_value, self.new_value))
+
+
+class AddSubtask(Operation):
+    __slots__ = ('task', 'subtask')
+
+    def __init__(self, _task, _subtask):
+        self.task = _task
+        self.subtask = _subtask
+
+    def undo(self):
+        self.task.remove_last_subtask()
+
+    def redo(self):
+        # The same subtask object is added back, since later operations refer to it.
+        self.task.append_subtask(self.subtask)
+
+
+class RenameSubtask(Operation):
+    __slots__ = ('task', 'subtask', 'old_name', 'new_name')
+
+    def __init__(self, _task, _subtask, old_name, new_name):
+        self.task = _task
+        self.subtask = _subtask
+        self.old_name = old_name
+        self.new_name = new_name
+
+    def undo(self):
+        self.task.rename_subtask(self.subtask, self.old_name)
+
+    def redo(self):
+        self.task.rename_subtask(self.subtask, self.new_name)
+
+
+class SetEstimate(Operation):
+    __slots__ = ('task', 'subtask', 'old_estimate', 'new_estimate')
+
+    def __init__(self, _task, _subtask, old_estimate, new_estimate):
+        self.task = _task
+        self.subtask = _subtask
+        self.old_estimate = old_estimate
+        self.new_estimate = new_estimate
+
+    def undo(self):
+        self.task.set_subtask_estimate(self.subtask, self.old_estimate)
+
+    def redo(self):
+        self.task.set_subtask_estimate(self.subtask, self.new_estimate)
+
+
+class SetArchived(Operation):
+    __slots__ = ('task', 'archived')
+
+    def __init__(self, _task, archived):
+        self.task = _task
+        self.archived = archived
+
+    def undo(self):
+        self.task.archived = not self.archived
+
+    def redo(self):
+        self.task.archived = self.archived
+
+
+class RenameTask(Operation):
+    __slots__ = ('tracker', 'task', 'old_name', 'new_name')
+
+    def __init__(self, tracker, _task, old_name, new_name):
+        self.tracker = tracker
+        self.task = _task
+        self.old_name = old_name
+        self.new_name = new_name
+
+    def undo(self):
+        self.tracker.rename_task(self.task, self.old_name)
+
+    def redo(self):
+        self.tracker.rename_task(self.task, self.new_name)
+
+
+class CreateTask(Operation):
+    __slots__ = ('tracker', 'task')
+
+    def __init__(self, tracker, _task):
+        self.tracker = tracker
+        self.task = _task
+
+    def undo(self):
+        self.tracker.remove_task(self.task)
+
+    def redo(self):
+        self.tracker._handle_new_task(self.task)
+
+
+class AddWeek(Operation):
+    __slots__ = ('tracker', 'week_tasks')
+
+    def __init__(self, tracker, week_tasks):
+        """
+        :param tracker.Tracker tracker:
+        :param list[task.Task] week_tasks: Tasks that the week was added to.
+        """
+        self.tracker = tracker
+        self.week_tasks = week_tasks
+
+    @property
+    def size(self):
+        return self.SIZE + 8 * len(self.week_tasks)
+
+    @property
+    def tasks(self):
+        return self.week_tasks
+
+    def undo(self):
+        self.tracker.remove_last_week(self.week_tasks)
+
+    def redo(self):
+        self.tracker.add_week()
+
+
+class CommandLog(object):
+    """
+    Records the operations applied to a tracker so they can be undone and redone.
+    The undo history is capped at roughly max_bytes; the oldest steps are forgotten first.
+    Also keeps the sequence number of the last change to each task, so the log can be used as a feed of which tasks
+    have changed (see get_tasks_changed_since).
+    """
+    MAX_BYTES = 10 * 1024 * 1024
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        """
+        :param int max_bytes: Rough limit on the memory used by the undo history.
+        :return:
+        """
+        self.max_bytes = max_bytes
+
+        self.pending = []  # Operations recorded since the last commit, which will become the next step.
+        self.undo_steps = collections.deque()  # [(operations, size)], oldest first.
+        self.redo_steps = []  # [(operations, size)], most recently undone last.
+        self.size = 0  # Estimated memory used by undo_steps and redo_steps.
+        self.applying = False  # Set while undoing or redoing, so the changes made aren't recorded again.
+        self.undoable_suspended = False  # Set while making changes that aren't to be undoable; see without_undo.
+
+        self.sequence = 0  # Incremented for every change, whether recorded, undone or redone.
+        self.task_sequences = {}  # {task.Task: sequence number of the last change to the task}
+        self.clear_count = 0  # Incremented whenever the history is cleared, since task_sequences is cleared too.
+
+    def record(self, operation):
+        """
+        Record a change that has just been made. Called by the model.
+        :param Operation operation:
+        """
+        if self.applying:
+            return
+        self.note_changed(operation)
+        if self.undoable_suspended:
+            return
+
+        if self.redo_steps:
+            # A new change makes the undone steps unreachable.
+            self.size -= sum(size for _, size in self.redo_steps)
+            self.redo_steps = []
+        self.pending.append(operation)
+
+    def commit(self):
+        """
+        Close the operations recorded so far into a single undoable step.
+        """
+        if not self.pending:
+            return
+
+        size = sum(operation.size for operation in self.pending)
+        self.undo_steps.append((self.pending, size))
+        self.size += size
+        self.pending = []
+
+        while self.size > self.max_bytes and self.undo_steps:
+            _, evicted_size = self.undo_steps.popleft()
+            self.size -= evicted_size
+            logging.debug("Undo history full, forgetting oldest step of %d bytes" % evicted_size)
+
+    def undo(self):
+        """
+        Undo the most recent step, including any changes not yet committed.
+        :return bool: Whether there was anything to undo.
+        """
+        self.commit()
+        if not self.undo_steps:
+            return False
+
+        step = self.undo_steps.pop()
+        self.apply(reversed(step[0]), undo=True)
+        self.redo_steps.append(step)
+        return True
+
+    def redo(self):
+        """
+        Redo the most recently undone step.
+        :return bool: Whether there was anything to redo.
+        """
+        self.commit()
+        if not self.redo_steps:
+            return False
+
+        step = self.redo_steps.pop()
+        self.apply(step[0], undo=False)
+        self.undo_steps.append(step)
+        return True
+
+    def apply(self, operations, undo):
+        """
+        Undo or redo some operations, without recording the changes they make as new operations.
+        :param operations: Operations, in the order to apply them.
+        :param bool undo: True to undo the operations, False to redo them.
+        """
+        self.applying = True
+        try:
+            for operation in operations:
+                if undo:
+                    operation.undo()
+                else:
+                    operation.redo()
+                self.note_changed(operation)
+        finally:
+            self.applying = False
+
+    @contextlib.contextmanager
+    def suspended(self):
+        """
+        Context manager within which changes aren't recorded, e.g. for bulk changes too large to undo. Follow with
+        clear, since the steps already recorded may not undo correctly on top of the unrecorded changes.
+        """
+        applying = self.applying
+        self.applying = True
+        try:
+            yield
+        finally:
+            self.applying = applying
+
+    @contextlib.contextmanager
+    def without_undo(self):
+        """
+        Context manager within which changes are noted (see get_tasks_changed_since), but can't be undone, e.g. time
+        added by a running timer. Unlike suspended, the steps already recorded still undo correctly, as long as the
+        changes made are only to time tracked: undoing a change to an entry keeps anything added to it since.
+        """
+        undoable_suspended = self.undoable_suspended
+        self.undoable_suspended = True
+        try:
+            yield
+        finally:
+            self.undoable_suspended = undoable_suspended
+
+    def clear(self):
+        """
+        Forget all history, e.g. when the tracker is reloaded.
+        """
+        self.pending = []
+        self.undo_steps.clear()
+        self.redo_steps = []
+        self.size = 0
+        self.task_sequences.clear()
+        self.clear_count += 1
+
+    def note_changed(self, operation):
+        self.sequence += 1
+        for _task in operation.tasks:
+            self.task_sequences[_task] = self.sequence
+
+    def get_tasks_changed_since(self, sequence):
+        """
+        Gets the tasks that have changed since a given point, e.g. since they were last saved or sent elsewhere.
+        :param int sequence: Value of self.sequence at that point.
+        :return list[task.Task]: Tasks changed since then.
+        """
+        return [_task for _task, task_sequence in self.task_sequences.iteritems() if task_sequence > sequence]
@@ -0,0 +1,238 @@
+import argparse
+import csv
+import datetime
+import logging
+import os
+import sys
+import time
+
+import export
+import task_proxy
+
+"""
+Imports time tracked from a table in long format, e.g. a spreadsheet saved as CSV, one row per entry:
+task, subtask, hours and either week_index or date (YYYY-MM-DD, any day of the week), plus optionally estimate.
+Columns are found by name from the header row, so other columns (e.g. the week_date written by export.py) are ignored,
+and files written by export.py can be imported.
+
+Tasks, subtasks and weeks are created as needed, including weeks from before a task was created. Rows are applied in
+batches, writing straight into the tasks' time matrices; the running totals are recalculated once at the end rather
+than for every row. Dates from before the tracker's first week can't be stored, so those rows are rejected.
+Run as:
+python importer.py <CSV file> <tracker file> [--replace] [--first-date YYYY-MM-DD]
+"""
+
+
+class Importer(object):
+    """
+    Adds rows of time tracked to a tracker. Call add_row for each row, then finish.
+    The import isn't recorded in the tracker's history, and the history is cleared when it finishes, since an import is
+    too large to undo a row at a time.
+    """
+    BATCH_SIZE = 10000
+
+    def __init__(self, tracker, replace=False):
+        """
+        :param tracker.Tracker tracker: Tracker to import into.
+        :param bool replace: Whether each row replaces the time already tracked in its entry, rather than adding to it.
+        :return:
+        """
+        self.tracker = tracker
+        self.replace = replace
+
+        self.batch = []  # Rows waiting to be applied: [(task_name, subtask_name, week_index, hours, estimate)]
+        self.changed_tasks = set()  # Tasks whose totals need recalculating.
+        self.subtask_indexes = {}  # {task.Task: {subtask name: index}}, for the tasks changed so far.
+        self.start_time = time.time()
+        self.report = {'rows': 0,  # Rows imported.
+                       'rejected_rows': 0,  # Rows that couldn't be imported.
+                       'tasks_created': 0,
+                       'subtasks_created': 0,
+                       'weeks_created': 0,  # Weeks added to the tracker.
+                       'seconds': 0,
+                       'rows_per_second': 0}
+
+    def add_row(self, task_name, subtask_name, week_index, hours, estimate=None):
+        """
+        :param str task_name:
+        :param str subtask_name:
+        :param int week_index: Global index of the week.
+        :param float hours: Time tracked.
+        :param float estimate: Estimate for the subtask, or None to leave it as it is.
+        """
+        if week_index < 0:
+            logging.error("Can't import time from before the first week: %s, %s, week %d" %
+                          (task_name, subtask_name, week_index))
+            self.report['rejected_rows'] += 1
+            return
+        self.batch.append((task_name, subtask_name, week_index, hours, estimate))
+        if len(self.batch) >= self.BATCH_SIZE:
+            self.apply_batch()
+
+    def add_csv_rows(self, csv_file):
+        """
+        Adds every row of a CSV file, as described at the top of this file.
+        :param file csv_file: File open for reading in binary mode.
+        """
+        reader = csv.reader(csv_file)
+        header = [column.strip().lower() for column in next(reader)]
+        missing = set(['task', 'subtask', 'hours']) - set(header)
+        if missing or ('week_index' not in header and 'date' not in header):
+            raise ValueError("CSV file needs task, subtask, hours and either week_index or date columns")
+
+        task_column = header.index('task')
+        subtask_column = header.index('subtask')
+        hours_column = header.index('hours')
+        week_column = header.index('week_index') if 'week_index' in header else None
+        date_column = header.index('date') if 'date' in header else None
+        estimate_column = header.index('estimate') if 'estimate' in header else None
+        first_date = self.tracker.first_date.date()
+        names = {}  # {name as read: decoded name}, since the same names are repeated on many rows.
+
+        for line_number, row in enumerate(reader, 2):
+            try:
+                if week_column is not None and row[week_column]:
+                    week_index = int(row[week_column])
+                else:
+                    date = datetime.datetime.strptime(row[date_column], "%Y-%m-%d").date()
+                    week_index = (date - first_date).days // 7
+                hours = float(row[hours_column] or 0)
+                estimate = None
+                if estimate_column is not None and row[estimate_column]:
+                    estimate = float(row[estimate_column])
+                task_name = names.get(row[task_column])
+                if task_name is None:
+                    task_name = names[row[task_column]] = row[task_column].decode('utf-8')
+                subtask_name = names.get(row[subtask_column])
+                if subtask_name is None:
+                    subtask_name = names[row[subtask_column]] = row[subtask_column].decode('utf-8')
+            except (ValueError, TypeError, IndexError) as e:
+                logging.error("Skipping line %d: %s" % (line_number, e))
+                self.report['rejected_rows'] += 1
+                continue
+            self.add_row(task_name, subtask_name, week_index, hours, estimate)
+
+    def apply_batch(self):
+        """
+        Write the waiting rows into the tracker's tasks, without updating the running totals.
+        """
+        if not self.batch:
+            return
+        logging.debug("Importing batch of %d rows" % len(self.batch))
+
+        with self.tracker.history.suspended():
+            # The tracker's weeks are added first, since adding a week adds it to every task.
+            latest_week = max(row[2] for row in self.batch)
+            while self.tracker.week_index <= latest_week:
+                self.tracker.add_week()
+                self.report['weeks_created'] += 1
+
+            for task_name, subtask_name, week_index, hours, estimate in self.batch:
+                _task = self.get_task(task_name)
+                column = self.get_subtask_index(_task, subtask_name)
+                if estimate is not None:
+                    _task.subtasks[column].estimate = estimate
+
+                _week = _task.get_or_insert_weekslot(week_index)
+                _week.widen(column + 1)
+                if not self.replace:
+                    hours += _week.time_matrix.get(_week.row, column)
+                _week.time_matrix.set(_week.row, column, hours)
+                _week.mark_dirty()
+
+        self.report['rows'] += len(self.batch)
+        self.batch = []
+
+    def get_task(self, task_name):
+        """
+        Gets a task to import into, creating it if needed.
+        :param str task_name:
+        :return task.Task:
+        """
+        _task = self.tracker.tasks.get(task_name)
+        if _task is None:
+            with self.tracker.history.suspended():
+                self.tracker.create_new_task(task_name)
+            _task = self.tracker.tasks[task_name]
+            self.report['tasks_created'] += 1
+        elif isinstance(_task, task_proxy.TaskProxy):
+            _task = _task.materialize()
+
+        if _task not in self.changed_tasks:
+            self.changed_tasks.add(_task)
+            self.subtask_indexes[_task] = dict((sub.name, index) for index, sub in enumerate(_task.subtasks))
+        return _task
+
+    def get_subtask_index(self, _task, subtask_name):
+        """
+        Gets the position of a subtask, creating it if needed.
+        :param task.Task _task:
+        :param str subtask_name:
+        :return int: Index of the subtask.
+        """
+        indexes = self.subtask_indexes[_task]
+        index = indexes.get(subtask_name)
+        if index is None:
+            with self.tracker.history.suspended():
+                _task.add_subtask(subtask_name)
+            index = indexes[subtask_name] = len(_task.subtasks) - 1
+            self.report['subtasks_created'] += 1
+        return index
+
+    def finish(self):
+        """
+        Apply any remaining rows, then bring the tasks' running totals, the tracker's per-week totals and the display up
+        to date.
+        :return dict: Report of what was imported, including the throughput in rows per second.
+        """
+        self.apply_batch()
+        for _task in self.changed_tasks:
+            _task.recalculate_totals()
+        self.tracker.history.clear()
+        self.tracker.update()
+
+        seconds = time.time() - self.start_time
+        self.report['seconds'] = seconds
+        self.report['rows_per_second'] = self.report['rows'] / seconds if seconds else 0
+        logging.debug("Import finished: %s" % self.report)
+        return self.report
+
+
+def import_csv(tracker, csv_filename, replace=False):
+    """
+    Imports a CSV file into a tracker.
+    :param tracker.Tracker tracker: Tracker to import into.
+    :param str csv_filename: CSV file, as described at the top of this file.
+    :param bool replace: Whether each row replaces the time already tracked in its entry, rather than adding to it.
+    :return dict: Report of what was imported. See Importer.
+    """
+    importer = Importer(tracker, replace)
+    with open(csv_filename, 'rb') as csv_file:
+        importer.add_csv_rows(csv_file)
+    return importer.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time tracked from a CSV file into a tracker.")
+    parser.add_argument('source', help="CSV file to import.")
+    parser.add_argument('destination', help="Tracker file to import into. Created if it doesn't exist.")
+    parser.add_argument('--replace', action='store_true',
+                        help="Replace the time already tracked in each entry, rather than adding to it.")
+    parser.add_argument('--first-date', help="Date of the first week (YYYY-MM-DD), if creating a new tracker file.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        parser.error("%s does not exist" % args.source)
+    if args.first_date and os.path.exists(args.destination):
+        parser.error("--first-date can only be used when creating a new tracker file")
+
+    tracker = export.open_tracker(args.destination)
+    if args.first_date:
+        tracker.first_date = datetime.datetime.strptime(args.first_date, "%Y-%m-%d")
+    report = import_csv(tracker, args.source, args.replace)
+    tracker.save()
+    print "Imported %(rows)d rows (%(rejected_rows)d rejected) in %(seconds).1fs, %(rows_per_second).0f rows/s" % report
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,381 @@
+import logging
+import json
+import datetime
+import os
+import threading
+from collections import OrderedDict
+import datastore
+import merge
+import streaming_json
+
+"""
+Changes are appended to a journal file alongside the .trk file, one JSON record per line:
+{op: 'task', name: <task_name>, task: <task details>}  # New task, or one that needs storing in full.
+{op: 'delete', name: <task_name>}  # Task removed (e.g. renamed).
+{op: 'week', name: <task_name>, offset: <int>, values: [<time tracked>, ...]}  # Week set, or added if offset is new.
+    # Also has days: [[<subtask index>, <day>, <time tracked>], ...] if the week has, or had, time on individual days.
+{op: 'subtasks', name: <task_name>, subtasks: {<subtask_name>: <subtask details>}}
+{op: 'archived', name: <task_name>, archived: <boolean>}
+{op: 'meta', <key>: <value>, ...}  # Any of task_order, first_date and archived_week_index.
+
+The .trk file is the snapshot, and is in exactly the format described in datastore.py. Every record sets a value
+rather than changing it, and records for a task that doesn't exist (or a week past its end) are skipped, so replaying
+a journal over a snapshot that already includes it (e.g. after a compaction was interrupted) ends in the same state.
+"""
+
+TAIL_SEARCH_BYTES = 64 * 1024  # How far back to look for the start of a record when reading part of a journal.
+
+
+class JournalDataStore(datastore.DataStore):
+    """
+    DataStore that appends each change to a journal rather than rewriting the whole file on every save.
+    Once the journal grows past COMPACTION_THRESHOLD it is folded into the snapshot in a background thread.
+    """
+    COMPACTION_THRESHOLD = 1024 * 1024  # Bytes
+
+    def __init__(self, filename):
+        """
+        :param str filename: Filename with file path of the snapshot. The journal is stored alongside it.
+        :return:
+        """
+        self.journal_filename = filename + '.journal'
+        # While compacting, the journal being folded into the snapshot is moved aside to this file.
+        self.compacting_filename = filename + '.journal.compacting'
+
+        # Held while the snapshot and compacting journal are being replaced, so they are never read half way through.
+        self.compaction_lock = threading.Lock()
+        self.compaction_thread = None
+
+        # Records that failed to be written, to be retried on the next save. They have already been applied to raw_data.
+        self.unwritten_records = []
+        self.unwritten_records_lock = threading.Lock()
+        # Set if a write failed part way through a line, so the next write starts on a new line.
+        self.journal_needs_newline = False
+
+        datastore.DataStore.__init__(self, filename)
+
+    def load_from_file(self):
+        """
+        Load the snapshot, then replay any journalled changes on top of it.
+        """
+        with self.compaction_lock:
+            datastore.DataStore.load_from_file(self)
+            for journal_filename in (self.compacting_filename, self.journal_filename):
+                replay_journal(self.raw_data, journal_filename)
+
+    def prepare_save(self, tracker):
+        """
+        Works out the journal records for any changes since the last save, without writing anything.
+        If there is no snapshot yet, the snapshot is written in full instead.
+        :param tracker.Tracker tracker: Tracker object to store.
+        :return: Function that appends the records to the journal. Can be run on any thread.
+        """
+        if not os.path.exists(self.filename):
+            logging.debug("No snapshot exists yet, saving in full to: %s" % self.filename)
+            return datastore.DataStore.prepare_save(self, tracker)
+
+        self.merge_changes_on_disk(tracker)
+        new_records = self.generate_records(tracker)
+        for record in new_records:
+            apply_record(self.raw_data, record)
+        self.mark_saved(tracker)
+
+        with self.unwritten_records_lock:
+            records = self.unwritten_records + new_records
+            self.unwritten_records = []
+        self.writes_pending += 1
+
+        def write():
+            logging.debug("Appending %d records to journal: %s" % (len(records), self.journal_filename))
+            if not records:
+                self.write_finished(False)
+                return
+
+            with self.write_lock:
+                unchanged = self.get_disk_state() == self.disk_state
+                try:
+                    with open(self.journal_filename, 'a') as journal_file:
+                        if self.journal_needs_newline:
+                            journal_file.write('\n')
+                            self.journal_needs_newline = False
+                        for record in records:
+                            journal_file.write(json.dumps(record, separators=(',', ':')) + '\n')
+                        journal_file.flush()
+                        os.fsync(journal_file.fileno())
+                except (IOError, OSError):
+                    self.journal_needs_newline = True
+                    with self.unwritten_records_lock:
+                        self.unwritten_records[:0] = records
+                    self.write_finished(False)
+                    raise
+                self.write_finished(unchanged)
+
+                if os.path.getsize(self.journal_filename) > self.COMPACTION_THRESHOLD:
+                    self.start_compaction()
+        return write
+
+    def get_disk_state(self):
+        """
+        :return tuple: State of the snapshot and both journals, which changes whenever any of them is written.
+        """
+        return merge.get_file_states([self.filename, self.compacting_filename, self.journal_filename])
+
+    def read_raw_data_from_disk(self):
+        """
+        Reads the snapshot and replays the journals on top of it, without changing this datastore.
+        If only the journal has been appended to since this datastore last loaded or wrote the files, the raw data
+        matched them then, so only the records appended since are read, and replayed on a copy of the raw data.
+        :return dict: Raw data, in the form described in datastore.py.
+        """
+        with self.compaction_lock:
+            snapshot_state, compacting_state, journal_state = self.get_disk_state()
+            if self.disk_state is not None and self.disk_state[:2] == (snapshot_state, compacting_state) and \
+                    journal_state is not None:
+                old_journal_state = self.disk_state[2]
+                if old_journal_state is None:
+                    offset = 0
+                elif old_journal_state[2] == journal_state[2] and old_journal_state[0] <= journal_state[0]:
+                    offset = old_journal_state[0]
+                else:
+                    offset = None
+                if offset is not None:
+                    raw_data = self.snapshot_raw_data()
+                    if replay_journal_tail(raw_data, self.journal_filename, offset):
+                        return raw_data
+
+            raw_data = datastore.DataStore(self.filename).raw_data
+            for journal_filename in (self.compacting_filename, self.journal_filename):
+                replay_journal(raw_data, journal_filename)
+        return raw_data
+
+    def has_unwritten_changes(self):
+        """
+        :return bool: Whether any records failed to be written, and are waiting for the next save.
+        """
+        with self.unwritten_records_lock:
+            return bool(self.unwritten_records)
+
+    def generate_records(self, tracker):
+        """
+        Works out the journal records needed to bring the raw data in line with a tracker.
+        Tasks that haven't changed since they were last saved are skipped.
+        :param tracker.Tracker tracker: Tracker object to store.
+        :return list[dict]: Records, in the order they should be applied.
+        """
+        records = []
+        for _task in tracker.tasks.itervalues():
+            if _task.is_dirty or _task.task_name not in self.tasks:
+                records.extend(self.generate_task_records(_task))
+
+        for task_name in self.tasks.keys():
+            if task_name not in tracker.tasks:
+                records.append({'op': 'delete', 'name': task_name})
+
+        meta = {}
+        if self.raw_data['task_order'] != tracker.task_order:
+            meta['task_order'] = list(tracker.task_order)
+        if self.raw_data['archived_week_index'] != tracker.archived_week_index:
+            meta['archived_week_index'] = tracker.archived_week_index
+        first_date = datetime.datetime.strftime(tracker.first_date, "%Y-%m-%d")
+        if self.raw_data['first_date'] != first_date:
+            meta['first_date'] = first_date
+        if meta:
+            meta['op'] = 'meta'
+            records.append(meta)
+
+        return records
+
+    def generate_task_records(self, _task):
+        """
+        Works out the journal records needed to bring the raw data for a single task in line with the task.
+        :param task.Task _task: Task to store.
+        :return list[dict]: Records for this task.
+        """
+        name = _task.task_name
+        raw_task = self.tasks.get(name)
+        if raw_task is None or raw_task['first_week_id'] != _task.first_week_id or \
+                len(raw_task['weeks']) > len(_task.weeks):
+            return [{'op': 'task', 'name': name, 'task': self.generate_task_dict(_task)}]
+
+        records = []
+        subtasks = self.generate_subtasks_dict(_task)
+        if raw_task['subtasks'] != subtasks:
+            records.append({'op': 'subtasks', 'name': name, 'subtasks': subtasks})
+
+        if raw_task['archived'] != _task.archived:
+            records.append({'op': 'archived', 'name': name, 'archived': _task.archived})
+
+        raw_weeks = raw_task['weeks']
+        raw_days = raw_task.get('days') or {}
+        for offset, _week in enumerate(_task.weeks):
+            if not _week.dirty:
+                continue
+            day_values = _week.get_daily_values()
+            days_changed = raw_days.get(str(offset), []) != day_values
+            if offset >= len(raw_weeks) or raw_weeks[offset] != _week.time_tracked or days_changed:
+                record = {'op': 'week', 'name': name, 'offset': offset, 'values': list(_week.time_tracked)}
+                if days_changed:
+                    record['days'] = day_values
+                records.append(record)
+
+        return records
+
+    def start_compaction(self):
+        """
+        Move the journal aside and fold it into the snapshot in a background thread.
+        New changes carry on being appended to a fresh journal in the meantime.
+        """
+        if self.compaction_thread is not None and self.compaction_thread.is_alive():
+            logging.debug("Compaction already in progress")
+            return
+        if os.path.exists(self.compacting_filename):
+            # A previous compaction was interrupted. Finish that one first, and pick this journal up next time.
+            logging.debug("Resuming interrupted compaction")
+        else:
+            with self.disk_state_lock:
+                disk_state = self.get_disk_state()
+                os.rename(self.journal_filename, self.compacting_filename)
+                if self.disk_state == disk_state:
+                    # Only moved, so the files still hold the raw data as last loaded or written.
+                    self.disk_state = self.get_disk_state()
+
+        self.compaction_thread = threading.Thread(target=self.compact, name="journal compaction")
+        self.compaction_thread.daemon = True
+        self.compaction_thread.start()
+
+    def compact(self):
+        """
+        Rewrite the snapshot to include the compacting journal, then remove that journal.
+        Works from the files on disk rather than self.raw_data, so the UI can carry on changing the raw data.
+        The snapshot is replaced atomically, and replaying the compacting journal again over a snapshot that already
+        includes it ends in the same state (see the top of this file), so being interrupted at any point is safe.
+        """
+        logging.debug("Compacting journal into snapshot: %s" % self.filename)
+        disk_state = self.get_disk_state()
+        snapshot = datastore.DataStore(self.filename)
+        replay_journal(snapshot.raw_data, self.compacting_filename)
+
+        with self.compaction_lock:
+            with datastore.open_atomically(self.filename) as snapshot_file:
+                streaming_json.dump(snapshot.raw_data, snapshot_file)
+            os.remove(self.compacting_filename)
+
+            with self.disk_state_lock:
+                if self.disk_state is not None and self.disk_state[:2] == disk_state[:2]:
+                    # The new snapshot holds what the old one and the compacting journal did, which this datastore had
+                    # already seen, so the next save needn't read the files again. The journal is left as it was seen.
+                    self.disk_state = self.get_disk_state()[:2] + self.disk_state[2:]
+        logging.debug("Finished compacting journal")
+
+    def wait_for_compaction(self):
+        """
+        Block until any running compaction has finished.
+        """
+        if self.compaction_thread is not None:
+            self.compaction_thread.join()
+
+
+def replay_journal(raw_data, journal_filename):
+    """
+    Apply all of the records in a journal file to some raw data.
+    A partially written last line (e.g. due to a crash while saving) is ignored.
+    :param dict raw_data: Raw data, as stored by datastore.DataStore.
+    :param str journal_filename: Journal to replay. Nothing happens if it doesn't exist.
+    """
+    if not os.path.exists(journal_filename):
+        return
+
+    logging.debug("Replaying journal: %s" % journal_filename)
+    with open(journal_filename, 'r') as journal_file:
+        for line in journal_file:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line, object_pairs_hook=OrderedDict)
+            except ValueError:
+                logging.warning("Ignoring incomplete journal record in %s" % journal_filename)
+                continue
+            apply_record(raw_data, record)
+
+
+def replay_journal_tail(raw_data, journal_filename, offset):
+    """
+    Apply the records in a journal file from a given offset onwards to a copy of some raw data, e.g. those appended
+    since it was last read. Reading starts from the beginning of the line that the offset is in, in case the offset was
+    taken part way through a record being written; records are idempotent, so replaying one twice is harmless.
+    :param dict raw_data: Copy of raw data, as taken by datastore.DataStore.snapshot_raw_data. Raw tasks are shared with
+        the original, so are copied before they are changed.
+    :param str journal_filename: Journal to replay.
+    :param int offset: Offset in the journal to start from.
+    :return bool: Whether the records were replayed. False if the start of the line couldn't be found nearby, in which
+        case the journal should be replayed in full.
+    """
+    tasks = raw_data['tasks']
+    copied = set()
+    with open(journal_filename, 'r') as journal_file:
+        start = max(0, offset - TAIL_SEARCH_BYTES)
+        journal_file.seek(start)
+        before = journal_file.read(offset - start)
+        line_start = before.rfind('\n')
+        if line_start < 0 and start > 0:
+            return False
+        journal_file.seek(start + line_start + 1)
+
+        for line in journal_file:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line, object_pairs_hook=OrderedDict)
+            except ValueError:
+                logging.warning("Ignoring incomplete journal record in %s" % journal_filename)
+                continue
+            name = record.get('name')
+            if name in tasks and name not in copied:
+                raw_task = tasks[name] = dict(tasks[name])
+                raw_task['weeks'] = list(raw_task['weeks'])
+                copied.add(name)
+            apply_record(raw_data, record)
+    return True
+
+
+def apply_record(raw_data, record):
+    """
+    Apply a single journal record to some raw data.
+    :param dict raw_data: Raw data, as stored by datastore.DataStore.
+    :param dict record: Journal record, as described at the top of this file.
+    """
+    op = record['op']
+    if op == 'meta':
+        for key, value in record.iteritems():
+            if key != 'op':
+                raw_data[key] = value
+        return
+
+    tasks = raw_data['tasks']
+    name = record['name']
+    if op == 'task':
+        tasks[name] = record['task']
+    elif op == 'delete':
+        tasks.pop(name, None)
+    elif name not in tasks:
+        # Only happens when replaying records that are already in the snapshot, for a task since removed or renamed.
+        logging.debug("Skipping %s record for missing task %s" % (op, name))
+    elif op == 'week':
+        weeks = tasks[name]['weeks']
+        offset = record['offset']
+        if offset > len(weeks):
+            # As above, for a task since stored in full with fewer weeks.
+            logging.debug("Skipping week record past the end of task %s" % name)
+            return
+        if offset == len(weeks):
+            weeks.append(record['values'])
+        else:
+            weeks[offset] = record['values']
+        if 'days' in record:
+            datastore.set_raw_days(tasks[name], offset, record['days'])
+    elif op == 'subtasks':
+        tasks[name]['subtasks'] = record['subtasks']
+    elif op == 'archived':
+        tasks[name]['archived'] = record['archived']
+    else:
+        logging.error("Unknown journal record: %s" % op)
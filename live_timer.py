@@ -0,0 +1,379 @@
+import ctypes
+import datetime
+import json
+import logging
+import os
+import sys
+import time
+
+import datastore
+
+"""
+Real-time tracking. A Timer measures time spent on a subtask as it happens, and a TimerManager drives all of the
+running timers from a single Tk timer. Time measured is added to the subtask's entry for the current day and week a
+minute at a time, so it is saved by the autosave like any other change. Time added by timers isn't undoable, so undo
+carries on undoing the user's own changes.
+
+Since the autosave waits for changes to stop (up to AutoSaver.MAX_DELAY_MS) and time is only added a minute at a time,
+every tick also writes a small checkpoint file alongside the tracker file, holding the value each running timer's
+entry for the day should have, including the seconds not yet added. If the app stops without pausing its timers (e.g.
+a crash), the checkpoint is applied when the tracker is next opened (see TimerManager.recover_checkpoint), so at most
+the last tick is lost. Time added when a timer is paused is saved by the next autosave, as for any other change.
+Checkpoint file format:
+[{task: <task name>, subtask: <subtask name>, week_index: <int>, day: <int>, time: <time tracked on the day>}, ...]
+"""
+
+CHECKPOINT_SUFFIX = '.timers'
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+
+def _get_monotonic_clock():
+    """
+    Finds a clock that never goes backwards, e.g. when the system clock is changed, for measuring elapsed time.
+    :return: Function that returns the clock's time in seconds.
+    """
+    try:
+        if sys.platform.startswith('linux'):
+            clock_gettime = ctypes.CDLL('librt.so.1', use_errno=True).clock_gettime
+            clock_monotonic = 1
+            timespec = _Timespec()
+
+            def monotonic():
+                if clock_gettime(clock_monotonic, ctypes.pointer(timespec)) != 0:
+                    raise OSError(ctypes.get_errno(), "clock_gettime failed")
+                return timespec.tv_sec + timespec.tv_nsec * 1e-9
+            monotonic()
+            return monotonic
+        if sys.platform == 'win32':
+            get_tick_count = ctypes.windll.kernel32.GetTickCount64
+            get_tick_count.restype = ctypes.c_ulonglong
+            return lambda: get_tick_count() / 1000.0
+    except (OSError, AttributeError):
+        logging.debug("No monotonic clock available, falling back to the system clock")
+
+    # The system clock can be changed, so never let it appear to go backwards.
+    latest = [time.time()]
+
+    def monotonic():
+        latest[0] = max(latest[0], time.time())
+        return latest[0]
+    return monotonic
+
+monotonic = _get_monotonic_clock()
+
+
+def format_elapsed(seconds):
+    """
+    :param float seconds: Elapsed time.
+    :return str: Elapsed time in human readable form, e.g. "1hr 05min 09s".
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "%dhr %02dmin %02ds" % (hours, minutes, seconds)
+
+
+class Timer(object):
+    """
+    Measures the time spent on a single subtask while it is running. Doesn't change the task itself; the
+    TimerManager moves the time measured into the task.
+    """
+    def __init__(self, _task, _subtask):
+        """
+        :param task.Task _task: Task to track time against.
+        :param subtask.Subtask _subtask: Subtask of the task to track time against.
+        :return:
+        """
+        self.task = _task
+        self.subtask = _subtask
+        self.running_since = None  # Monotonic time the time measured was last brought up to, or None if paused.
+        self.session_time = 0  # Seconds measured since the timer was created, including time already added.
+        self.unflushed_time = 0  # Seconds measured but not yet added to the task.
+
+    @property
+    def paused(self):
+        return self.running_since is None
+
+    def start(self):
+        if self.paused:
+            self.running_since = monotonic()
+
+    def pause(self):
+        self.collect()
+        self.running_since = None
+
+    def collect(self, now=None):
+        """
+        Bring the time measured up to date.
+        :param float now: Current monotonic time, if already known.
+        """
+        if self.paused:
+            return
+        if now is None:
+            now = monotonic()
+        elapsed = now - self.running_since
+        self.running_since = now
+        self.session_time += elapsed
+        self.unflushed_time += elapsed
+
+    def get_elapsed(self):
+        """
+        :return float: Seconds measured since the timer was created.
+        """
+        self.collect()
+        return self.session_time
+
+
+class TimerManager(object):
+    """
+    Runs any number of timers for a tracker. A single Tk timer ticks every TICK_MS while any timer is running; each tick
+    brings every running timer up to date, tells the listeners (e.g. timer windows) and adds any whole minutes measured
+    to the tasks. Nothing is scheduled while every timer is paused.
+    """
+    TICK_MS = 1000
+    FLUSH_SECONDS = 60  # Time is added to tasks in whole multiples of this, except when a timer is paused or removed.
+    # Entries are rounded to this many decimal places of an hour. Whatever rounding leaves out is kept for the next
+    # time added, so it never builds up.
+    DECIMAL_PLACES = 4
+
+    def __init__(self, tracker, tkinter_root):
+        """
+        :param tracker.Tracker tracker: Tracker whose tasks the timers track time against.
+        :param Tkinter.Tk tkinter_root: Root display object, used to schedule the ticks on the Tk thread.
+        :return:
+        """
+        self.tracker = tracker
+        self.tkinter_root = tkinter_root
+        self.after_id = None
+
+        self.timers = []
+        self.listeners = []  # Functions called after every tick, and whenever a timer is started or paused.
+
+        filename = tracker.datastore.filename
+        self.checkpoint_filename = filename + CHECKPOINT_SUFFIX if filename else None
+        self.checkpoint = []  # Checkpoint last written, as described at the top of this file.
+
+    def get_timer(self, _task, _subtask):
+        """
+        Gets the timer for a subtask, creating a paused one if there isn't one already.
+        :param task.Task _task:
+        :param subtask.Subtask _subtask:
+        :return Timer:
+        """
+        for timer in self.timers:
+            if timer.task is _task and timer.subtask is _subtask:
+                return timer
+        timer = Timer(_task, _subtask)
+        self.timers.append(timer)
+        return timer
+
+    def remove_timer(self, timer):
+        """
+        Stop and forget a timer, adding any time it has measured to its task.
+        :param Timer timer:
+        """
+        self.pause(timer)
+        self.timers.remove(timer)
+        if timer.unflushed_time:
+            logging.error("Discarding %.0fs tracked against %s, which no longer exists" %
+                          (timer.unflushed_time, timer.subtask.name))
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def start(self, timer):
+        timer.start()
+        self.notify()
+        self.schedule_tick()
+
+    def pause(self, timer):
+        """
+        Pause a timer, adding all of the time it has measured to its task.
+        :param Timer timer:
+        """
+        timer.pause()
+        if self.flush(timer, whole_intervals=False):
+            self.tracker.update()
+        self.write_checkpoint()
+        self.notify()
+
+    def stop(self):
+        """
+        Pause every timer and stop ticking, e.g. before closing. Follow with a save of the tracker, so that the time
+        measured is stored.
+        """
+        if self.after_id is not None:
+            self.tkinter_root.after_cancel(self.after_id)
+            self.after_id = None
+        for timer in list(self.timers):
+            self.pause(timer)
+
+    def flush_all(self):
+        """
+        Add all of the time measured by every timer to the tasks, e.g. before saving. The timers keep running.
+        """
+        now = monotonic()
+        flushed = False
+        for timer in self.timers:
+            timer.collect(now)
+            flushed = self.flush(timer, whole_intervals=False) or flushed
+        if flushed:
+            self.tracker.update()
+
+    def schedule_tick(self):
+        if self.after_id is None and any(not timer.paused for timer in self.timers):
+            self.after_id = self.tkinter_root.after(self.TICK_MS, self.tick)
+
+    def tick(self):
+        """
+        Called on the Tk thread every TICK_MS while any timer is running.
+        """
+        self.after_id = None
+        now = monotonic()
+        flushed = False
+        for timer in self.timers:
+            if not timer.paused:
+                timer.collect(now)
+                flushed = self.flush(timer, whole_intervals=True) or flushed
+        if flushed:
+            self.tracker.update()
+        self.write_checkpoint()
+
+        self.notify()
+        self.schedule_tick()
+
+    def notify(self):
+        for listener in self.listeners:
+            listener()
+
+    def flush(self, timer, whole_intervals):
+        """
+        Add the time a timer has measured to its subtask's entry for today, in the current week.
+        Weeks are added to the tracker up to the current week if needed.
+        :param Timer timer:
+        :param bool whole_intervals: Only add whole multiples of FLUSH_SECONDS, keeping the rest for later.
+        :return bool: Whether any time was added.
+        """
+        seconds = timer.unflushed_time
+        if whole_intervals:
+            seconds -= seconds % self.FLUSH_SECONDS
+        if seconds <= 0 or self.tracker.loader is not None:
+            return False
+
+        with self.tracker.history.without_undo():
+            entry = self.get_entry(timer, add_weeks=True)
+            if entry is None:
+                return False
+            _week, column, day = entry
+            old_value = _week.get_time_for_day(column, day)
+            value = round(old_value + seconds / 3600.0, self.DECIMAL_PLACES)
+            logging.debug("Adding %.4f hours to %s on day %d of week %d" %
+                          (value - old_value, timer.subtask.name, day, _week.index))
+            _week.set_time_for_day(column, day, value)
+        # Only what was actually added, so that the rounding is made up for next time.
+        timer.unflushed_time -= (value - old_value) * 3600
+        return True
+
+    def get_entry(self, timer, add_weeks=False):
+        """
+        Finds where a timer's time goes: its subtask's entry for today, in the current week.
+        :param Timer timer:
+        :param bool add_weeks: Add weeks to the tracker up to the current week, if needed.
+        :return tuple: (weekslot.WeekSlot, column, day), or None if the time can't be added, e.g. the task has been
+            removed.
+        """
+        _task = timer.task
+        if self.tracker.tasks.get(_task.task_name) is not _task or timer.subtask not in _task.subtasks:
+            # E.g. creating the task or subtask has been undone. Keep the time in case it is redone.
+            logging.debug("Not adding time to %s, which no longer exists" % timer.subtask.name)
+            return None
+
+        days = (datetime.datetime.today().date() - self.tracker.first_date.date()).days
+        week_index, day = divmod(max(days, 0), 7)
+        if add_weeks:
+            while self.tracker.week_index <= week_index:
+                self.tracker.add_week()
+        _week = _task.get_weekslot(week_index)
+        if _week is None:
+            logging.debug("Not adding time to %s, which has no week %d (e.g. it is archived)" % (_task, week_index))
+            return None
+
+        column = _task.get_subtask_index(timer.subtask)
+        if column >= _week.width:
+            # The week is from before the subtask was added.
+            logging.debug("Not adding time to %s, which isn't in week %d" % (timer.subtask.name, week_index))
+            return None
+        return _week, column, day
+
+    def write_checkpoint(self):
+        """
+        Write the checkpoint of every running timer's time, or remove it if no timer is running. Only written if it
+        has changed. See the top of this file.
+        """
+        if self.checkpoint_filename is None:
+            return
+        checkpoint = []
+        for timer in self.timers:
+            if timer.paused:
+                continue
+            entry = self.get_entry(timer)
+            if entry is None:
+                continue
+            _week, column, day = entry
+            hours = _week.get_time_for_day(column, day) + max(timer.unflushed_time, 0) / 3600.0
+            checkpoint.append({'task': timer.task.task_name, 'subtask': timer.subtask.name,
+                               'week_index': _week.index, 'day': day, 'time': round(hours, self.DECIMAL_PLACES)})
+        if checkpoint == self.checkpoint:
+            return
+
+        try:
+            if checkpoint:
+                datastore.write_file_atomically(self.checkpoint_filename, json.dumps(checkpoint))
+            elif os.path.exists(self.checkpoint_filename):
+                os.remove(self.checkpoint_filename)
+            self.checkpoint = checkpoint
+        except (IOError, OSError) as e:
+            logging.error("Couldn't write timer checkpoint %s: %s" % (self.checkpoint_filename, e))
+
+    def recover_checkpoint(self):
+        """
+        Applies a checkpoint left by timers that were running when the app last stopped, then saves the tracker and
+        removes the checkpoint. Call once the tracker has loaded, before starting any timers.
+        :return int: Number of entries recovered.
+        """
+        if self.checkpoint_filename is None or not os.path.exists(self.checkpoint_filename):
+            return 0
+        try:
+            with open(self.checkpoint_filename, 'r') as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except (IOError, ValueError) as e:
+            logging.error("Couldn't read timer checkpoint %s: %s" % (self.checkpoint_filename, e))
+            return 0
+
+        recovered = 0
+        with self.tracker.history.without_undo():
+            for entry in checkpoint:
+                # The weeks added for the time may not have been saved.
+                while self.tracker.week_index <= entry['week_index']:
+                    self.tracker.add_week()
+                _task = self.tracker.tasks.get(entry['task'])
+                names = [_subtask.name for _subtask in _task.subtasks] if _task is not None else []
+                _week = _task.get_weekslot(entry['week_index']) if entry['subtask'] in names else None
+                if _week is None or names.index(entry['subtask']) >= _week.width:
+                    logging.error("Can't recover timer time for %s: %s, which no longer exists" %
+                                  (entry['task'], entry['subtask']))
+                    continue
+                logging.debug("Recovering timer time for %s: %s" % (entry['task'], entry['subtask']))
+                _week.set_time_for_day(names.index(entry['subtask']), entry['day'], entry['time'])
+                recovered += 1
+
+        if recovered:
+            self.tracker.update()
+            self.tracker.save()
+        os.remove(self.checkpoint_filename)
+        return recovered
@@ -0,0 +1,248 @@
+import datetime
+import logging
+import os
+
+import task_proxy
+
+"""
+Three-way merge of changes made to a tracker file by something else (e.g. another instance of the app, or a script)
+into a tracker that is about to be saved over it, so that neither side's changes are lost.
+
+The base is the raw data the datastore last loaded or saved, "theirs" is the raw data now stored in the file, and
+"ours" is the tracker. Only the tasks whose raw data differs between the base and theirs are looked at, and within
+those, only the entries that differ, so the work done depends on the size of their changes. Their changes are made
+to the tracker, which is then saved as usual, so only what has changed is rewritten.
+
+Changes are merged as follows:
+- Time tracked, per subtask per week, and per day where tracked by day: if only one side has changed an entry, or both
+  have changed it to the same value, that change is kept. If both have made different changes, both are kept, i.e.
+  ours + theirs - base, since both are time spent.
+- Subtasks and tasks they have added are added. Subtasks are matched by name, so they needn't be in the same order.
+- Tasks they have removed (or renamed) are removed, unless we have changed them since the last save.
+- Estimates, whether a task is archived, the task order, the first date and the archived week index: their change is
+  kept if we haven't changed the same thing, otherwise ours is.
+Anything we have removed or renamed stays removed, even if they have changed it.
+"""
+
+
+def get_file_states(filenames):
+    """
+    :param list[str] filenames:
+    :return tuple: (size, modification time, inode) of each file, or None for any that don't exist. Changes whenever
+        something writes to one of the files.
+    """
+    states = []
+    for filename in filenames:
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            states.append(None)
+        else:
+            states.append((stat.st_size, stat.st_mtime, stat.st_ino))
+    return tuple(states)
+
+
+def merge_time(ours, base, theirs):
+    """
+    :return float: Merged value of an entry of time tracked.
+    """
+    if ours == base:
+        return theirs
+    if theirs == base or ours == theirs:
+        return ours
+    return max(ours + theirs - base, 0)
+
+
+def get_entries(raw_task):
+    """
+    :param dict raw_task: Raw task details, in the form described in datastore.py.
+    :return tuple: ({(week_index, subtask name): time tracked}, {(week_index, subtask name, day): time tracked}), for
+        the entries with time tracked.
+    """
+    names = list(raw_task['subtasks'])
+    first_week_id = raw_task['first_week_id']
+    entries = {}
+    for offset, values in enumerate(raw_task['weeks']):
+        for name, hours in zip(names, values):
+            if hours:
+                entries[(first_week_id + offset, name)] = hours
+
+    day_entries = {}
+    for offset, day_values in (raw_task.get('days') or {}).iteritems():
+        for index, day, hours in day_values:
+            if hours and index < len(names):
+                day_entries[(first_week_id + int(offset), names[index], day)] = hours
+    return entries, day_entries
+
+
+def get_changed(base, theirs):
+    """
+    :param dict base: {key: value}
+    :param dict theirs: {key: value}
+    :return dict: {key: (base value, their value)} for the keys whose values differ, treating a missing key as 0.
+    """
+    changed = {}
+    for key, value in theirs.iteritems():
+        if base.get(key, 0) != value:
+            changed[key] = (base.get(key, 0), value)
+    for key, value in base.iteritems():
+        if key not in theirs:
+            changed[key] = (value, 0)
+    return changed
+
+
+def merge_task(_task, raw_base, raw_theirs):
+    """
+    Makes their changes to one of our tasks.
+    :param task.Task _task: Our task.
+    :param dict raw_base: Raw details of the task in the base, or None if it wasn't in the base (i.e. both sides have
+        created a task with the same name).
+    :param dict raw_theirs: Raw details of the task in their file.
+    :return int: Number of entries of time tracked changed.
+    """
+    base_subtasks = raw_base['subtasks'] if raw_base is not None else {}
+    names = [_subtask.name for _subtask in _task.subtasks]
+    for name in raw_theirs['subtasks']:
+        if name not in base_subtasks and name not in names:
+            logging.debug("Merging in subtask %s of task %s" % (name, _task))
+            _task.add_subtask(name)
+            names.append(name)
+
+    for _subtask in _task.subtasks:
+        base_details = base_subtasks.get(_subtask.name)
+        their_details = raw_theirs['subtasks'].get(_subtask.name)
+        if base_details is None or their_details is None:
+            continue
+        base_estimate = base_details.get('estimate', 0)
+        their_estimate = their_details.get('estimate', 0)
+        if their_estimate != base_estimate and _subtask.estimate == base_estimate:
+            _task.set_subtask_estimate(_subtask, their_estimate)
+
+    if raw_base is not None and raw_theirs['archived'] != raw_base['archived'] and \
+            _task.archived == raw_base['archived']:
+        _task.archived = raw_theirs['archived']
+
+    base_entries, base_days = get_entries(raw_base) if raw_base is not None else ({}, {})
+    their_entries, their_days = get_entries(raw_theirs)
+    changed_entries = get_changed(base_entries, their_entries)
+    changed_days = {}  # {(week_index, subtask name): [(day, base value, their value)]}
+    for (week_index, name, day), (base_value, their_value) in get_changed(base_days, their_days).iteritems():
+        changed_days.setdefault((week_index, name), []).append((day, base_value, their_value))
+        if (week_index, name) not in changed_entries:
+            # Time moved between days, without changing the week's total.
+            changed_entries[(week_index, name)] = (base_entries.get((week_index, name), 0),
+                                                   their_entries.get((week_index, name), 0))
+
+    columns = dict((name, column) for column, name in enumerate(names))
+    for (week_index, name), (base_value, their_value) in changed_entries.iteritems():
+        column = columns.get(name)
+        if column is None:
+            # We have removed or renamed the subtask.
+            continue
+        _week = _task.get_or_insert_weekslot(week_index)
+        _week.widen(column + 1)
+        our_value = _week.get_time_in_entry(column)
+
+        # Days first, since setting a day changes the week's value by the same amount.
+        their_day_change = 0
+        for day, base_day_value, their_day_value in changed_days.get((week_index, name), ()):
+            _week.set_time_for_day(column, day, merge_time(_week.get_time_for_day(column, day), base_day_value,
+                                                           their_day_value))
+            their_day_change += their_day_value - base_day_value
+
+        if our_value == base_value:
+            value = their_value
+        elif our_value == their_value and (week_index, name) not in changed_days:
+            value = our_value
+        else:
+            # The rest of their change, on top of ours and the days just merged.
+            value = max(_week.get_time_in_entry(column) + their_value - base_value - their_day_change, 0)
+        _week.set_time_in_entry(column, value)
+    return len(changed_entries)
+
+
+def merge(tracker, _datastore, theirs):
+    """
+    Merges raw data stored in a tracker's file by something else into the tracker, then makes it the datastore's raw
+    data, so that the next save stores the tracker's differences from it.
+    The merge isn't recorded in the tracker's history, since it isn't the user's change to undo. The history is cleared
+    if anything was merged, since the steps already recorded may not undo correctly on top of it.
+    :param tracker.Tracker tracker: Tracker about to be saved. Its datastore's raw data is the base.
+    :param datastore.DataStore _datastore: The tracker's datastore.
+    :param dict theirs: Raw data now stored in the file, in the form described in datastore.py.
+    :return dict: Report of what was merged.
+    """
+    base = _datastore.raw_data
+    base_tasks = base['tasks']
+    their_tasks = theirs['tasks']
+    report = {'tasks_added': 0, 'tasks_removed': 0, 'tasks_merged': 0, 'entries_merged': 0, 'details_merged': 0}
+    our_task_order = list(tracker.task_order)
+    proxies = []  # Archived tasks not yet created, which read their data from the datastore.
+    stored_in_full = []
+    week_index = tracker.week_index
+
+    with tracker.history.suspended():
+        latest_week = max([raw_task['first_week_id'] + len(raw_task['weeks']) for raw_task in their_tasks.itervalues()]
+                          or [0])
+        while tracker.week_index < latest_week:
+            tracker.add_week()
+
+        for task_name, raw_theirs in their_tasks.iteritems():
+            raw_base = base_tasks.get(task_name)
+            if raw_theirs == raw_base:
+                continue
+            _task = tracker.tasks.get(task_name)
+            if _task is None:
+                if raw_base is None:
+                    logging.debug("Merging in new task %s" % task_name)
+                    tracker._handle_new_task(_datastore.create_task_from_raw(task_name, raw_theirs))
+                    report['tasks_added'] += 1
+                continue
+
+            if isinstance(_task, task_proxy.TaskProxy):
+                if _task.task is None and raw_theirs['archived']:
+                    proxies.append(_task)
+                    continue
+                _task = _task.materialize()
+            report['entries_merged'] += merge_task(_task, raw_base, raw_theirs)
+            report['tasks_merged'] += 1
+            if [_subtask.name for _subtask in _task.subtasks] != list(raw_theirs['subtasks']) or \
+                    _task.first_week_id != raw_theirs['first_week_id'] or \
+                    len(_task.weeks) != len(raw_theirs['weeks']):
+                # Their weeks' columns don't line up with ours, so the task is stored in full on the next save.
+                stored_in_full.append(task_name)
+
+        for task_name in base_tasks:
+            _task = tracker.tasks.get(task_name)
+            if task_name not in their_tasks and _task is not None and not _task.is_dirty:
+                logging.debug("Removing task %s, removed elsewhere" % task_name)
+                tracker.remove_task(_task)
+                report['tasks_removed'] += 1
+
+        if theirs['task_order'] != base['task_order'] and our_task_order == base['task_order']:
+            their_order = set(theirs['task_order'])
+            tracker.task_order[:] = ([task_name for task_name in theirs['task_order'] if task_name in tracker.tasks] +
+                                     [task_name for task_name in tracker.task_order if task_name not in their_order])
+            report['details_merged'] += 1
+        # Older files may not have these.
+        if theirs.get('first_date') != base.get('first_date') and theirs.get('first_date') and \
+                tracker.first_date.strftime("%Y-%m-%d") == base.get('first_date'):
+            tracker.first_date = datetime.datetime.strptime(theirs['first_date'], "%Y-%m-%d")
+            report['details_merged'] += 1
+        if theirs.get('archived_week_index') != base.get('archived_week_index') and \
+                tracker.archived_week_index == base.get('archived_week_index'):
+            tracker.archived_week_index = theirs.get('archived_week_index')
+            report['details_merged'] += 1
+
+    for task_name in stored_in_full:
+        del their_tasks[task_name]
+    _datastore.raw_data = theirs
+    for proxy in proxies:
+        proxy.reload_week_totals()
+    report['tasks_merged'] += len(proxies)
+
+    logging.debug("Merged changes made elsewhere: %s" % report)
+    if any(report.itervalues()) or tracker.week_index != week_index:
+        tracker.history.clear()
+        tracker.update()
+    return report
@@ -0,0 +1,89 @@
+import argparse
+import logging
+import os
+import sys
+
+import binary_datastore
+import datastore
+import journal_datastore
+import sqlite_datastore
+import streaming_json
+
+"""
+Converts a tracker between the .trk JSON format, the SQLite format and the binary format, in any direction. The format
+of each file is taken from its extension; see sqlite_datastore.SQLITE_EXTENSIONS and binary_datastore.BINARY_EXTENSIONS.
+Run as:
+python migrate.py <source> <destination> [--force]
+"""
+
+
+def read_raw_data(filename):
+    """
+    Reads all of the data from a tracker file in any format.
+    :param str filename: File to read.
+    :return dict: Raw data, in the form described in datastore.py.
+    """
+    if sqlite_datastore.is_sqlite_file(filename):
+        source = sqlite_datastore.SqliteDataStore(filename)
+        raw_data = source.get_raw_data()
+        source.close()
+        return raw_data
+    if binary_datastore.is_binary_file(filename):
+        source = binary_datastore.BinaryDataStore(filename)
+        raw_data = source.get_raw_data()
+        source.close()
+        return raw_data
+
+    # Includes any changes journalled since the .trk file was last written.
+    source = journal_datastore.JournalDataStore(filename)
+    return dict(source.raw_data)
+
+
+def write_raw_data(filename, raw_data):
+    """
+    Writes all of the data to a tracker file in any format, replacing anything already in it.
+    :param str filename: File to write.
+    :param dict raw_data: Raw data, in the form described in datastore.py.
+    """
+    if sqlite_datastore.is_sqlite_file(filename):
+        destination = sqlite_datastore.SqliteDataStore(filename)
+        destination.import_raw_data(raw_data)
+        destination.close()
+    elif binary_datastore.is_binary_file(filename):
+        binary_datastore.write_raw_data(filename, raw_data)
+    else:
+        # Any journal left over from a tracker being replaced would otherwise be replayed on top of the new one.
+        for journal_filename in (filename + '.journal.compacting', filename + '.journal'):
+            if os.path.exists(journal_filename):
+                os.remove(journal_filename)
+        with datastore.open_atomically(filename) as tracker_file:
+            streaming_json.dump(raw_data, tracker_file)
+
+
+def migrate(source_filename, destination_filename):
+    """
+    Copies a tracker from one file to another, converting between formats as needed.
+    :param str source_filename: Existing tracker file.
+    :param str destination_filename: File to write the tracker to.
+    """
+    logging.debug("Migrating %s to %s" % (source_filename, destination_filename))
+    write_raw_data(destination_filename, read_raw_data(source_filename))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a tracker between the .trk, SQLite and binary formats.")
+    parser.add_argument('source')
+    parser.add_argument('destination')
+    parser.add_argument('--force', action='store_true', help="Overwrite the destination if it already exists.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        parser.error("%s does not exist" % args.source)
+    if os.path.exists(args.destination) and not args.force:
+        parser.error("%s already exists, use --force to overwrite it" % args.destination)
+
+    migrate(args.source, args.destination)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,420 @@
+import logging
+import json
+import datetime
+import sqlite3
+from collections import OrderedDict
+import datastore
+
+"""
+Data stored in an SQLite database with the following tables:
+meta: key, value  # JSON encoded first_date and archived_week_index.
+tasks: id, name, first_week_id, archived, position  # position is the task's place in the task order.
+subtasks: task_id, position, name, estimate  # position defines the ordering of subtasks.
+weeks: task_id, week, width  # One row per week slot. width is the number of subtasks the week has values for.
+cells: task_id, week, subtask, value  # Time tracked. Only non-zero values are stored.
+days: task_id, week, subtask, day, value  # Time tracked on individual days, already included in cells. Only non-zero.
+
+week is the global week index, i.e. first_week_id + the week's offset in the .trk format, so that time tracked can be
+totalled per week in SQL. The primary keys of weeks and cells double as the (task, week) indexes used for lookups.
+"""
+
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY,
+                                  name TEXT NOT NULL UNIQUE,
+                                  first_week_id INTEGER NOT NULL,
+                                  archived INTEGER NOT NULL,
+                                  position INTEGER);
+CREATE TABLE IF NOT EXISTS subtasks (task_id INTEGER NOT NULL,
+                                     position INTEGER NOT NULL,
+                                     name TEXT NOT NULL,
+                                     estimate REAL NOT NULL,
+                                     PRIMARY KEY (task_id, position));
+CREATE TABLE IF NOT EXISTS weeks (task_id INTEGER NOT NULL,
+                                  week INTEGER NOT NULL,
+                                  width INTEGER NOT NULL,
+                                  PRIMARY KEY (task_id, week));
+CREATE TABLE IF NOT EXISTS cells (task_id INTEGER NOT NULL,
+                                  week INTEGER NOT NULL,
+                                  subtask INTEGER NOT NULL,
+                                  value REAL NOT NULL,
+                                  PRIMARY KEY (task_id, week, subtask));
+CREATE INDEX IF NOT EXISTS cells_by_week ON cells (week);
+CREATE TABLE IF NOT EXISTS days (task_id INTEGER NOT NULL,
+                                 week INTEGER NOT NULL,
+                                 subtask INTEGER NOT NULL,
+                                 day INTEGER NOT NULL,
+                                 value REAL NOT NULL,
+                                 PRIMARY KEY (task_id, week, subtask, day));
+"""
+
+
+def is_sqlite_file(filename):
+    """
+    Whether a tracker file should be stored with SqliteDataStore, judging by its extension.
+    :param str filename:
+    :return bool:
+    """
+    return filename.lower().endswith(SQLITE_EXTENSIONS)
+
+
+class SqliteDataStore(datastore.DataStore):
+    """
+    DataStore backed by an SQLite database.
+    Only the task order and metadata are read up front. Each task is read from the database when it is created, and
+    saving writes only the tasks and weeks that have changed, in a single transaction.
+    """
+    def __init__(self, filename):
+        """
+        :param str filename: Filename with file path of the database. Created if it doesn't exist.
+        :return:
+        """
+        # Loading in the background uses the connection from a worker thread. Only one thread uses it at a time.
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.task_ids = {}  # {task_name: id}, for the tasks that are stored.
+        self.task_positions = {}  # {task_name: position}, for the stored tasks that are in the task order.
+
+        datastore.DataStore.__init__(self, filename)
+
+    @property
+    def tasks(self):
+        """
+        Read-only access to the raw task data. Reads every task from the database, so use get_raw_task where possible.
+        :return dict: Dict of {task_name: task_details}
+        """
+        return dict((task_name, self.get_raw_task(task_name)) for task_name in self.task_ids)
+
+    def load_from_file(self):
+        """
+        Load the metadata and task order from the database. Tasks are read as they are created.
+        """
+        logging.debug("Loading datastore from database: %s" % self.filename)
+        meta = dict(self.connection.execute("SELECT key, value FROM meta"))
+        if not meta:
+            # A new database. Store the defaults, so the file is complete as soon as it exists.
+            self.raw_data['first_date'] = datetime.datetime.strftime(datetime.datetime.today(), "%Y-%m-%d")
+            self.raw_data['archived_week_index'] = 0
+            with self.connection:
+                self.save_meta()
+        else:
+            for key, value in meta.iteritems():
+                self.raw_data[key] = json.loads(value)
+
+        self.task_ids = {}
+        self.task_positions = {}
+        task_order = []
+        for task_id, task_name, position in self.connection.execute("SELECT id, name, position FROM tasks "
+                                                                    "ORDER BY position"):
+            self.task_ids[task_name] = task_id
+            if position is not None:
+                self.task_positions[task_name] = position
+                task_order.append(task_name)
+        self.raw_data['task_order'] = task_order
+        self.raw_data['tasks'] = {}
+
+    def get_raw_task(self, task_name):
+        """
+        Reads the raw task details associated with a given task name from the database.
+        :param str task_name:
+        :return dict: Dict of raw task details, in the same form as stored by datastore.DataStore.
+        """
+        task_id = self.task_ids[task_name]
+        first_week_id, archived = self.connection.execute("SELECT first_week_id, archived FROM tasks WHERE id = ?",
+                                                          (task_id,)).fetchone()
+
+        # Ordered, so that subtasks are created in the order they were stored.
+        subtasks = OrderedDict()
+        for name, estimate in self.connection.execute("SELECT name, estimate FROM subtasks WHERE task_id = ? "
+                                                      "ORDER BY position", (task_id,)):
+            subtasks[name] = {'estimate': estimate}
+
+        weeks = [[0] * width for _, width in self.connection.execute("SELECT week, width FROM weeks "
+                                                                     "WHERE task_id = ? ORDER BY week", (task_id,))]
+        for week, column, value in self.connection.execute("SELECT week, subtask, value FROM cells WHERE task_id = ?",
+                                                           (task_id,)):
+            weeks[week - first_week_id][column] = value
+
+        raw_task = {'weeks': weeks,
+                    'first_week_id': first_week_id,
+                    'subtasks': subtasks,
+                    'archived': bool(archived)}
+
+        days = {}
+        for week, column, day, value in self.connection.execute("SELECT week, subtask, day, value FROM days "
+                                                                "WHERE task_id = ? ORDER BY week, subtask, day",
+                                                                (task_id,)):
+            days.setdefault(str(week - first_week_id), []).append([column, day, value])
+        if days:
+            raw_task['days'] = days
+        return raw_task
+
+    def is_task_archived(self, task_name):
+        """
+        Whether a stored task is archived, without reading the rest of the task.
+        :param str task_name:
+        :return bool:
+        """
+        return bool(self.connection.execute("SELECT archived FROM tasks WHERE id = ?",
+                                            (self.task_ids[task_name],)).fetchone()[0])
+
+    def get_task_week_totals(self, task_name):
+        """
+        Totals the time tracked in each week of a stored task in SQL, without reading the rest of the task.
+        :param str task_name:
+        :return dict: {week_index: time tracked}
+        """
+        task_id = self.task_ids[task_name]
+        week_totals = dict((week, 0) for week, in self.connection.execute("SELECT week FROM weeks WHERE task_id = ?",
+                                                                          (task_id,)))
+        week_totals.update(self.connection.execute("SELECT week, SUM(value) FROM cells WHERE task_id = ? "
+                                                   "GROUP BY week", (task_id,)))
+        return week_totals
+
+    def get_raw_data(self):
+        """
+        Reads everything from the database.
+        :return dict: Raw data, in the form described in datastore.py.
+        """
+        raw_data = dict(self.raw_data)
+        raw_data['tasks'] = self.tasks
+        raw_data['task_order'] = list(self.task_order)
+        return raw_data
+
+    def get_highest_week_id(self):
+        """
+        Returns the ID of the latest week. This tells us how many weeks exist.
+        :return int: Highest stored week index.
+        """
+        return self.connection.execute("SELECT COALESCE(MAX(week) + 1, 0) FROM weeks").fetchone()[0]
+
+    def save_to_file(self, tracker):
+        """
+        Writes any changes since the last save to the database, in a single transaction.
+        Tasks that haven't changed since they were last saved are skipped.
+        :param tracker.Tracker tracker: Tracker object to store.
+        """
+        logging.debug("Saving datastore to database: %s" % self.filename)
+        tasks_written = 0
+        weeks_written = 0
+        with self.connection:
+            for task_name in self.task_ids.keys():
+                if task_name not in tracker.tasks:
+                    self.delete_task(task_name)
+
+            for _task in tracker.tasks.itervalues():
+                if _task.is_dirty or _task.task_name not in self.task_ids:
+                    weeks_written += self.save_task(_task)
+                    tasks_written += 1
+
+            self.save_archived_week_index(tracker.archived_week_index)
+            self.save_first_date(tracker.first_date)
+            self.save_task_order(tracker.task_order)
+            self.save_meta()
+        logging.debug("Wrote %d tasks and %d weeks" % (tasks_written, weeks_written))
+
+        self.mark_saved(tracker)
+
+    def prepare_save(self, tracker):
+        """
+        The changes are written straight away rather than on another thread, since the connection is also used on the
+        Tk thread (e.g. to create archived tasks as they are used) and must only be used by one thread at a time. Only
+        the rows that have changed are written, so this is quick.
+        :param tracker.Tracker tracker: Tracker object to store.
+        :return: Function that does nothing, since the changes have already been written.
+        """
+        self.save_to_file(tracker)
+        return lambda: None
+
+    def save_task(self, _task):
+        """
+        Writes the parts of a task that have changed since it was last saved. Must be called within a transaction.
+        :param task.Task _task: Task to be stored.
+        :return int: Number of weeks written.
+        """
+        task_id = self.task_ids.get(_task.task_name)
+        if task_id is not None:
+            first_week_id = self.connection.execute("SELECT first_week_id FROM tasks WHERE id = ?",
+                                                    (task_id,)).fetchone()[0]
+        if _task.dirty or task_id is None or first_week_id != _task.first_week_id:
+            self.save_whole_task(_task)
+            return len(_task.weeks)
+
+        for sub in _task.subtasks:
+            if sub.dirty:
+                self.save_subtasks(task_id, _task)
+                break
+
+        for _week in _task.dirty_weeks:
+            offset = _week.index - _task.first_week_id
+            if offset >= len(_task.weeks) or _task.weeks[offset] is not _week:
+                # Weeks aren't contiguous, e.g. if weeks were added while the task was archived.
+                offset = _task.weeks.index(_week)
+            self.save_week(task_id, _task.first_week_id + offset, _week.time_tracked, _week.get_daily_values())
+
+        return len(_task.dirty_weeks)
+
+    def save_whole_task(self, _task):
+        """
+        Writes every detail of a task, replacing anything already stored for it. Must be called within a transaction.
+        :param task.Task _task: Task to be stored.
+        """
+        task_id = self.task_ids.get(_task.task_name)
+        if task_id is None:
+            cursor = self.connection.execute("INSERT INTO tasks (name, first_week_id, archived) VALUES (?, ?, ?)",
+                                             (_task.task_name, _task.first_week_id, _task.archived))
+            task_id = cursor.lastrowid
+            self.task_ids[_task.task_name] = task_id
+        else:
+            self.connection.execute("UPDATE tasks SET first_week_id = ?, archived = ? WHERE id = ?",
+                                    (_task.first_week_id, _task.archived, task_id))
+            self.connection.execute("DELETE FROM weeks WHERE task_id = ?", (task_id,))
+            self.connection.execute("DELETE FROM cells WHERE task_id = ?", (task_id,))
+            self.connection.execute("DELETE FROM days WHERE task_id = ?", (task_id,))
+
+        self.save_subtasks(task_id, _task)
+
+        # Weeks are stored by position, as in the .trk format, so the task is read back the same way from either.
+        self.connection.executemany("INSERT INTO weeks (task_id, week, width) VALUES (?, ?, ?)",
+                                    [(task_id, _task.first_week_id + offset, _week.width)
+                                     for offset, _week in enumerate(_task.weeks)])
+        self.connection.executemany("INSERT INTO cells (task_id, week, subtask, value) VALUES (?, ?, ?, ?)",
+                                    [(task_id, _task.first_week_id + offset, column, value)
+                                     for offset, _week in enumerate(_task.weeks)
+                                     for column, value in enumerate(_week.time_tracked) if value])
+        self.connection.executemany("INSERT INTO days (task_id, week, subtask, day, value) VALUES (?, ?, ?, ?, ?)",
+                                    [(task_id, _task.first_week_id + offset, column, day, value)
+                                     for offset, _week in enumerate(_task.weeks)
+                                     for column, day, value in _week.get_daily_values()])
+
+    def save_subtasks(self, task_id, _task):
+        """
+        Writes the names and estimates of all of the subtasks of a task. Must be called within a transaction.
+        :param int task_id: ID of the stored task.
+        :param task.Task _task: Task whose subtasks are to be stored.
+        """
+        self.connection.execute("DELETE FROM subtasks WHERE task_id = ?", (task_id,))
+        self.connection.executemany("INSERT INTO subtasks (task_id, position, name, estimate) VALUES (?, ?, ?, ?)",
+                                    [(task_id, position, sub.name, sub.estimate)
+                                     for position, sub in enumerate(_task.subtasks)])
+
+    def save_week(self, task_id, week, values, day_values):
+        """
+        Writes the time tracked in a single week. Must be called within a transaction.
+        Cells are written individually, so only the rows for this week are touched.
+        :param int task_id: ID of the stored task.
+        :param int week: Global index of the week.
+        :param list values: List of floats, one per subtask.
+        :param list day_values: Time tracked on individual days, as [[<subtask index>, <day>, <time tracked>], ...].
+        """
+        self.connection.execute("INSERT OR REPLACE INTO weeks (task_id, week, width) VALUES (?, ?, ?)",
+                                (task_id, week, len(values)))
+        for column, value in enumerate(values):
+            if value:
+                self.connection.execute("INSERT OR REPLACE INTO cells (task_id, week, subtask, value) "
+                                        "VALUES (?, ?, ?, ?)", (task_id, week, column, value))
+            else:
+                self.connection.execute("DELETE FROM cells WHERE task_id = ? AND week = ? AND subtask = ?",
+                                        (task_id, week, column))
+
+        self.connection.execute("DELETE FROM days WHERE task_id = ? AND week = ?", (task_id, week))
+        self.connection.executemany("INSERT INTO days (task_id, week, subtask, day, value) VALUES (?, ?, ?, ?, ?)",
+                                    [(task_id, week, column, day, value) for column, day, value in day_values])
+
+    def delete_task(self, task_name):
+        """
+        Removes a task from the database, e.g. because it has been renamed. Must be called within a transaction.
+        :param str task_name: Name of the task to remove.
+        """
+        task_id = self.task_ids.pop(task_name)
+        self.task_positions.pop(task_name, None)
+        self.connection.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        self.connection.execute("DELETE FROM subtasks WHERE task_id = ?", (task_id,))
+        self.connection.execute("DELETE FROM weeks WHERE task_id = ?", (task_id,))
+        self.connection.execute("DELETE FROM cells WHERE task_id = ?", (task_id,))
+        self.connection.execute("DELETE FROM days WHERE task_id = ?", (task_id,))
+
+    def save_task_order(self, task_order):
+        """
+        Stores the order that tasks are displayed in. Only the tasks whose position has changed are written.
+        :param list[str] task_order: String list of task names.
+        """
+        datastore.DataStore.save_task_order(self, task_order)
+        positions = dict((task_name, position) for position, task_name in enumerate(task_order)
+                         if task_name in self.task_ids)
+        changed = [(positions.get(task_name), self.task_ids[task_name]) for task_name in self.task_ids
+                   if positions.get(task_name) != self.task_positions.get(task_name)]
+        self.connection.executemany("UPDATE tasks SET position = ? WHERE id = ?", changed)
+        self.task_positions = positions
+
+    def save_meta(self):
+        """
+        Writes the first date and archived week index to the database. Must be called within a transaction.
+        """
+        self.connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                    [(key, json.dumps(self.raw_data[key]))
+                                     for key in ('first_date', 'archived_week_index')])
+
+    def import_raw_data(self, raw_data):
+        """
+        Replaces the contents of the database with some raw data, e.g. from a .trk file.
+        :param dict raw_data: Raw data, in the form described in datastore.py.
+        """
+        logging.debug("Importing raw data into database: %s" % self.filename)
+        with self.connection:
+            for table in ('meta', 'tasks', 'subtasks', 'weeks', 'cells', 'days'):
+                self.connection.execute("DELETE FROM %s" % table)
+
+            task_order = raw_data['task_order']
+            positions = dict((task_name, position) for position, task_name in enumerate(task_order))
+            for task_name, raw_task in raw_data['tasks'].iteritems():
+                first_week_id = raw_task['first_week_id']
+                task_id = self.connection.execute("INSERT INTO tasks (name, first_week_id, archived, position) "
+                                                  "VALUES (?, ?, ?, ?)",
+                                                  (task_name, first_week_id, raw_task['archived'],
+                                                   positions.get(task_name))).lastrowid
+                self.connection.executemany("INSERT INTO subtasks (task_id, position, name, estimate) "
+                                            "VALUES (?, ?, ?, ?)",
+                                            [(task_id, position, name, details.get('estimate', 0))
+                                             for position, (name, details)
+                                             in enumerate(raw_task['subtasks'].iteritems())])
+                self.connection.executemany("INSERT INTO weeks (task_id, week, width) VALUES (?, ?, ?)",
+                                            [(task_id, first_week_id + offset, len(values))
+                                             for offset, values in enumerate(raw_task['weeks'])])
+                self.connection.executemany("INSERT INTO cells (task_id, week, subtask, value) VALUES (?, ?, ?, ?)",
+                                            [(task_id, first_week_id + offset, column, value)
+                                             for offset, values in enumerate(raw_task['weeks'])
+                                             for column, value in enumerate(values) if value])
+                self.connection.executemany("INSERT INTO days (task_id, week, subtask, day, value) "
+                                            "VALUES (?, ?, ?, ?, ?)",
+                                            [(task_id, first_week_id + int(offset), column, day, value)
+                                             for offset, day_values in (raw_task.get('days') or {}).iteritems()
+                                             for column, day, value in day_values])
+
+            for key in ('first_date', 'archived_week_index'):
+                self.raw_data[key] = raw_data[key]
+            self.save_meta()
+
+        self.load_from_file()
+
+    def get_week_totals(self):
+        """
+        Totals the stored time tracked per week in SQL, without creating any tasks.
+        :return tuple: (List of total time tracked, list of number of tasks with time tracked), by week index.
+        """
+        highest_week_id = self.get_highest_week_id()
+        totals = [0] * highest_week_id
+        task_counts = [0] * highest_week_id
+        for week, total, task_count in self.connection.execute("SELECT week, SUM(value), COUNT(DISTINCT task_id) "
+                                                               "FROM cells GROUP BY week"):
+            totals[week] = total
+            task_counts[week] = task_count
+        return totals, task_counts
+
+    def close(self):
+        """
+        Close the connection to the database.
+        """
+        self.connection.close()
@@ -0,0 +1,156 @@
+import json
+import re
+from collections import OrderedDict
+
+"""
+Reads and writes tracker files (in the format described in datastore.py) a piece at a time, rather than building the
+whole file as one string. The tasks map is decoded and encoded one task at a time, so the only memory needed on top of
+the raw data itself is a chunk of the file and a single task.
+"""
+
+CHUNK_SIZE = 64 * 1024  # Bytes read at a time.
+
+WHITESPACE = re.compile(r'\s*')
+
+# Top level key that is streamed one entry at a time. Everything else is small enough to decode in one go.
+STREAMED_KEY = 'tasks'
+
+
+class StreamReader(object):
+    """
+    Decodes JSON values from a file, reading as little of it at a time as possible.
+    """
+    def __init__(self, json_file, chunk_size=CHUNK_SIZE):
+        """
+        :param file json_file: File to read from.
+        :param int chunk_size: Bytes to read at a time.
+        :return:
+        """
+        self.json_file = json_file
+        self.chunk_size = chunk_size
+        # Objects keep their order, since the order of a task's subtasks is the order of its columns.
+        self.decoder = json.JSONDecoder(object_pairs_hook=OrderedDict)
+        self.buffer = ''
+        self.position = 0  # Position in the buffer of the next character to be read.
+        self.finished = False  # Whether the end of the file has been reached.
+
+    def read_chunk(self):
+        """
+        Add the next chunk of the file to the buffer, dropping whatever has already been read.
+        :return bool: False if the end of the file has been reached.
+        """
+        chunk = self.json_file.read(self.chunk_size)
+        if not chunk:
+            self.finished = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        """
+        Gets the next character that isn't whitespace, without consuming it.
+        :return str: Next character, or '' at the end of the file.
+        """
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read_chunk():
+                return ''
+
+    def expect(self, characters):
+        """
+        Consumes the next character that isn't whitespace, which must be one of the given characters.
+        :param str characters: Characters that are allowed next.
+        :return str: The character consumed.
+        """
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError("Expected one of %r at position %d of the buffer, found %r" %
+                             (characters, self.position, character))
+        self.position += 1
+        return character
+
+    def decode_value(self):
+        """
+        Decodes the next complete JSON value, reading more of the file until there is enough to decode it.
+        :return: Decoded value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except ValueError:
+                if not self.read_chunk():
+                    raise
+                continue
+            if end == len(self.buffer) and not self.finished and self.read_chunk():
+                # A number (or literal) at the very end of the buffer may carry on in the next chunk.
+                continue
+            self.position = end
+            return value
+
+    def iter_keys(self):
+        """
+        Decodes the next JSON object one entry at a time.
+        Each value must be consumed (e.g. with decode_value) before moving on to the next key.
+        :return generator: Yields each key of the object.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.position += 1
+            return
+        while True:
+            key = self.decode_value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+
+def load(json_file, chunk_size=CHUNK_SIZE):
+    """
+    Reads raw tracker data from a file, decoding the tasks one at a time.
+    :param file json_file: File to read from.
+    :param int chunk_size: Bytes to read at a time.
+    :return dict: Raw data, in the form described in datastore.py.
+    """
+    reader = StreamReader(json_file, chunk_size)
+    raw_data = {}
+    for key in reader.iter_keys():
+        if key == STREAMED_KEY and reader.peek() == '{':
+            tasks = raw_data[key] = {}
+            for task_name in reader.iter_keys():
+                tasks[task_name] = reader.decode_value()
+        else:
+            raw_data[key] = reader.decode_value()
+
+    if reader.peek():
+        raise ValueError("Extra data after the end of the tracker data")
+    return raw_data
+
+
+def dump(raw_data, json_file):
+    """
+    Writes raw tracker data to a file, encoding the tasks one at a time.
+    :param dict raw_data: Raw data, in the form described in datastore.py.
+    :param file json_file: File to write to.
+    """
+    json_file.write('{')
+    for key_index, (key, value) in enumerate(raw_data.iteritems()):
+        if key_index:
+            json_file.write(', ')
+        json_file.write(json.dumps(key) + ': ')
+
+        if key != STREAMED_KEY:
+            json_file.write(json.dumps(value))
+            continue
+
+        json_file.write('{')
+        for task_index, (task_name, raw_task) in enumerate(value.iteritems()):
+            if task_index:
+                json_file.write(', ')
+            json_file.write(json.dumps(task_name) + ': ' + json.dumps(raw_task))
+        json_file.write('}')
+    json_file.write('}')
@@ -1,4 +1,16 @@
 class Subtask(object):
     def __init__(self, name, estimate=0):
         self.name = name
-        self.estimate = estimate
+        self._estimate = estimate
+        # Whether this subtask has changed since it was last saved.
+        self.dirty = True
+
+    @property
+    def estimate(self):
+        return self._estimate
+
+    @estimate.setter
+    def estimate(self, value):
+        if value != self._estimate:
+            self._estimate = value
+            self.dirty = True
@@ -0,0 +1,169 @@
+import logging
+
+"""
+Summaries of the time tracked in a week, or a range of weeks, as text (e.g. for pasting into a status report) and as
+structured data:
+{week_index: <int>,  # First week summarised.
+ last_week_index: <int>,  # Last week summarised. The same as week_index for a single week.
+ week_name: <str>,  # Name of the first week, e.g. "14 Sep".
+ last_week_name: <str>,  # Name of the last week.
+ total: <time tracked>,  # Across all tasks.
+ tasks: [{name: <task_name>,
+          total: <time tracked>,
+          subtasks: [[<subtask name>, <time tracked>], ...]  # In subtask order.
+          }, ...]  # Tasks with time tracked, in task order.
+ }
+"""
+
+
+class SummaryEngine(object):
+    """
+    Produces summaries for a tracker. Summaries are cached until the tracker next changes, so asking for the same one
+    again (e.g. clicking a week label repeatedly) costs nothing.
+    The first week asked for after a change is found with one pass over the tasks' cached week totals, skipped
+    altogether if the tracker's per-week task count shows that nothing was tracked. For any more weeks, or a range of
+    weeks, an index of which tasks have time tracked in each week is built once per change instead, so that each week
+    doesn't need another pass over the tasks.
+    """
+    def __init__(self, tracker):
+        """
+        :param tracker.Tracker tracker: Tracker to summarise.
+        :return:
+        """
+        self.tracker = tracker
+        self.cache_key = None  # State of the tracker that the cache and index were built from.
+        self.cache = {}  # {(first week index, last week index): (summary data, summary text)}
+        # {week_index: [(position in task order, task.Task)]}, in task order. Only tasks with time tracked.
+        self.week_tasks = None
+
+    def get_week_summary(self, week_index):
+        """
+        :param int week_index: Index of the week to summarise.
+        :return dict: Summary data for the week, as described at the top of this file.
+        """
+        return self.get_summary(week_index, week_index)[0]
+
+    def get_week_summary_text(self, week_index):
+        """
+        :param int week_index: Index of the week to summarise.
+        :return str: Formatted summary of the tasks with time tracked in the week.
+        """
+        return self.get_summary(week_index, week_index)[1]
+
+    def get_range_summary(self, first_week_index, last_week_index):
+        """
+        :param int first_week_index: Index of the first week to summarise.
+        :param int last_week_index: Index of the last week to summarise, inclusive.
+        :return dict: Summary data for the weeks, with the time tracked in each of them added together.
+        """
+        return self.get_summary(first_week_index, last_week_index)[0]
+
+    def get_range_summary_text(self, first_week_index, last_week_index):
+        """
+        :param int first_week_index: Index of the first week to summarise.
+        :param int last_week_index: Index of the last week to summarise, inclusive.
+        :return str: Formatted summary of the tasks with time tracked in any of the weeks.
+        """
+        return self.get_summary(first_week_index, last_week_index)[1]
+
+    def get_summary(self, first_week_index, last_week_index):
+        """
+        Gets a summary from the cache, or creates it.
+        :param int first_week_index:
+        :param int last_week_index:
+        :return tuple: (summary data, summary text)
+        """
+        # Changes made through the tracker's tasks bump change_count; anything else that can change a summary (e.g.
+        # renaming a subtask) is recorded in the history, apart from changes made with it suspended (e.g. a merge or an
+        # import), which clear it.
+        history = self.tracker.history
+        cache_key = (self.tracker.change_count, history.sequence, history.clear_count)
+        if cache_key != self.cache_key:
+            self.cache_key = cache_key
+            self.cache.clear()
+            self.week_tasks = None
+
+        key = (first_week_index, last_week_index)
+        if key not in self.cache:
+            data = self.create_summary(first_week_index, last_week_index)
+            self.cache[key] = (data, ''.join(iter_summary_text(data)))
+        return self.cache[key]
+
+    def build_week_tasks(self):
+        """
+        Index the tasks by the weeks they have time tracked in. Archived tasks are included, since the time they
+        tracked still counts, but only their totals are read, so those that haven't been used aren't created.
+        """
+        self.week_tasks = {}
+        for position, task_name in enumerate(self.tracker.task_order):
+            _task = self.tracker.tasks[task_name]
+            for week_index, total in _task.get_week_totals().iteritems():
+                if total > 0:
+                    self.week_tasks.setdefault(week_index, []).append((position, _task))
+        logging.debug("Indexed tasks for summaries across %d weeks" % len(self.week_tasks))
+
+    def get_week_tasks(self, week_index, single_week):
+        """
+        Finds the tasks with time tracked in a week.
+        :param int week_index:
+        :param bool single_week: Whether this is the only week being summarised. If it is also the first summary since
+            the last change, the tasks are found directly rather than by building the index.
+        :return list: [(position in task order, task.Task)], in task order.
+        """
+        if self.week_tasks is None and single_week and not self.cache:
+            if self.tracker.get_week_task_count(week_index) == 0:
+                return []
+            tasks = self.tracker.tasks
+            return [(position, tasks[task_name]) for position, task_name in enumerate(self.tracker.task_order)
+                    if tasks[task_name].get_time_for_week(week_index) > 0]
+
+        if self.week_tasks is None:
+            self.build_week_tasks()
+        return self.week_tasks.get(week_index, [])
+
+    def create_summary(self, first_week_index, last_week_index):
+        """
+        :param int first_week_index:
+        :param int last_week_index:
+        :return dict: Summary data, as described at the top of this file.
+        """
+        task_summaries = {}  # {position in task order: task summary}
+        for week_index in range(first_week_index, last_week_index + 1):
+            for position, _task in self.get_week_tasks(week_index, first_week_index == last_week_index):
+                week_total, subtask_times = _task.get_week_summary_values(week_index)
+                task_summary = task_summaries.get(position)
+                if task_summary is None:
+                    task_summaries[position] = {'name': _task.task_name,
+                                                'total': week_total,
+                                                'subtasks': [[sub.name, time_spent]
+                                                             for sub, time_spent in zip(_task.subtasks, subtask_times)]}
+                else:
+                    task_summary['total'] += week_total
+                    for subtask_summary, time_spent in zip(task_summary['subtasks'], subtask_times):
+                        subtask_summary[1] += time_spent
+
+        tasks = [task_summaries[position] for position in sorted(task_summaries)]
+        return {'week_index': first_week_index,
+                'last_week_index': last_week_index,
+                'week_name': self.tracker.get_week_name(first_week_index),
+                'last_week_name': self.tracker.get_week_name(last_week_index),
+                'total': sum(summary['total'] for summary in tasks),
+                'tasks': tasks}
+
+
+def iter_summary_text(data):
+    """
+    Formats a summary as text, a piece at a time, e.g. to be joined or written to a file.
+    :param dict data: Summary data, as described at the top of this file.
+    :return: Generator of strings.
+    """
+    if data['week_index'] == data['last_week_index']:
+        yield "Week beginning: %s\n\n" % data['week_name']
+    else:
+        yield "Weeks beginning: %s to %s\n\n" % (data['week_name'], data['last_week_name'])
+
+    for task_summary in data['tasks']:
+        yield "%s: %s\n" % (task_summary['name'], task_summary['total'])
+        for subtask_name, time_spent in task_summary['subtasks']:
+            yield "\t%s: %s\n" % (subtask_name, time_spent)
+        yield "\n\n"
@@ -0,0 +1,272 @@
+import argparse
+import httplib
+import logging
+import socket
+import sys
+import urlparse
+
+import export
+import sync_server
+import task_proxy
+
+"""
+Syncs a tracker with the service in sync_server.py: sends the task definitions and time the tracker has changed since
+the last sync, then receives the canonical task definitions and the team's time changed since then.
+Tasks and subtasks defined by others are added to the tracker, so that everyone uses the same names. The team's time
+is kept on the client (see SyncClient.team_time), rather than added to the tracker, which only holds the user's own.
+Run as:
+python sync_client.py <tracker file> <user> [--url http://127.0.0.1:8265]
+"""
+
+TIMEOUT = 30  # Seconds to wait for the service.
+
+
+class SyncError(Exception):
+    pass
+
+
+def get_entries(_task):
+    """
+    Archived tasks that haven't been created yet are read from the datastore, so that syncing doesn't create them.
+    :param task.Task|task_proxy.TaskProxy _task:
+    :return tuple: ([subtask names], {(subtask name, week_index): time tracked}), for the entries with time tracked.
+    """
+    if isinstance(_task, task_proxy.TaskProxy) and _task.task is None:
+        raw_task = _task.datastore.get_raw_task(_task.task_name)
+        subtask_names = list(raw_task['subtasks'])
+        weeks = enumerate(raw_task['weeks'], raw_task['first_week_id'])
+    else:
+        subtask_names = [_subtask.name for _subtask in _task.subtasks]
+        weeks = ((_week.index, _week.time_tracked) for _week in _task.weeks)
+
+    entries = {}
+    for week_index, values in weeks:
+        for subtask_name, hours in zip(subtask_names, values):
+            if hours:
+                entries[(subtask_name, week_index)] = hours
+    return subtask_names, entries
+
+
+class SyncClient(object):
+    """
+    Syncs one user's tracker. Only the tasks changed since the last sync are compared with what was last sent, found
+    from the tracker's history, so a sync costs next to nothing when nothing has changed. The first sync, and the first
+    after the history is cleared (e.g. by a reload or an import), compares every task. The names of the tasks last sent
+    are also checked against the tracker, so that the time of a task that has been renamed or removed is cleared.
+    """
+    def __init__(self, tracker, user, url="http://%s:%d" % (sync_server.DEFAULT_HOST, sync_server.DEFAULT_PORT),
+                 timeout=TIMEOUT):
+        """
+        :param tracker.Tracker tracker: Tracker to sync.
+        :param str user: Name of the tracker's user. Must be unique in the team.
+        :param str url: URL of the service.
+        :param float timeout: Seconds to wait for the service.
+        :return:
+        """
+        self.tracker = tracker
+        self.user = user
+        address = urlparse.urlparse(url)
+        self.connection = httplib.HTTPConnection(address.hostname, address.port or 80, timeout=timeout)
+
+        self.vector = {}  # {origin: number of the latest change pulled}. See sync_server.py.
+        self.definitions = {}  # {task name: [subtask names]}, the canonical definitions as last pulled.
+        self.synced = {}  # {task name: {(subtask name, week_index): time tracked}}, as last pushed.
+        self.sequence = None  # Value of the tracker's history.sequence when last pushed.
+        self.clear_count = None  # Value of the tracker's history.clear_count when last pushed.
+        self.team_time = {}  # {(user, task name, subtask name, week_index): time tracked}, for the whole team.
+
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def request(self, path, payload):
+        """
+        Sends a request to the service over the open connection, reconnecting once if it has been closed.
+        :param str path: '/push' or '/pull'.
+        :param dict payload: Request, as described in sync_server.py.
+        :return dict: Reply.
+        """
+        data = sync_server.encode(payload)
+        for attempt in range(2):
+            try:
+                self.connection.request('POST', path, data, {'Content-Type': 'application/json',
+                                                             'Content-Encoding': 'deflate'})
+                response = self.connection.getresponse()
+                reply_data = response.read()
+                break
+            except (httplib.HTTPException, socket.error) as e:
+                self.connection.close()
+                if attempt:
+                    raise SyncError("Couldn't reach the sync service: %s" % e)
+                logging.debug("Reconnecting to the sync service after: %s" % e)
+
+        if response.status != 200:
+            raise SyncError("Sync service replied %d %s" % (response.status, response.reason))
+        self.bytes_sent += len(data)
+        self.bytes_received += len(reply_data)
+        return sync_server.decode(reply_data)
+
+    def get_changed_tasks(self):
+        """
+        :return list[task.Task]: Tasks that may have changed since the last push.
+        """
+        history = self.tracker.history
+        if self.sequence is None or history.clear_count != self.clear_count:
+            return [self.tracker.tasks[task_name] for task_name in self.tracker.task_order]
+        # Tasks that have since been removed (e.g. creating them was undone) aren't sent.
+        return [_task for _task in history.get_tasks_changed_since(self.sequence)
+                if self.tracker.tasks.get(_task.task_name) is _task]
+
+    def get_changes(self):
+        """
+        Compares the tasks that may have changed with what was last pushed.
+        :return tuple: (task definitions, time changes, {task name: entries}), as sent to the service, and the entries
+            of each task compared, to become self.synced once pushed. Tasks no longer in the tracker have no entries.
+        """
+        task_definitions = []
+        time_changes = []
+        task_entries = {}
+        for _task in self.get_changed_tasks():
+            task_name = _task.task_name
+            synced = self.synced.get(task_name, {})
+            subtask_names, entries = get_entries(_task)
+            canonical = self.definitions.get(task_name)
+            if canonical is None or any(name not in canonical for name in subtask_names):
+                task_definitions.append({'name': task_name, 'subtasks': subtask_names})
+
+            for (subtask_name, week_index), hours in entries.iteritems():
+                if synced.get((subtask_name, week_index)) != hours:
+                    time_changes.append([task_name, subtask_name, week_index, hours])
+            # Entries that have been cleared.
+            for subtask_name, week_index in synced:
+                if (subtask_name, week_index) not in entries:
+                    time_changes.append([task_name, subtask_name, week_index, 0])
+            task_entries[task_name] = entries
+
+        # Tasks that have been renamed or removed since they were pushed. Their time is cleared from the service, since
+        # a renamed task's time is sent again under its new name.
+        for task_name, synced in self.synced.iteritems():
+            if task_name not in self.tracker.tasks:
+                time_changes.extend([task_name, subtask_name, week_index, 0] for subtask_name, week_index in synced)
+                task_entries[task_name] = {}
+        return task_definitions, time_changes, task_entries
+
+    def push(self):
+        """
+        Sends the changes made to the tracker since the last push, in batches of up to sync_server.MAX_CHANGES.
+        :return int: Number of time entries sent.
+        """
+        history = self.tracker.history
+        sequence, clear_count = history.sequence, history.clear_count
+        task_definitions, time_changes, task_entries = self.get_changes()
+
+        if task_definitions or time_changes:
+            logging.debug("Pushing %d task definitions and %d time changes" % (len(task_definitions), len(time_changes)))
+        batches = [time_changes[start:start + sync_server.MAX_CHANGES]
+                   for start in range(0, len(time_changes), sync_server.MAX_CHANGES)]
+        if task_definitions and not batches:
+            batches = [[]]
+        for batch_index, batch in enumerate(batches):
+            self.request('/push', {'user': self.user,
+                                   'tasks': task_definitions if batch_index == 0 else [],
+                                   'time': batch})
+
+        self.synced.update(task_entries)
+        for task_name, entries in task_entries.iteritems():
+            if not entries:
+                del self.synced[task_name]
+        self.sequence, self.clear_count = sequence, clear_count
+        return len(time_changes)
+
+    def pull(self):
+        """
+        Receives the changes made by everyone since the last pull, adding any new tasks and subtasks to the tracker.
+        :return int: Number of changes received.
+        """
+        count = 0
+        changed_definitions = {}
+        while True:
+            reply = self.request('/pull', {'vector': self.vector})
+            for task_definition in reply['tasks']:
+                self.definitions[task_definition['name']] = task_definition['subtasks']
+                changed_definitions[task_definition['name']] = task_definition['subtasks']
+            for user, task_name, subtask_name, week_index, hours in reply['time']:
+                self.team_time[(user, task_name, subtask_name, week_index)] = hours
+            count += len(reply['tasks']) + len(reply['time'])
+            self.vector = reply['vector']
+            if not reply['more']:
+                break
+
+        if any([self.apply_definition(task_name, subtask_names)
+                for task_name, subtask_names in changed_definitions.iteritems()]):
+            self.tracker.update()
+        return count
+
+    def apply_definition(self, task_name, subtask_names):
+        """
+        Adds a task and its subtasks to the tracker, if it doesn't already have them.
+        :param str task_name:
+        :param list[str] subtask_names: Canonical subtasks of the task, in order.
+        :return bool: Whether the tracker was changed.
+        """
+        _task = self.tracker.tasks.get(task_name)
+        created = _task is None
+        if created:
+            logging.debug("Adding task %s from the sync service" % task_name)
+            self.tracker.create_new_task(task_name)
+            _task = self.tracker.tasks.get(task_name)
+            if _task is None:
+                # The tracker has no weeks yet.
+                return False
+
+        existing = set(_subtask.name for _subtask in _task.subtasks)
+        missing = [subtask_name for subtask_name in subtask_names if subtask_name not in existing]
+        for subtask_name in missing:
+            _task.add_subtask(subtask_name)
+        return created or bool(missing)
+
+    def sync(self):
+        """
+        Push, then pull, so that the definitions pulled include this tracker's own.
+        :return tuple: (time entries sent, changes received)
+        """
+        return self.push(), self.pull()
+
+    def get_team_week_totals(self, task_name):
+        """
+        :param str task_name:
+        :return dict: {week_index: time tracked by the whole team}
+        """
+        totals = {}
+        for (user, entry_task_name, subtask_name, week_index), hours in self.team_time.iteritems():
+            if entry_task_name == task_name:
+                totals[week_index] = totals.get(week_index, 0) + hours
+        return totals
+
+    def close(self):
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync a tracker file with the sync service.")
+    parser.add_argument('tracker', help="Tracker file to sync.")
+    parser.add_argument('user', help="Name of the tracker's user.")
+    parser.add_argument('--url', default="http://%s:%d" % (sync_server.DEFAULT_HOST, sync_server.DEFAULT_PORT),
+                        help="URL of the sync service.")
+    args = parser.parse_args()
+
+    tracker = export.open_tracker(args.tracker)
+    client = SyncClient(tracker, args.user, args.url)
+    try:
+        sent, received = client.sync()
+    except SyncError as e:
+        print >> sys.stderr, e
+        return 1
+    finally:
+        client.close()
+    tracker.save()
+    print "Sent %d time entries, received %d changes (%d bytes sent, %d received)" % (
+        sent, received, client.bytes_sent, client.bytes_received)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
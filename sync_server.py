@@ -0,0 +1,231 @@
+import BaseHTTPServer
+import SocketServer
+import argparse
+import json
+import logging
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+
+"""
+Local service that keeps a team's tracker files consistent: it holds the canonical task definitions (each task's name
+and subtask names, in order), and the time each user has tracked, so that every user sees the same task names and the
+team's combined time. See sync_client.py for the client, which syncs a tracker with the service.
+
+Changes are kept as logs, one per origin: one for the task definitions, and one for each user's time. Every change
+in a log is numbered in order, and a client keeps a version vector of the latest number it has seen from each log,
+so it only ever pulls the changes made since then. Only the latest change to each entry is kept, so the logs grow
+with the number of entries rather than with the number of syncs.
+
+Time is sent as the current value of each changed entry, rather than as an amount to add, so that sending the same
+changes twice (e.g. retrying after a lost reply, or after a client restarts) never counts time twice. Only the user
+themselves changes their own entries, so there is nothing to reconcile.
+
+Requests and replies are HTTP POSTs of zlib compressed JSON:
+/push: {user: <str>,
+        tasks: [{name: <task name>, subtasks: [<subtask name>, ...]}, ...],  # Task definitions used by the user.
+        time: [[<task name>, <subtask name>, <week_index>, <time tracked>], ...]}  # Changed entries.
+       Replies {} once applied. Subtasks not in the canonical definitions are added to them, after the existing ones.
+/pull: {vector: {<origin>: <number of the latest change seen>, ...}}
+       Replies {tasks: [...], time: [[<user>, <task name>, <subtask name>, <week_index>, <time tracked>], ...],
+                vector: <version vector including the changes sent>,
+                more: <bool>}  # Whether there are more changes, not sent as the reply was full.
+Run as:
+python sync_server.py [--host 127.0.0.1] [--port 8265]
+"""
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8265
+
+DEFINITIONS = ''  # Origin of the task definitions. User names can't be empty.
+MAX_CHANGES = 10000  # Most changes sent in a single reply, or in a single push by a client.
+COMPRESSION_LEVEL = 6
+
+
+def encode(payload):
+    """
+    :param dict payload:
+    :return str: Payload as zlib compressed JSON, as sent on the wire.
+    """
+    return zlib.compress(json.dumps(payload, separators=(',', ':')), COMPRESSION_LEVEL)
+
+
+def decode(data):
+    """
+    :param str data: zlib compressed JSON, as sent on the wire.
+    :return dict: Payload.
+    """
+    return json.loads(zlib.decompress(data))
+
+
+class ChangeLog(object):
+    """
+    The changes from a single origin, each numbered in order. Only the latest change to each entry is kept.
+    """
+    def __init__(self):
+        self.sequence = 0  # Number of the latest change.
+        self.changes = OrderedDict()  # {entry key: (number, change)}, oldest first.
+
+    def add(self, key, change):
+        """
+        :param key: Key of the entry changed, replacing any earlier change to it.
+        :param change: Change, as sent on the wire.
+        """
+        self.sequence += 1
+        self.changes.pop(key, None)
+        self.changes[key] = (self.sequence, change)
+
+    def get(self, key):
+        """
+        :return: Latest change to an entry, or None.
+        """
+        numbered_change = self.changes.get(key)
+        return numbered_change[1] if numbered_change is not None else None
+
+    def get_changes_since(self, sequence, limit):
+        """
+        :param int sequence: Number of the latest change already seen.
+        :param int limit: Most changes to return.
+        :return list: [(number, change)] of the oldest changes after the given number, oldest first.
+        """
+        # Walked from the newest, so that the changes already seen are never visited.
+        newer = []
+        for key in reversed(self.changes):
+            number, change = self.changes[key]
+            if number <= sequence:
+                break
+            newer.append((number, change))
+        newer.reverse()
+        return newer[:limit]
+
+
+class SyncState(object):
+    """
+    Everything held by the service. Safe to use from several threads.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.logs = {DEFINITIONS: ChangeLog()}  # {origin: ChangeLog}
+
+    def push(self, user, tasks, time_changes):
+        """
+        :param str user: User sending the changes.
+        :param list tasks: Task definitions used by the user.
+        :param list time_changes: Changed entries of the user's time.
+        """
+        if not user:
+            raise ValueError("No user given")
+        with self.lock:
+            definitions = self.logs[DEFINITIONS]
+            for task_definition in tasks:
+                task_name = task_definition['name']
+                current = definitions.get(task_name)
+                subtasks = list(current['subtasks']) if current is not None else []
+                subtasks.extend(name for name in task_definition['subtasks'] if name not in subtasks)
+                if current is None or subtasks != current['subtasks']:
+                    logging.debug("Updating definition of task %s from %s" % (task_name, user))
+                    definitions.add(task_name, {'name': task_name, 'subtasks': subtasks})
+
+            log = self.logs.get(user)
+            if log is None:
+                log = self.logs[user] = ChangeLog()
+            for task_name, subtask_name, week_index, hours in time_changes:
+                log.add((task_name, subtask_name, week_index), [task_name, subtask_name, week_index, hours])
+
+    def pull(self, vector, limit=MAX_CHANGES):
+        """
+        :param dict vector: {origin: number of the latest change seen}
+        :param int limit: Most changes to return.
+        :return dict: Reply, as described at the top of this file.
+        """
+        reply = {'tasks': [], 'time': [], 'vector': dict(vector), 'more': False}
+        with self.lock:
+            for origin in sorted(self.logs):
+                log = self.logs[origin]
+                if log.sequence <= vector.get(origin, 0):
+                    continue
+                if limit <= 0:
+                    reply['more'] = True
+                    break
+                changes = log.get_changes_since(vector.get(origin, 0), limit)
+                if origin == DEFINITIONS:
+                    reply['tasks'].extend(change for _, change in changes)
+                else:
+                    reply['time'].extend([origin] + change for _, change in changes)
+                reply['vector'][origin] = changes[-1][0]
+                reply['more'] = reply['more'] or changes[-1][0] < log.sequence
+                limit -= len(changes)
+        return reply
+
+
+class SyncRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keeps the connection open between requests.
+
+    def do_POST(self):
+        try:
+            request = decode(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            if self.path == '/push':
+                self.server.state.push(request['user'], request.get('tasks', []), request.get('time', []))
+                reply = {}
+            elif self.path == '/pull':
+                reply = self.server.state.pull(request.get('vector', {}))
+            else:
+                self.send_error(404)
+                return
+        except (ValueError, KeyError, TypeError, zlib.error) as e:
+            logging.error("Bad %s request: %s" % (self.path, e))
+            self.send_error(400, str(e))
+            return
+
+        data = encode(reply)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Encoding', 'deflate')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logging.debug("%s: %s" % (self.address_string(), format % args))
+
+
+class SyncServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Serves a SyncState over HTTP, handling each connection in its own thread.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=(DEFAULT_HOST, DEFAULT_PORT), state=None):
+        """
+        :param tuple address: (host, port) to listen on. Port 0 picks a free port; see self.server_address.
+        :param SyncState state: State to serve. Defaults to an empty one.
+        :return:
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, address, SyncRequestHandler)
+        self.state = state if state is not None else SyncState()
+
+    @property
+    def url(self):
+        return "http://%s:%d" % self.server_address[:2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve shared task definitions and team time to tracker clients.")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Address to listen on.")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port to listen on.")
+    args = parser.parse_args()
+
+    server = SyncServer((args.host, args.port))
+    print "Serving on %s" % server.url
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,12 @@
 import weekslot
+import history
 import logging
 import subtask
+import timematrix
 
 
 class Task(object):
-    def __init__(self, name, first_week_id, subtasks=None, weeks=None, archived=False):
+    def __init__(self, name, first_week_id, subtasks=None, weeks=None, archived=False, days=None):
         """
         Task object. Stores time tracking about a task for all weeks.
         :param str name: Name of this task
@@ -13,13 +15,23 @@ class Task(object):
         :param list weeks: List of lists. Each list is the time spent on
             corresponding subtasks in that week.
         :param bool archived: Whether this task is to be displayed or not.
+        :param dict days: Time tracked on individual days, for the weeks that have any, as {<offset into weeks>:
+            [[<subtask index>, <day>, <time tracked>], ...]}. See weekslot.WeekSlot.
         :return:
         """
         self.task_name = name
         self.first_week_id = first_week_id
-        self.archived = False
+        self._archived = False
+        # Tracker that this task belongs to. Told when the total for one of this task's weeks changes.
+        self.tracker = None
         self.archive_after_update = False
 
+        # Change tracking, so that saving can skip tasks and weeks that haven't changed.
+        # dirty covers changes to the task itself (e.g. name, subtasks); changed weeks are held in dirty_weeks.
+        # New tasks start dirty. Call mark_clean once the task has been saved, or if it has just been loaded.
+        self.dirty = True
+        self.dirty_weeks = set()
+
         if subtasks is None:
             # If we are creating a new task, initialise an empty list of subtasks
             self.subtasks = []
@@ -27,22 +39,86 @@ class Task(object):
             # Otherwise, set the subtask list to be that passed in.
             self.subtasks = subtasks
 
+        # Time tracked, as a matrix of weeks by subtasks. self.weeks are views onto the rows of this matrix.
+        self.time_matrix = timematrix.create_time_matrix()
+
+        # Running totals, kept up to date as cells are written so that they never have to be recalculated.
+        self.total_time_spent = 0
+        self.subtask_totals = [0 for _ in self.subtasks]  # Total per subtask, in subtask order.
+        self.row_totals = []  # Total per week, in time matrix row order.
+        self._subtask_indexes = None  # {subtask.Subtask: index}, built on demand.
+
         self.weeks = []
+        # Index into self.weeks by global week index, so per-week queries don't have to search.
+        # Weeks aren't necessarily contiguous (e.g. no weeks are added while a task is archived), so this is a dict.
+        self.weeks_by_index = {}  # {week_index: weekslot.WeekSlot}
         if weeks is None:
             # Add one week. Expect that if no details are passed in,
             # then this will be the highest week index.
             # I.e. the most recent week.
             self.add_week(self.first_week_id)
         else:
+            if days is None:
+                days = {}
             for i, _week in enumerate(weeks):
                 week_index = self.first_week_id + i
                 # Make a copy of the list to pass in so we're not using the instance of the list that exists in the
                 # datastore
-                self.add_week(week_index, list(_week))
+                self.add_week(week_index, list(_week), days.get(i))
 
         # After object has been created correctly, flag whether it should be hidden or not.
         self.archived = archived
 
+    @property
+    def archived(self):
+        return self._archived
+
+    @archived.setter
+    def archived(self, value):
+        if value != self._archived:
+            self._archived = value
+            self.dirty = True
+            self.record_change(history.SetArchived(self, value))
+
+    @property
+    def is_dirty(self):
+        """
+        Whether anything about this task has changed since it was last saved.
+        :return bool:
+        """
+        if self.dirty or self.dirty_weeks:
+            return True
+        for sub in self.subtasks:
+            if sub.dirty:
+                return True
+        return False
+
+    def mark_dirty(self):
+        """
+        Flag this task as changed, so that it is written in full on the next save.
+        """
+        self.dirty = True
+
+    def record_change(self, operation):
+        """
+        Record a change in the tracker's history, so it can be undone. Changes made before the task belongs to a
+        tracker (e.g. while it is being created) aren't recorded.
+        :param history.Operation operation: Change that has just been made.
+        """
+        if self.tracker is not None:
+            self.tracker.history.record(operation)
+
+    def mark_clean(self):
+        """
+        Clear all change tracking, e.g. once this task has been saved.
+        """
+        self.dirty = False
+        for _week in self.dirty_weeks:
+            _week.dirty = False
+        self.dirty_weeks.clear()
+        for sub in self.subtasks:
+            sub.dirty = False
+
     @property
     def estimate(self):
         """
@@ -74,9 +150,24 @@ class Task(object):
         :return:
         """
         if self.check_subtask_name_validity(new_name):
+            old_name = _subtask.name
             subtask_index = self.subtasks.index(_subtask)
             self.subtasks[subtask_index].name = new_name
             _subtask.name = new_name
+            self._subtask_indexes = None
+            self.dirty = True
+            self.record_change(history.RenameSubtask(self, _subtask, old_name, new_name))
+
+    def set_subtask_estimate(self, _subtask, estimate):
+        """
+        Set the estimate of one of this task's subtasks.
+        :param subtask.Subtask _subtask: Subtask to change.
+        :param float estimate: New estimate.
+        """
+        old_estimate = _subtask.estimate
+        if estimate != old_estimate:
+            _subtask.estimate = estimate
+            self.record_change(history.SetEstimate(self, _subtask, old_estimate, estimate))
 
     def add_subtask(self, subtask_name):
         """
@@ -86,20 +177,44 @@ class Task(object):
         :param str subtask_name: Name of new subtask
         :return:
         """
-        new_subtask = subtask.Subtask(subtask_name)
+        self.append_subtask(subtask.Subtask(subtask_name))
+
+    def append_subtask(self, new_subtask):
+        """
+        Adds an existing subtask object to this task, e.g. when removing it is undone. See add_subtask.
+        :param subtask.Subtask new_subtask: Subtask to add.
+        """
         self.subtasks.append(new_subtask)
+        if len(self.subtask_totals) < len(self.subtasks):
+            self.subtask_totals.append(0)
+        self._subtask_indexes = None
+        self.dirty = True
 
         # Add subtask slot to latest week only.
         if self.weeks:
             self.weeks[-1].add_subtask()
+        self.record_change(history.AddSubtask(self, new_subtask))
 
-    def add_week(self, week_index, details=None):
+    def remove_last_subtask(self):
+        """
+        Removes the most recently added subtask, e.g. when adding it is undone. Opposite of add_subtask.
+        :return:
+        """
+        self.subtasks.pop()
+        self._subtask_indexes = None
+        self.dirty = True
+
+        if self.weeks:
+            self.weeks[-1].remove_subtask()
+
+    def add_week(self, week_index, details=None, days=None):
         """
         Adds a new week to this task.
         Do not add a new week to archived tasks.
         Creates a WeekSlot object for the new week and populates it with specified or default values.
         :param int week_index: Index of week to add
         :param list details: List of floats containing initial values to fill in the week with.
+        :param list days: Time tracked on individual days, already included in details. See weekslot.WeekSlot.
         :return:
         """
         if self.archived:  # Archived tasks do not get weeks added to them.
@@ -109,7 +224,100 @@ class Task(object):
         if details is None:
             # Add 0 at start for overall task.
             details = [0 for _ in self.subtasks]
-        self.weeks.append(weekslot.WeekSlot(week_index, details))
+        _week = weekslot.WeekSlot(week_index, details, self, days)
+        self.weeks.append(_week)
+        self.weeks_by_index[week_index] = _week
+
+        self.row_totals.append(0)
+        for column, value in enumerate(details):
+            self.cell_changed(_week, column, 0, value)
+
+    def get_or_insert_weekslot(self, week_index):
+        """
+        Gets a week of this task, inserting an empty week if the task doesn't have it, e.g. when importing time from
+        before the task was created or while it was archived. Weeks are stored by position, so any other weeks missing
+        between the new week and the task's existing weeks are inserted too. Not recorded in the history.
+        :param int week_index: Global week index.
+        :return weekslot.WeekSlot:
+        """
+        _week = self.weeks_by_index.get(week_index)
+        if _week is not None:
+            return _week
+
+        if self.weeks:
+            indexes = range(min(week_index, self.weeks[0].index), max(week_index, self.weeks[-1].index) + 1)
+        else:
+            indexes = [week_index]
+        new_weeks = []
+        for index in indexes:
+            if index not in self.weeks_by_index:
+                _week = weekslot.WeekSlot(index, [], self)
+                self.weeks_by_index[index] = _week
+                self.row_totals.append(0)
+                new_weeks.append(_week)
+        logging.debug("Inserting %d weeks into task %s" % (len(new_weeks), self))
+
+        self.weeks = sorted(self.weeks + new_weeks, key=lambda w: w.index)
+        self.first_week_id = self.weeks[0].index
+        self.dirty = True
+        return self.weeks_by_index[week_index]
+
+    def remove_last_week(self):
+        """
+        Removes the most recent week from this task, e.g. when adding it is undone. Opposite of add_week.
+        :return:
+        """
+        _week = self.weeks[-1]
+        for column in range(_week.width):
+            _week.set_time_in_entry(column, 0)
+
+        self.weeks.pop()
+        del self.weeks_by_index[_week.index]
+        self.row_totals.pop()
+        self.time_matrix.remove_last_row()
+        self.dirty_weeks.discard(_week)
+        self.dirty = True
+
+    def cell_changed(self, _week, column, old_value, new_value):
+        """
+        Called when a value in one of this task's weeks is written. Keeps the running totals up to date.
+        :param weekslot.WeekSlot _week: Week that has changed.
+        :param int column: Index of the subtask that has changed.
+        :param float old_value: Value before the change.
+        :param float new_value: Value after the change.
+        """
+        delta = new_value - old_value
+        self.total_time_spent += delta
+        old_week_total = self.row_totals[_week.row]
+        self.row_totals[_week.row] += delta
+        if self.tracker is not None:
+            self.tracker.week_total_changed(_week.index, old_week_total, self.row_totals[_week.row])
+        if column >= len(self.subtask_totals):
+            self.subtask_totals.extend([0] * (column + 1 - len(self.subtask_totals)))
+        self.subtask_totals[column] += delta
+
+    def recalculate_totals(self):
+        """
+        Recalculate the running totals from scratch, e.g. to remove any accumulated floating point error.
+        """
+        old_row_totals = self.row_totals
+        self.total_time_spent = self.time_matrix.total()
+        self.subtask_totals = self.time_matrix.column_sums(max(len(self.subtasks), self.time_matrix.columns))
+        self.row_totals = self.time_matrix.row_sums()
+
+        if self.tracker is not None:
+            for _week in self.weeks:
+                self.tracker.week_total_changed(_week.index, old_row_totals[_week.row], self.row_totals[_week.row])
+
+    def get_subtask_index(self, _subtask):
+        """
+        Gets the position of a subtask in this task, which is also its column in the time matrix.
+        :param subtask.Subtask _subtask: Subtask
+        :return int: Index of the subtask.
+        """
+        if self._subtask_indexes is None:
+            self._subtask_indexes = dict((sub, index) for index, sub in enumerate(self.subtasks))
+        return self._subtask_indexes[_subtask]
 
     def get_weekslot(self, week_index):
         """
@@ -119,32 +327,42 @@ class Task(object):
         :return week.Week: Internal week.
         :return None: If that week doesn't exist internally.
         """
-        for _week in self.weeks:
-            if _week.index == week_index:
-                return _week
-
-        logging.debug("Task has no data for requested week with index: %s" % week_index)
-        return None
+        _week = self.weeks_by_index.get(week_index)
+        if _week is None:
+            logging.debug("Task has no data for requested week with index: %s" % week_index)
+        return _week
 
     def get_total_time_spent(self):
         """
         Gets the total time tracked against this task across all weeks and subtasks.
         :return float: Total time tracked
         """
-        count = 0
-        for _week in self.weeks:
-            count += _week.get_total_time_spent()
-        return count
+        return self.total_time_spent
 
     def get_total_subtask_times(self):
         """
         Gets the time tracked against each subtask across all weeks.
         :return list: List of floats for time tracked against each subtask, in name order
         """
-        counter = [self.get_time_for_subtask(_subtask) for
-                   _subtask in self.subtasks]
+        return self.subtask_totals[:len(self.subtasks)]
 
-        return counter
+    def get_remaining_time(self):
+        """
+        Gets the time remaining against the estimate for this task. Negative if the estimate has been exceeded.
+        :return float: Estimate minus time tracked.
+        """
+        return self.estimate - self.get_total_time_spent()
+
+    def get_remaining_subtask_times(self):
+        """
+        Gets the time remaining against the estimate of each subtask.
+        :return list: List of floats for each subtask's estimate minus time tracked, in name order
+        """
+        if timematrix.use_numpy():
+            estimates = timematrix.numpy.array([sub.estimate for sub in self.subtasks], dtype=float)
+            return (estimates - self.get_total_subtask_times()).tolist()
+
+        return [sub.estimate - spent for sub, spent in zip(self.subtasks, self.get_total_subtask_times())]
 
     def get_time_for_subtask(self, _subtask):
         """
@@ -152,14 +370,7 @@ class Task(object):
         :param subtask.Subtask _subtask: Subtask
         :return float: Time tracked against specific subtask
         """
-        logging.debug("Getting time for subtask %s" % _subtask.name)
-        counter = 0
-
-        subtask_index = self.subtasks.index(_subtask)
-        for _week in self.weeks:
-            counter += _week.get_time_in_entry(subtask_index)
-
-        return counter
+        return self.subtask_totals[self.get_subtask_index(_subtask)]
 
     def get_time_for_subtask_in_week(self, _subtask, week_index):
         """
@@ -168,10 +379,9 @@ class Task(object):
         :param int week_index: Week to query
         :return float: Time tracked
         """
-        subtask_index = self.subtasks.index(_subtask)
-        _week = self.get_weekslot(week_index)
+        _week = self.weeks_by_index.get(week_index)
         if _week is not None:
-            return self.get_weekslot(week_index).get_time_in_entry(subtask_index)
+            return _week.get_time_in_entry(self.get_subtask_index(_subtask))
         else:
             return 0
 
@@ -181,23 +391,42 @@ class Task(object):
         :param int week_index: Week index
         :return float: Time tracked this week for this task.
         """
-        logging.debug("Getting time for week %d" % week_index)
-        if week_index >= self.first_week_id:
-            _week = self.get_weekslot(week_index)
-            if _week is not None:
-                return self.get_weekslot(week_index).get_total_time_spent()
+        _week = self.weeks_by_index.get(week_index)
+        if _week is not None:
+            return self.row_totals[_week.row]
         return 0
 
+    def get_week_totals(self):
+        """
+        Gets the total time tracked in each week of this task.
+        :return dict: {week_index: time tracked}
+        """
+        return dict((_week.index, self.row_totals[_week.row]) for _week in self.weeks)
+
+    def get_week_summary_values(self, week_index):
+        """
+        Gets everything needed to summarise this task in a given week, from a single lookup of the week.
+        :param int week_index: Week to summarise
+        :return tuple: (time tracked in the week, [time tracked against each subtask, in subtask order])
+        """
+        _week = self.weeks_by_index.get(week_index)
+        if _week is None:
+            return 0, [0] * len(self.subtasks)
+        values = _week.time_tracked
+        values.extend([0] * (len(self.subtasks) - len(values)))
+        return self.row_totals[_week.row], values
+
     def week_summary(self, week_index):
         """
         Generate formatted text containing details of time tracked on this task in a given week.
         :param int week_index: Week to summarise
         :return string: Summary of week for this task.
         """
-        summary = "%s: %s\n" % (self.task_name, self.get_time_for_week(week_index))
-        for _subtask in self.subtasks:
-            summary += "\t%s: %s\n" % (_subtask.name, self.get_time_for_subtask_in_week(_subtask, week_index))
-        return summary
+        week_total, subtask_times = self.get_week_summary_values(week_index)
+        lines = ["%s: %s\n" % (self.task_name, week_total)]
+        lines.extend("\t%s: %s\n" % (_subtask.name, time_spent)
+                     for _subtask, time_spent in zip(self.subtasks, subtask_times))
+        return ''.join(lines)
 
     def __repr__(self):
         return str(self)
@@ -0,0 +1,121 @@
+import logging
+
+
+class TaskProxy(object):
+    """
+    Stands in for an archived task that hasn't been created from the datastore yet.
+    Holds only the task's name and its total per week, which is all that is needed to load the tracker, save it, and
+    work out which tasks to include in a summary. Anything else (e.g. un-archiving the task, or summarising it) creates
+    the real task.Task, which then replaces this proxy in the tracker. Once created, everything is passed through to the
+    real task, so references to the proxy carry on working.
+    """
+    def __init__(self, task_name, _datastore, tracker=None):
+        """
+        :param str task_name: Name of the archived task.
+        :param datastore.DataStore _datastore: Datastore to create the task from.
+        :param tracker.Tracker tracker: Tracker that the task belongs to.
+        :return:
+        """
+        # Set directly in __dict__, since __setattr__ passes most attributes through to the real task.
+        self.__dict__.update(task_name=task_name,
+                             datastore=_datastore,
+                             tracker=tracker,
+                             archive_after_update=False,
+                             week_totals=_datastore.get_task_week_totals(task_name),  # {week_index: time tracked}
+                             task=None)
+
+    def materialize(self):
+        """
+        Create the real task from the datastore, if it hasn't been already, and swap it in to the tracker.
+        :return task.Task: The real task.
+        """
+        if self.task is None:
+            logging.debug("Creating archived task on first use: %s" % self.task_name)
+            _task = self.datastore.create_task(self.task_name)
+            _task.archive_after_update = self.archive_after_update
+            # Set the tracker afterwards, so that the weeks being created aren't added to the tracker's totals again.
+            _task.tracker = self.tracker
+            if self.tracker is not None and self.tracker.tasks.get(self.task_name) is self:
+                self.tracker.tasks[self.task_name] = _task
+
+            # Only the real task is needed from now on.
+            self.__dict__.clear()
+            self.__dict__['task'] = _task
+        return self.task
+
+    def __getattr__(self, name):
+        # Only called for attributes the proxy doesn't have itself.
+        return getattr(self.materialize(), name)
+
+    def __setattr__(self, name, value):
+        if self.task is None and name in ('tracker', 'archive_after_update'):
+            self.__dict__[name] = value
+        else:
+            setattr(self.materialize(), name, value)
+
+    @property
+    def archived(self):
+        if self.task is None:
+            return True
+        return self.task.archived
+
+    @property
+    def is_dirty(self):
+        """
+        Whether anything about this task has changed since it was last saved. Always False until the task is created.
+        :return bool:
+        """
+        if self.task is None:
+            return False
+        return self.task.is_dirty
+
+    def add_week(self, week_index):
+        """
+        Archived tasks do not get weeks added to them, so there is no need to create the task.
+        :param int week_index: Index of week to add
+        """
+        if self.task is not None:
+            self.task.add_week(week_index)
+
+    def get_week_totals(self):
+        """
+        Gets the total time tracked in each week of this task.
+        :return dict: {week_index: time tracked}
+        """
+        if self.task is None:
+            return dict(self.week_totals)
+        return self.task.get_week_totals()
+
+    def get_time_for_week(self, week_index):
+        """
+        Gets the total time tracked for a specified week.
+        :param int week_index: Week index
+        :return float: Time tracked this week for this task.
+        """
+        if self.task is None:
+            return self.week_totals.get(week_index, 0)
+        return self.task.get_time_for_week(week_index)
+
+    def reload_week_totals(self):
+        """
+        Re-read the task's weekly totals from the datastore, e.g. once changes made elsewhere have been merged into it,
+        and pass any differences on to the tracker. Does nothing once the task has been created.
+        """
+        if self.task is not None:
+            return
+        week_totals = self.datastore.get_task_week_totals(self.task_name)
+        if self.tracker is not None:
+            for week_index in set(week_totals) | set(self.week_totals):
+                old_total = self.week_totals.get(week_index, 0)
+                new_total = week_totals.get(week_index, 0)
+                if old_total != new_total:
+                    self.tracker.week_total_changed(week_index, old_total, new_total)
+        self.__dict__['week_totals'] = week_totals
+
+    def __repr__(self):
+        return str(self)
+
+    def __str__(self):
+        if self.task is None:
+            return self.task_name
+        return str(self.task)
@@ -0,0 +1,54 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import aggregate
+import datastore
+import tracker
+
+
+class AggregateTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        for person, hours in (('a', 1.5), ('b', 2)):
+            _tracker = tracker.Tracker(datastore.DataStore(os.path.join(self.folder, '%s.trk' % person)))
+            _tracker.add_week()
+            _tracker.create_new_task('Release')
+            _tracker.tasks['Release'].add_subtask('Build')
+            _tracker.tasks['Release'].weeks[0].set_time_in_entry(0, hours)
+            _tracker.update()
+            _tracker.save()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write_malformed_file(self):
+        filename = os.path.join(self.folder, 'c.trk')
+        with open(os.path.join(self.folder, 'a.trk')) as read_file:
+            raw_data = json.load(read_file)
+        raw_data['tasks']['Release']['weeks'] = 7
+        with open(filename, 'w') as write_file:
+            json.dump(raw_data, write_file)
+        return filename
+
+    def test_files_are_added_together(self):
+        _aggregate = aggregate.aggregate(aggregate.find_tracker_files(self.folder), processes=2)
+        self.assertEqual(_aggregate.get_week_totals('Release'), {0: 3.5})
+        self.assertEqual(_aggregate.errors, {})
+
+    def test_malformed_task_skips_only_its_file(self):
+        filename = self.write_malformed_file()
+        logging.disable(logging.ERROR)
+        try:
+            _aggregate = aggregate.aggregate(aggregate.find_tracker_files(self.folder), processes=2)
+        finally:
+            logging.disable(logging.NOTSET)
+        self.assertEqual(_aggregate.get_week_totals('Release'), {0: 3.5})
+        self.assertEqual(list(_aggregate.errors), [filename])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import datastore
+import tracker
+from tests.test_live_timer import FakeRoot
+
+
+class BackgroundLoaderTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 't.trk')
+        _tracker = tracker.Tracker(datastore.DataStore(self.filename))
+        _tracker.add_week()
+        for task_name in ('A', 'B'):
+            _tracker.create_new_task(task_name)
+            _tracker.tasks[task_name].add_subtask('Build')
+        _tracker.tasks['B'].weeks[0].set_time_in_entry(0, 3)
+        _tracker.update()
+        _tracker.save()
+
+        self.tracker = tracker.Tracker(datastore.DataStore(self.filename))
+        self.tracker.load_in_background(FakeRoot())
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_creating_a_stored_task_while_loading_keeps_its_time(self):
+        self.tracker.create_new_task('B')
+        self.assertIsNone(self.tracker.loader)
+        self.tracker.save()
+
+        reloaded = tracker.Tracker(datastore.DataStore(self.filename))
+        self.assertEqual(reloaded.task_order, ['A', 'B'])
+        self.assertEqual(reloaded.tasks['B'].weeks[0].time_tracked, [3])
+
+    def test_creating_a_new_task_while_loading(self):
+        self.tracker.create_new_task('C')
+        self.tracker.save()
+
+        reloaded = tracker.Tracker(datastore.DataStore(self.filename))
+        self.assertEqual(reloaded.task_order, ['A', 'B', 'C'])
+
+
+if __name__ == '__main__':
+    unittest.main()
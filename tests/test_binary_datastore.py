@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import binary_datastore
+import tracker
+
+
+class BinaryDataStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 't.trkb')
+        self.datastore = binary_datastore.BinaryDataStore(self.filename)
+        _tracker = tracker.Tracker(self.datastore)
+        _tracker.add_week()
+        for task_name in ('A', 'B'):
+            _tracker.create_new_task(task_name)
+            _tracker.tasks[task_name].add_subtask('Design')
+            _tracker.tasks[task_name].weeks[0].set_time_in_entry(0, 1.5)
+        _tracker.add_week()
+        _task = _tracker.tasks['B']
+        _task.add_subtask('Build')
+        _task.set_subtask_estimate(_task.subtasks[1], 4)
+        _task.weeks[1].widen(2)
+        _task.weeks[1].set_time_in_entry(1, 0.1)  # Not exact in float32.
+        _task.weeks[1].set_time_for_day(1, 3, 0.1)  # Adds to the week's value.
+        _tracker.update()
+        _tracker.save()
+        self.tracker = self.reload()
+
+    def tearDown(self):
+        self.datastore.close()
+        shutil.rmtree(self.folder)
+
+    def reload(self):
+        self.datastore.close()
+        self.datastore = binary_datastore.BinaryDataStore(self.filename)
+        return tracker.Tracker(self.datastore)
+
+    def get_task_data(self, task_name):
+        return self.datastore.get_task_data(self.datastore.task_entries[task_name])
+
+    def test_round_trip(self):
+        _task = self.tracker.tasks['B']
+        self.assertEqual(self.datastore.get_week_widths('B'), (1, 2))
+        self.assertEqual(self.datastore.task_entries['A']['value_type'], 'f')
+        self.assertEqual(self.datastore.task_entries['B']['value_type'], 'd')
+        self.assertEqual([_week.time_tracked for _week in _task.weeks], [[1.5], [0, 0.2]])
+        self.assertEqual(_task.weeks[1].get_time_for_day(1, 3), 0.1)
+        self.assertEqual(_task.subtasks[1].estimate, 4)
+        self.assertEqual(self.tracker.week_totals, [3, 0.2])
+
+    def test_unchanged_tasks_are_copied(self):
+        unchanged_data = self.get_task_data('B')
+        _task = self.tracker.tasks['A']
+        for name in ('Build', 'Test'):
+            _task.add_subtask(name)
+        _task.weeks[1].widen(3)
+        _task.weeks[1].set_time_in_entry(2, 2)
+        self.tracker.update()
+        self.tracker.save()
+        self.assertEqual(self.get_task_data('B'), unchanged_data)
+
+        reloaded = self.reload()
+        self.assertEqual(self.datastore.get_week_widths('A'), (1, 3))
+        self.assertEqual([_week.time_tracked for _week in reloaded.tasks['A'].weeks], [[1.5], [0, 0, 2]])
+        self.assertEqual([_week.time_tracked for _week in reloaded.tasks['B'].weeks], [[1.5], [0, 0.2]])
+        self.assertEqual(reloaded.week_totals, [3, 2.2])
+
+
+if __name__ == '__main__':
+    unittest.main()
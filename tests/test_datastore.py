@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import datastore
+import tracker
+
+
+class OpenAtomicallyTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 'file')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def read(self):
+        with open(self.filename) as read_file:
+            return read_file.read()
+
+    def test_replaces_contents(self):
+        datastore.write_file_atomically(self.filename, 'old')
+        datastore.write_file_atomically(self.filename, 'new')
+        self.assertEqual(self.read(), 'new')
+        self.assertEqual(os.listdir(self.folder), ['file'])
+
+    def test_failure_leaves_old_contents_and_no_temporary_file(self):
+        datastore.write_file_atomically(self.filename, 'old')
+        with self.assertRaises(ValueError):
+            with datastore.open_atomically(self.filename) as temp_file:
+                temp_file.write('partial')
+                raise ValueError()
+        self.assertEqual(self.read(), 'old')
+        self.assertEqual(os.listdir(self.folder), ['file'])
+
+
+class DataStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 't.trk')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_round_trip(self):
+        _tracker = tracker.Tracker(datastore.DataStore(self.filename))
+        _tracker.add_week()
+        _tracker.create_new_task('A')
+        _task = _tracker.tasks['A']
+        for name in ('Design', 'Build', 'Test'):
+            _task.add_subtask(name)
+        _task.set_subtask_estimate(_task.subtasks[1], 4.0)
+        _task.weeks[0].set_time_in_entry(0, 1.5)
+        _task.weeks[0].set_time_for_day(2, 3, 0.75)
+        _tracker.update()
+        _tracker.save()
+
+        reloaded = tracker.Tracker(datastore.DataStore(self.filename))
+        _task = reloaded.tasks['A']
+        self.assertEqual([_subtask.name for _subtask in _task.subtasks], ['Design', 'Build', 'Test'])
+        self.assertEqual(_task.subtasks[1].estimate, 4.0)
+        self.assertEqual(_task.weeks[0].time_tracked, [1.5, 0, 0.75])
+        self.assertEqual(_task.weeks[0].get_time_for_day(2, 3), 0.75)
+        self.assertEqual(reloaded.get_week_total(0), 2.25)
+
+
+class DirtyWeeksTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 't.trk')
+        _tracker = tracker.Tracker(datastore.DataStore(self.filename))
+        _tracker.add_week()
+        for task_name in ('A', 'B'):
+            _tracker.create_new_task(task_name)
+            _tracker.tasks[task_name].add_subtask('Build')
+        _tracker.add_week()
+        _tracker.add_week()
+        _tracker.update()
+        _tracker.save()
+
+        self.datastore = datastore.DataStore(self.filename)
+        self.tracker = tracker.Tracker(self.datastore)
+        self.task = self.tracker.tasks['A']
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_loaded_tasks_are_clean(self):
+        self.assertFalse(self.task.is_dirty)
+        self.assertEqual(self.datastore.update_raw_data(self.tracker), (0, 0))
+
+    def test_only_changed_weeks_are_saved(self):
+        raw_weeks = self.datastore.get_raw_task('A')['weeks']
+        self.task.weeks[1].set_time_in_entry(0, 2)
+        self.task.weeks[1].set_time_for_day(0, 4, 0.5)
+        self.tracker.update()
+        self.assertFalse(self.task.dirty)
+        self.assertEqual(self.task.dirty_weeks, set([self.task.weeks[1]]))
+
+        self.assertEqual(self.datastore.update_raw_data(self.tracker), (1, 1))
+        saved_weeks = self.datastore.get_raw_task('A')['weeks']
+        self.assertIs(saved_weeks[0], raw_weeks[0])
+        self.assertIs(saved_weeks[2], raw_weeks[2])
+        self.assertEqual(saved_weeks[1], [2.5])
+        # The raw data loaded is unchanged, so snapshots of it are too.
+        self.assertEqual(raw_weeks[1], [0])
+
+        self.tracker.save()
+        self.assertFalse(self.task.is_dirty)
+        self.assertEqual(self.task.dirty_weeks, set())
+        reloaded = tracker.Tracker(datastore.DataStore(self.filename))
+        self.assertEqual([_week.time_tracked for _week in reloaded.tasks['A'].weeks], [[0], [2.5], [0]])
+        self.assertEqual(reloaded.tasks['A'].weeks[1].get_time_for_day(0, 4), 0.5)
+
+    def test_new_subtask_saves_the_whole_task(self):
+        self.task.add_subtask('Test')
+        self.tracker.update()
+        self.assertTrue(self.task.dirty)
+        self.assertEqual(self.datastore.update_raw_data(self.tracker), (1, 3))
+
+    def test_undo_after_save_marks_the_week_again(self):
+        self.task.weeks[2].set_time_in_entry(0, 1)
+        self.tracker.update()
+        self.tracker.save()
+        self.tracker.undo()
+        self.assertEqual(self.task.dirty_weeks, set([self.task.weeks[2]]))
+        self.tracker.save()
+        reloaded = tracker.Tracker(datastore.DataStore(self.filename))
+        self.assertEqual(reloaded.tasks['A'].weeks[2].time_tracked, [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+import datastore
+import export
+import importer
+import tracker
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.tracker = tracker.Tracker(datastore.DataStore(os.path.join(self.folder, 't.trk')))
+        self.tracker.add_week()
+        for task_name in (u'Caf\xe9', 'Old'):
+            self.tracker.create_new_task(task_name)
+            _task = self.tracker.tasks[task_name]
+            _task.add_subtask('Design')
+            _task.add_subtask('Build')
+            _task.set_subtask_estimate(_task.subtasks[1], 8)
+            _task.weeks[0].set_time_in_entry(1, 1.5)
+        self.tracker.add_week()
+        self.tracker.tasks[u'Caf\xe9'].weeks[1].set_time_in_entry(0, 0.25)
+        self.tracker.tasks['Old'].archived = True
+        self.tracker.update()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_rows(self):
+        week_names = [self.tracker.get_week_name(week_index) for week_index in range(2)]
+        self.assertEqual(list(export.iter_rows(self.tracker)),
+                         [(u'Caf\xe9', 'Build', 0, week_names[0], 1.5, 8),
+                          (u'Caf\xe9', 'Design', 1, week_names[1], 0.25, 0),
+                          ('Old', 'Build', 0, week_names[0], 1.5, 8)])
+        self.assertEqual(len(list(export.iter_rows(self.tracker, archived='exclude'))), 2)
+        self.assertEqual(len(list(export.iter_rows(self.tracker, archived='only'))), 1)
+        self.assertEqual(len(list(export.iter_rows(self.tracker, first_week=1))), 1)
+        self.assertEqual(len(list(export.iter_rows(self.tracker, task_names=['Old']))), 1)
+
+    def test_csv_round_trip(self):
+        filename = os.path.join(self.folder, 'export.csv')
+        self.assertEqual(export.export(self.tracker, filename), 3)
+        with open(filename, 'rb') as csv_file:
+            rows = list(csv.reader(csv_file))
+        self.assertEqual(tuple(rows[0]), export.COLUMNS)
+        self.assertEqual(rows[1][0].decode('utf-8'), u'Caf\xe9')
+
+        imported = tracker.Tracker(datastore.DataStore(os.path.join(self.folder, 'imported.trk')))
+        imported.add_week()
+        report = importer.import_csv(imported, filename)
+        self.assertEqual(report['rows'], 3)
+        self.assertEqual(imported.week_totals, self.tracker.week_totals)
+        _task = imported.tasks[u'Caf\xe9']
+        self.assertEqual([_subtask.name for _subtask in _task.subtasks], ['Build', 'Design'])
+        self.assertEqual(_task.subtasks[0].estimate, 8)
+
+    def test_columnar_round_trip(self):
+        filename = os.path.join(self.folder, 'export.trkc')
+        self.assertEqual(export.export(self.tracker, filename), 3)
+        with open(filename, 'rb') as columnar_file:
+            rows = list(export.read_columnar(columnar_file))
+        self.assertEqual(rows, list(export.iter_rows(self.tracker)))
+
+    def test_columnar_row_groups(self):
+        rows = [('Task %d' % (index % 3), 'Build', index, 'Week %d' % index, index * 0.5, 1) for index in range(25)]
+        filename = os.path.join(self.folder, 'export.trkc')
+        original_size = export.ROW_GROUP_SIZE
+        export.ROW_GROUP_SIZE = 10
+        try:
+            with open(filename, 'wb') as columnar_file:
+                self.assertEqual(export.write_columnar(rows, columnar_file), 25)
+        finally:
+            export.ROW_GROUP_SIZE = original_size
+        with open(filename, 'rb') as columnar_file:
+            self.assertEqual(list(export.read_columnar(columnar_file)), rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
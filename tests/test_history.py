@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import datastore
+import history
+import tracker
+
+
+class HistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.tracker = tracker.Tracker(datastore.DataStore(os.path.join(self.folder, 't.trk')))
+        self.tracker.add_week()
+        self.tracker.create_new_task('A')
+        self.task = self.tracker.tasks['A']
+        self.task.add_subtask('Build')
+        self.tracker.update()
+        self.tracker.history.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def get_names(self):
+        return [_subtask.name for _subtask in self.task.subtasks]
+
+    def test_set_cell(self):
+        self.task.weeks[0].set_time_in_entry(0, 2)
+        self.tracker.update()
+        self.task.weeks[0].set_time_in_entry(0, 3)
+        self.tracker.update()
+
+        self.assertTrue(self.tracker.undo())
+        self.assertEqual(self.task.weeks[0].time_tracked, [2])
+        self.assertTrue(self.tracker.undo())
+        self.assertEqual(self.task.weeks[0].time_tracked, [0])
+        self.assertEqual(self.tracker.get_week_total(0), 0)
+        self.assertFalse(self.tracker.undo())
+
+        self.assertTrue(self.tracker.redo())
+        self.assertTrue(self.tracker.redo())
+        self.assertEqual(self.task.weeks[0].time_tracked, [3])
+        self.assertEqual(self.tracker.get_week_total(0), 3)
+        self.assertFalse(self.tracker.redo())
+
+    def test_new_change_drops_redo(self):
+        self.task.weeks[0].set_time_in_entry(0, 2)
+        self.tracker.update()
+        self.tracker.undo()
+        self.task.weeks[0].set_time_in_entry(0, 1)
+        self.tracker.update()
+        self.assertFalse(self.tracker.redo())
+
+    def test_add_subtask(self):
+        self.task.add_subtask('Test')
+        self.tracker.update()
+        self.tracker.undo()
+        self.assertEqual(self.get_names(), ['Build'])
+        self.tracker.redo()
+        self.assertEqual(self.get_names(), ['Build', 'Test'])
+
+    def test_add_week(self):
+        self.tracker.add_week()
+        self.tracker.update()
+        self.assertEqual(len(self.task.weeks), 2)
+
+        self.tracker.undo()
+        self.assertEqual(self.tracker.week_index, 1)
+        self.assertEqual(len(self.task.weeks), 1)
+        self.assertEqual(self.task.time_matrix.rows, 1)
+
+        self.tracker.redo()
+        self.assertEqual(self.tracker.week_index, 2)
+        self.task.weeks[1].set_time_in_entry(0, 1.5)
+        self.tracker.update()
+        self.assertEqual(self.tracker.get_week_total(1), 1.5)
+
+    def test_rename_task(self):
+        self.tracker.rename_task(self.task, 'B')
+        self.tracker.update()
+        self.tracker.undo()
+        self.assertEqual(self.tracker.task_order, ['A'])
+        self.assertIs(self.tracker.tasks['A'], self.task)
+        self.tracker.redo()
+        self.assertEqual(self.tracker.task_order, ['B'])
+        self.assertIs(self.tracker.tasks['B'], self.task)
+
+    def test_oldest_steps_are_forgotten_at_max_bytes(self):
+        self.tracker.history.max_bytes = 3 * history.SetCell.SIZE
+        for hours in range(1, 6):
+            self.task.weeks[0].set_time_in_entry(0, hours)
+            self.tracker.update()
+        self.assertLessEqual(self.tracker.history.size, self.tracker.history.max_bytes)
+
+        undone = 0
+        while self.tracker.undo():
+            undone += 1
+        self.assertEqual(undone, 3)
+        self.assertEqual(self.task.weeks[0].time_tracked, [2])
+
+    def test_changes_without_undo_are_noted(self):
+        sequence = self.tracker.history.sequence
+        with self.tracker.history.without_undo():
+            self.task.weeks[0].set_time_in_entry(0, 1)
+        self.tracker.update()
+        self.assertEqual(self.tracker.history.get_tasks_changed_since(sequence), [self.task])
+        self.assertFalse(self.tracker.undo())
+
+    def test_undo_keeps_changes_made_without_undo(self):
+        self.task.weeks[0].set_time_in_entry(0, 2)
+        self.tracker.update()
+        with self.tracker.history.without_undo():
+            self.task.weeks[0].set_time_in_entry(0, 2.5)
+        self.tracker.undo()
+        self.assertEqual(self.task.weeks[0].time_tracked, [0.5])
+
+    def test_changes_while_suspended_are_not_noted(self):
+        sequence = self.tracker.history.sequence
+        with self.tracker.history.suspended():
+            self.task.weeks[0].set_time_in_entry(0, 1)
+        self.tracker.update()
+        self.assertEqual(self.tracker.history.get_tasks_changed_since(sequence), [])
+        self.assertFalse(self.tracker.undo())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import datastore
+import importer
+import tracker
+
+
+class ImporterTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 't.trk')
+        _tracker = tracker.Tracker(datastore.DataStore(self.filename))
+        for _ in range(3):
+            _tracker.add_week()
+        for task_name in ('A', 'B'):
+            _tracker.create_new_task(task_name)
+            _tracker.tasks[task_name].add_subtask('Build')
+            _tracker.tasks[task_name].weeks[0].set_time_in_entry(0, 1)
+        _tracker.update()
+        _tracker.save()
+
+        self.tracker = tracker.Tracker(datastore.DataStore(self.filename))
+        self.a = self.tracker.tasks['A']
+        self.b = self.tracker.tasks['B']
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def run_import(self):
+        _importer = importer.Importer(self.tracker)
+        _importer.add_row('A', 'Build', 0, 2)  # From before the task was created.
+        _importer.add_row('A', 'Build', 2, 1)
+        _importer.add_row('A', 'Test', 4, 3, estimate=5)  # A new subtask, in a new week.
+        _importer.add_row('B', 'Build', 2, 0.5)
+        _importer.add_row('C', 'Build', 3, 4)  # A new task.
+        return _importer.finish()
+
+    def get_week_values(self, _task):
+        return dict((_week.index, _week.time_tracked) for _week in _task.weeks)
+
+    def test_totals(self):
+        report = self.run_import()
+        self.assertEqual(report['rows'], 5)
+        self.assertEqual(report['weeks_created'], 2)
+        self.assertEqual(report['tasks_created'], 1)
+        self.assertEqual(report['subtasks_created'], 2)
+
+        self.assertEqual(self.tracker.week_totals, [2, 0, 3.5, 4, 3])
+        self.assertEqual([self.a.row_totals[_week.row] for _week in self.a.weeks], [2, 0, 2, 0, 3])
+        self.assertEqual(self.a.get_week_totals(), {0: 2, 1: 0, 2: 2, 3: 0, 4: 3})
+        self.assertEqual(self.a.get_total_time_spent(), 7)
+        self.assertEqual(self.a.subtasks[1].estimate, 5)
+
+    def test_only_changed_weeks_are_saved(self):
+        self.run_import()
+        self.assertFalse(self.b.dirty)
+        # The week imported into, and the weeks added.
+        self.assertEqual(sorted(_week.index for _week in self.b.dirty_weeks), [2, 3, 4])
+        self.tracker.save()
+        self.assertFalse(self.b.is_dirty)
+
+        reloaded = tracker.Tracker(datastore.DataStore(self.filename))
+        self.assertEqual(self.get_week_values(reloaded.tasks['A']), self.get_week_values(self.a))
+        self.assertEqual(reloaded.tasks['B'].get_week_totals(), {2: 1.5, 3: 0, 4: 0})
+        self.assertEqual(reloaded.week_totals, [2, 0, 3.5, 4, 3])
+
+    def test_import_is_not_undone(self):
+        self.run_import()
+        self.assertFalse(self.tracker.undo())
+
+    def test_add_week_and_undo_afterwards(self):
+        self.run_import()
+        week_values = self.get_week_values(self.a)
+        self.tracker.add_week()
+        self.tracker.update()
+        self.a.weeks[-1].set_time_in_entry(1, 1)
+        self.tracker.update()
+        self.assertEqual(self.tracker.get_week_total(5), 1)
+
+        self.assertTrue(self.tracker.undo())
+        self.assertTrue(self.tracker.undo())
+        self.assertEqual(self.tracker.week_index, 5)
+        self.assertEqual(self.get_week_values(self.a), week_values)
+        self.assertEqual(self.a.get_week_totals(), {0: 2, 1: 0, 2: 2, 3: 0, 4: 3})
+        self.assertEqual(self.tracker.week_totals, [2, 0, 3.5, 4, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import journal_datastore
+import tracker
+
+
+class JournalDataStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 't.trk')
+        self.tracker = self.open_tracker()
+        self.tracker.add_week()
+        for task_name in ('A', 'B'):
+            self.tracker.create_new_task(task_name)
+            self.tracker.tasks[task_name].add_subtask('Build')
+        self.tracker.update()
+        self.tracker.save()
+
+    def tearDown(self):
+        self.tracker.datastore.wait_for_compaction()
+        shutil.rmtree(self.folder)
+
+    def open_tracker(self):
+        return tracker.Tracker(journal_datastore.JournalDataStore(self.filename))
+
+    def set_time(self, task_name, hours):
+        self.tracker.tasks[task_name].weeks[0].set_time_in_entry(0, hours)
+        self.tracker.update()
+        self.tracker.save()
+
+    def rename(self, task_name, new_name):
+        self.tracker.rename_task(self.tracker.tasks[task_name], new_name)
+        self.tracker.update()
+        self.tracker.save()
+
+    def assert_reloads(self, expected):
+        """
+        :param dict expected: {task name: time tracked in the first subtask}
+        """
+        reloaded = self.open_tracker()
+        self.assertEqual(sorted(reloaded.task_order), sorted(expected))
+        for task_name, hours in expected.iteritems():
+            self.assertEqual(reloaded.tasks[task_name].weeks[0].time_tracked, [hours])
+
+    def compact(self):
+        _datastore = self.tracker.datastore
+        _datastore.start_compaction()
+        _datastore.wait_for_compaction()
+
+    def test_changes_are_replayed(self):
+        self.set_time('A', 5.0)
+        self.rename('B', 'C')
+        self.set_time('C', 2.0)
+        self.assertTrue(os.path.exists(self.filename + '.journal'))
+        self.assert_reloads({'A': 5.0, 'C': 2.0})
+
+    def test_compaction(self):
+        self.set_time('A', 5.0)
+        self.compact()
+        self.assertFalse(os.path.exists(self.filename + '.journal.compacting'))
+        self.set_time('A', 6.0)
+        self.assert_reloads({'A': 6.0, 'B': 0})
+
+    def test_compaction_does_not_look_like_a_change_elsewhere(self):
+        _datastore = self.tracker.datastore
+        _datastore.COMPACTION_THRESHOLD = 1
+        self.set_time('A', 5.0)
+        _datastore.wait_for_compaction()
+        self.assertFalse(os.path.exists(self.filename + '.journal.compacting'))
+        self.assertEqual(_datastore.get_disk_state(), _datastore.disk_state)
+
+        def read_raw_data_from_disk():
+            self.fail("Files read again after compacting")
+        _datastore.read_raw_data_from_disk = read_raw_data_from_disk
+        _datastore.COMPACTION_THRESHOLD = journal_datastore.JournalDataStore.COMPACTION_THRESHOLD
+        self.set_time('A', 6.0)
+        self.assert_reloads({'A': 6.0, 'B': 0})
+
+    def test_interrupted_compaction(self):
+        # An edit followed by a rename: week A, task C, delete A.
+        self.set_time('A', 5.0)
+        self.rename('A', 'C')
+        with open(self.filename + '.journal') as journal_file:
+            journal = journal_file.read()
+        self.compact()
+        # As if the compaction had stopped after replacing the snapshot, but before removing the compacting journal.
+        with open(self.filename + '.journal.compacting', 'w') as journal_file:
+            journal_file.write(journal)
+        self.assert_reloads({'B': 0, 'C': 5.0})
+
+        # The next compaction finishes the job.
+        self.tracker = self.open_tracker()
+        self.compact()
+        self.assertFalse(os.path.exists(self.filename + '.journal.compacting'))
+        self.assert_reloads({'B': 0, 'C': 5.0})
+
+    def test_replaying_twice_is_harmless(self):
+        self.set_time('A', 5.0)
+        self.rename('A', 'C')
+        self.set_time('C', 7.0)
+        raw_data = journal_datastore.JournalDataStore(self.filename).raw_data
+        journal_datastore.replay_journal(raw_data, self.filename + '.journal')
+        self.assertEqual(sorted(raw_data['tasks']), ['B', 'C'])
+        self.assertEqual(raw_data['tasks']['C']['weeks'], [[7.0]])
+
+    def test_incomplete_last_record_is_ignored(self):
+        self.set_time('A', 5.0)
+        with open(self.filename + '.journal', 'a') as journal_file:
+            journal_file.write('{"op":"week","name":"A","off')
+        self.assert_reloads({'A': 5.0, 'B': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import datastore
+import live_timer
+import tracker
+
+
+class FakeRoot(object):
+    """
+    Stands in for the Tk root, running scheduled calls only when told to.
+    """
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay_ms, function, *args):
+        self.scheduled.append((function, args))
+        return len(self.scheduled)
+
+    def after_cancel(self, after_id):
+        self.scheduled = []
+
+    def run_next(self):
+        function, args = self.scheduled.pop(0)
+        function(*args)
+
+
+class TimerManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 't.trk')
+        self.tracker = tracker.Tracker(datastore.DataStore(self.filename))
+        self.tracker.add_week()
+        self.tracker.create_new_task('A')
+        self.task = self.tracker.tasks['A']
+        self.task.add_subtask('Build')
+        self.tracker.update()
+        self.tracker.save()
+        self.tracker.history.clear()
+
+        self.now = 1000.0
+        self.original_monotonic = live_timer.monotonic
+        live_timer.monotonic = lambda: self.now
+        self.root = FakeRoot()
+        self.timers = live_timer.TimerManager(self.tracker, self.root)
+        self.timer = self.timers.get_timer(self.task, self.task.subtasks[0])
+        self.day = self.timers.get_entry(self.timer)[2]
+
+    def tearDown(self):
+        live_timer.monotonic = self.original_monotonic
+        shutil.rmtree(self.folder)
+
+    def run_for(self, seconds, tick_seconds=1):
+        for _ in range(int(seconds / tick_seconds)):
+            self.now += tick_seconds
+            self.root.run_next()
+
+    def get_day_time(self, _tracker=None):
+        _task = (_tracker or self.tracker).tasks['A']
+        return _task.weeks[0].get_time_for_day(0, self.day)
+
+    def test_time_added_doesnt_drift(self):
+        self.timers.start(self.timer)
+        self.run_for(8 * 3600, tick_seconds=10)
+        self.timers.pause(self.timer)
+        self.assertAlmostEqual(self.get_day_time(), 8.0, places=4)
+        self.assertAlmostEqual(self.task.weeks[0].get_time_in_entry(0), 8.0, places=4)
+
+    def test_time_added_isnt_undoable(self):
+        self.task.weeks[0].set_time_in_entry(0, 2.0)
+        self.tracker.update()
+        self.timers.start(self.timer)
+        self.run_for(30 * 60, tick_seconds=5)
+        self.timers.pause(self.timer)
+        self.assertAlmostEqual(self.task.weeks[0].get_time_in_entry(0), 2.5, places=4)
+
+        # Undo takes back the user's own change, keeping the timer's time.
+        self.assertTrue(self.tracker.undo())
+        self.assertAlmostEqual(self.task.weeks[0].get_time_in_entry(0), 0.5, places=4)
+        self.assertTrue(self.tracker.redo())
+        self.assertAlmostEqual(self.task.weeks[0].get_time_in_entry(0), 2.5, places=4)
+        self.assertTrue(self.tracker.undo())
+        self.assertFalse(self.tracker.undo())
+
+    def test_checkpoint_recovers_time_after_crash(self):
+        self.timers.start(self.timer)
+        self.run_for(150)
+        self.assertTrue(os.path.exists(self.filename + live_timer.CHECKPOINT_SUFFIX))
+        # Nothing has been saved since the timer started.
+        self.assertEqual(self.get_day_time(tracker.Tracker(datastore.DataStore(self.filename))), 0)
+
+        # As if the app had crashed, then been opened again.
+        reopened = tracker.Tracker(datastore.DataStore(self.filename))
+        self.assertEqual(live_timer.TimerManager(reopened, FakeRoot()).recover_checkpoint(), 1)
+        self.assertAlmostEqual(self.get_day_time(reopened), 150 / 3600.0, places=3)
+        self.assertFalse(os.path.exists(self.filename + live_timer.CHECKPOINT_SUFFIX))
+        self.assertAlmostEqual(self.get_day_time(tracker.Tracker(datastore.DataStore(self.filename))),
+                               150 / 3600.0, places=3)
+
+    def test_checkpoint_removed_when_stopped(self):
+        self.timers.start(self.timer)
+        self.run_for(90)
+        self.timers.stop()
+        self.assertFalse(os.path.exists(self.filename + live_timer.CHECKPOINT_SUFFIX))
+        self.assertAlmostEqual(self.get_day_time(), 90 / 3600.0, places=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
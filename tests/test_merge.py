@@ -0,0 +1,176 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import datastore
+import journal_datastore
+import merge
+import tracker
+
+
+class MergeTimeTest(unittest.TestCase):
+    def test_one_side_changed(self):
+        self.assertEqual(merge.merge_time(1, 1, 3), 3)
+        self.assertEqual(merge.merge_time(4, 1, 1), 4)
+
+    def test_both_sides_changed(self):
+        self.assertEqual(merge.merge_time(3, 2, 5), 6)
+        self.assertEqual(merge.merge_time(0, 2, 1), 0)
+
+    def test_both_sides_made_the_same_change(self):
+        self.assertEqual(merge.merge_time(5, 0, 5), 5)
+
+
+class MergeTests(object):
+    """
+    Two trackers open on the same file, each saving its own changes. Run against each datastore by the subclasses.
+    """
+    datastore_class = None
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 't.trk')
+        _tracker = self.open()
+        _tracker.add_week()
+        for task_name in ('A', 'B', 'C'):
+            _tracker.create_new_task(task_name)
+            _tracker.tasks[task_name].add_subtask('Design')
+            _tracker.tasks[task_name].add_subtask('Build')
+        _tracker.tasks['A'].weeks[0].set_time_in_entry(0, 2)
+        _tracker.tasks['B'].weeks[0].set_time_in_entry(1, 3)
+        _tracker.update()
+        _tracker.save()
+        self.close(_tracker)
+
+        self.ours = self.open()
+        self.theirs = self.open()
+
+    def tearDown(self):
+        self.close(self.ours)
+        self.close(self.theirs)
+        shutil.rmtree(self.folder)
+
+    def open(self):
+        return tracker.Tracker(self.datastore_class(self.filename))
+
+    def close(self, _tracker):
+        if hasattr(_tracker.datastore, 'wait_for_compaction'):
+            _tracker.datastore.wait_for_compaction()
+
+    def reload(self):
+        self.close(self.theirs)
+        return self.open()
+
+    def set_time(self, _tracker, task_name, column, hours):
+        _week = _tracker.tasks[task_name].weeks[0]
+        _week.widen(column + 1)
+        _week.set_time_in_entry(column, hours)
+        _tracker.update()
+
+    def get_time(self, _tracker, task_name):
+        _task = _tracker.tasks[task_name]
+        return dict(zip([_subtask.name for _subtask in _task.subtasks], _task.weeks[0].time_tracked))
+
+    def test_changes_to_different_entries_are_kept(self):
+        self.set_time(self.ours, 'A', 1, 1)
+        self.set_time(self.theirs, 'B', 0, 4)
+        self.theirs.save()
+        self.ours.save()
+
+        merged = self.reload()
+        self.assertEqual(self.get_time(merged, 'A'), {'Design': 2, 'Build': 1})
+        self.assertEqual(self.get_time(merged, 'B'), {'Design': 4, 'Build': 3})
+        self.assertEqual(merged.get_week_total(0), 10)
+        self.assertEqual(self.ours.get_week_total(0), 10)
+
+    def test_time_added_to_the_same_entry_by_both_is_added_together(self):
+        self.set_time(self.ours, 'A', 0, 3)
+        self.set_time(self.theirs, 'A', 0, 5)
+        self.theirs.save()
+        self.ours.save()
+        self.assertEqual(self.get_time(self.reload(), 'A')['Design'], 6)
+
+        # Saving again, with nothing more changed elsewhere, doesn't merge their change again.
+        self.ours.save()
+        self.assertEqual(self.get_time(self.reload(), 'A')['Design'], 6)
+
+    def test_days_are_merged(self):
+        self.ours.tasks['A'].weeks[0].set_time_for_day(1, 0, 1)
+        self.ours.update()
+        self.theirs.tasks['A'].weeks[0].set_time_for_day(1, 2, 0.5)
+        self.theirs.update()
+        self.theirs.save()
+        self.ours.save()
+
+        _week = self.reload().tasks['A'].weeks[0]
+        self.assertEqual(_week.get_time_for_day(1, 0), 1)
+        self.assertEqual(_week.get_time_for_day(1, 2), 0.5)
+        self.assertEqual(_week.time_tracked, [2, 1.5])
+
+    def test_added_and_removed_tasks(self):
+        self.theirs.create_new_task('D')
+        self.theirs.tasks['D'].add_subtask('Build')
+        self.set_time(self.theirs, 'D', 0, 1)
+        self.theirs.remove_task(self.theirs.tasks['C'])
+        self.theirs.save()
+        self.ours.save()
+
+        merged = self.reload()
+        self.assertNotIn('C', merged.tasks)
+        self.assertEqual(self.get_time(merged, 'D'), {'Build': 1})
+        self.assertEqual(self.ours.task_order, ['A', 'B', 'D'])
+
+    def test_task_removed_elsewhere_is_kept_if_we_changed_it(self):
+        self.set_time(self.ours, 'C', 0, 1)
+        self.theirs.remove_task(self.theirs.tasks['C'])
+        self.theirs.save()
+        self.ours.save()
+        self.assertEqual(self.get_time(self.reload(), 'C')['Design'], 1)
+
+    def test_subtasks_added_by_both_are_matched_by_name(self):
+        self.ours.tasks['A'].add_subtask('Test')
+        self.set_time(self.ours, 'A', 2, 1)
+        self.theirs.tasks['A'].add_subtask('Release')
+        self.set_time(self.theirs, 'A', 2, 9)
+        self.theirs.save()
+        self.ours.save()
+
+        self.assertEqual(self.get_time(self.reload(), 'A'), {'Design': 2, 'Build': 0, 'Test': 1, 'Release': 9})
+
+    def test_merge_is_not_undone(self):
+        self.set_time(self.theirs, 'B', 0, 4)
+        self.theirs.save()
+        self.ours.save()
+        self.assertFalse(self.ours.undo())
+        self.assertEqual(self.get_time(self.ours, 'B')['Design'], 4)
+
+    def test_our_steps_are_not_undone_over_a_merge(self):
+        self.ours.tasks['A'].add_subtask('Test')
+        self.ours.update()
+        self.theirs.tasks['A'].add_subtask('Release')
+        self.theirs.update()
+        self.theirs.save()
+        self.ours.save()
+        self.assertFalse(self.ours.undo())
+        self.assertEqual([_subtask.name for _subtask in self.ours.tasks['A'].subtasks],
+                         ['Design', 'Build', 'Test', 'Release'])
+
+    def test_the_same_change_on_both_sides_is_kept_once(self):
+        self.set_time(self.ours, 'A', 1, 5)
+        self.set_time(self.theirs, 'A', 1, 5)
+        self.theirs.save()
+        self.ours.save()
+        self.assertEqual(self.get_time(self.reload(), 'A')['Build'], 5)
+
+
+class DataStoreMergeTest(MergeTests, unittest.TestCase):
+    datastore_class = datastore.DataStore
+
+
+class JournalDataStoreMergeTest(MergeTests, unittest.TestCase):
+    datastore_class = journal_datastore.JournalDataStore
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import export
+import migrate
+
+
+class MigrateTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 't.trk')
+
+        # Saved twice, so the second save is journalled rather than in the .trk file itself.
+        tracker = export.open_tracker(self.filename)
+        tracker.add_week()
+        tracker.create_new_task('A')
+        tracker.tasks['A'].add_subtask('Build')
+        tracker.save()
+        tracker.tasks['A'].weeks[0].set_time_in_entry(0, 5.0)
+        tracker.update()
+        tracker.save()
+        self.assertTrue(os.path.exists(self.filename + '.journal'))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def assert_migrated(self, destination):
+        tracker = export.open_tracker(destination)
+        self.assertEqual(tracker.tasks['A'].weeks[0].time_tracked, [5.0])
+        self.assertEqual(tracker.get_week_total(0), 5.0)
+        if hasattr(tracker.datastore, 'close'):
+            tracker.datastore.close()
+
+    def test_journalled_changes_are_migrated(self):
+        for extension in ('trkb', 'db', 'trk'):
+            destination = os.path.join(self.folder, 'out.' + extension)
+            migrate.migrate(self.filename, destination)
+            self.assert_migrated(destination)
+
+    def test_old_journal_of_destination_is_not_replayed(self):
+        destination = os.path.join(self.folder, 'out.trk')
+        with open(destination + '.journal', 'w') as journal_file:
+            journal_file.write('{"op":"delete","name":"A"}\n')
+        migrate.migrate(self.filename, destination)
+        self.assert_migrated(destination)
+
+
+if __name__ == '__main__':
+    unittest.main()
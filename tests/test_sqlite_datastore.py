@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import sqlite_datastore
+import tracker
+
+
+class SqliteDataStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 't.db')
+        self.datastore = sqlite_datastore.SqliteDataStore(self.filename)
+        self.tracker = tracker.Tracker(self.datastore)
+        self.tracker.add_week()
+        for task_name in ('A', 'B', 'C'):
+            self.tracker.create_new_task(task_name)
+            self.tracker.tasks[task_name].add_subtask('Build')
+        self.tracker.tasks['B'].weeks[0].set_time_in_entry(0, 2.5)
+        self.tracker.update()
+        self.tracker.save()
+
+    def tearDown(self):
+        self.datastore.close()
+        shutil.rmtree(self.folder)
+
+    def reload(self):
+        self.datastore.close()
+        self.datastore = sqlite_datastore.SqliteDataStore(self.filename)
+        return tracker.Tracker(self.datastore)
+
+    def test_round_trip(self):
+        reloaded = self.reload()
+        self.assertEqual(reloaded.task_order, ['A', 'B', 'C'])
+        self.assertEqual(reloaded.tasks['B'].weeks[0].time_tracked, [2.5])
+        self.assertEqual(reloaded.get_week_total(0), 2.5)
+
+    def test_only_changed_positions_are_written(self):
+        connection = self.datastore.connection
+        with connection:
+            changes = connection.total_changes
+            self.datastore.save_task_order(['A', 'C', 'B'])
+            self.assertEqual(connection.total_changes - changes, 2)
+
+            changes = connection.total_changes
+            self.datastore.save_task_order(['A', 'C', 'B'])
+            self.assertEqual(connection.total_changes - changes, 0)
+
+    def test_task_order_after_rename_and_removal(self):
+        self.tracker.rename_task(self.tracker.tasks['A'], 'D')
+        self.tracker.remove_task(self.tracker.tasks['B'])
+        self.tracker.task_order[:] = ['C', 'D']
+        self.tracker.update()
+        self.tracker.save()
+        self.assertEqual(self.reload().task_order, ['C', 'D'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+from StringIO import StringIO
+
+import streaming_json
+
+
+RAW_DATA = {'task_order': [u'Caf\xe9', 'Release "2"'],
+            'first_date': '2016-09-12',
+            'archived_week_index': 12345,
+            'tasks': {u'Caf\xe9': {'first_week_id': 3,
+                                   'archived': False,
+                                   'subtasks': {'Design': {'estimate': 12.25}, u'☃ Build': {'estimate': 0}},
+                                   'weeks': [[1.5, 0], [0.125, 1e-05], []],
+                                   'days': {'1': [[0, 2, 0.125]]}},
+                      'Release "2"': {'first_week_id': 0,
+                                      'archived': True,
+                                      'subtasks': {'Back\\slash\nnewline': {'estimate': 100}},
+                                      'weeks': [[-0.0], [123456.789]]},
+                      'Empty': {}}}
+
+
+class StreamingJsonTest(unittest.TestCase):
+    def test_values_split_across_chunks(self):
+        text = json.dumps(RAW_DATA)
+        expected = json.loads(text)
+        for chunk_size in (1, 2, 3, 5, 7, 64):
+            self.assertEqual(streaming_json.load(StringIO(text), chunk_size), expected)
+
+    def test_whitespace_split_across_chunks(self):
+        text = json.dumps(RAW_DATA, indent=4)
+        self.assertEqual(streaming_json.load(StringIO(text), 3), json.loads(text))
+
+    def test_dump(self):
+        output = StringIO()
+        streaming_json.dump(RAW_DATA, output)
+        self.assertEqual(json.loads(output.getvalue()), json.loads(json.dumps(RAW_DATA)))
+
+    def test_subtasks_keep_their_order(self):
+        text = '{"tasks": {"A": {"subtasks": {"Z": {}, "A": {}, "M": {}}}}}'
+        raw_data = streaming_json.load(StringIO(text), 4)
+        self.assertEqual(list(raw_data['tasks']['A']['subtasks']), ['Z', 'A', 'M'])
+
+    def test_truncated_file(self):
+        text = json.dumps(RAW_DATA)
+        for length in (len(text) - 1, len(text) // 2):
+            with self.assertRaises(ValueError):
+                streaming_json.load(StringIO(text[:length]), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import datastore
+import importer
+import tracker
+
+
+class SummaryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 't.trk')
+        _tracker = tracker.Tracker(datastore.DataStore(self.filename))
+        _tracker.add_week()
+        _tracker.create_new_task('A')
+        _tracker.tasks['A'].add_subtask('Build')
+        _tracker.tasks['A'].weeks[0].set_time_in_entry(0, 2)
+        _tracker.update()
+        _tracker.save()
+        self.tracker = tracker.Tracker(datastore.DataStore(self.filename))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def get_total(self):
+        return self.tracker.summaries.get_week_summary(0)['total']
+
+    def test_cached_until_changed(self):
+        summary = self.tracker.summaries.get_week_summary(0)
+        self.assertIs(self.tracker.summaries.get_week_summary(0), summary)
+        self.tracker.tasks['A'].weeks[0].set_time_in_entry(0, 3)
+        self.tracker.update()
+        self.assertEqual(self.get_total(), 3)
+
+    def test_renamed_subtask(self):
+        self.tracker.create_weekly_summary(0)
+        _task = self.tracker.tasks['A']
+        _task.rename_subtask(_task.subtasks[0], 'Test')
+        self.assertIn('Test', self.tracker.create_weekly_summary(0))
+
+    def test_invalidated_by_merge(self):
+        self.assertEqual(self.get_total(), 2)
+        theirs = tracker.Tracker(datastore.DataStore(self.filename))
+        theirs.tasks['A'].weeks[0].set_time_in_entry(0, 5)
+        theirs.update()
+        theirs.save()
+        self.tracker.save()
+        self.assertEqual(self.get_total(), 5)
+
+    def test_invalidated_by_import(self):
+        self.assertEqual(self.get_total(), 2)
+        _importer = importer.Importer(self.tracker)
+        _importer.add_row('A', 'Build', 0, 1)
+        _importer.add_row('B', 'Build', 0, 4)
+        _importer.finish()
+        summary = self.tracker.summaries.get_week_summary(0)
+        self.assertEqual(summary['total'], 7)
+        self.assertEqual([task_summary['name'] for task_summary in summary['tasks']], ['A', 'B'])
+
+
+if __name__ == '__main__':
+    unittest.main()
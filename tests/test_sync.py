@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import datastore
+import sync_client
+import sync_server
+import task_proxy
+import tracker
+
+
+class SyncTest(unittest.TestCase):
+    def setUp(self):
+        self.server = sync_server.SyncServer(('127.0.0.1', 0))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+        self.alice = self.create_client('alice')
+        self.bob = self.create_client('bob')
+        _tracker = self.alice.tracker
+        _tracker.create_new_task('A')
+        _tracker.tasks['A'].add_subtask('Build')
+        _tracker.tasks['A'].weeks[0].set_time_in_entry(0, 2)
+        _tracker.update()
+
+    def tearDown(self):
+        self.alice.close()
+        self.bob.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def create_client(self, user):
+        # Not saved, so the datastore's file is never created.
+        _tracker = tracker.Tracker(datastore.DataStore('unused.trk'))
+        _tracker.add_week()
+        return sync_client.SyncClient(_tracker, user, self.server.url)
+
+    def get_team_total(self, client, task_name):
+        return sum(client.get_team_week_totals(task_name).itervalues())
+
+    def test_push_and_pull(self):
+        self.assertEqual(self.alice.push(), 1)
+        self.assertEqual(self.alice.push(), 0)
+        self.bob.sync()
+        self.assertEqual([_subtask.name for _subtask in self.bob.tracker.tasks['A'].subtasks], ['Build'])
+        self.assertEqual(self.bob.get_team_week_totals('A'), {0: 2})
+
+    def test_rename_moves_time_to_the_new_name(self):
+        self.alice.sync()
+        self.alice.tracker.rename_task(self.alice.tracker.tasks['A'], 'B')
+        self.alice.tracker.update()
+        self.alice.sync()
+        self.bob.sync()
+        self.assertEqual(self.get_team_total(self.bob, 'A'), 0)
+        self.assertEqual(self.get_team_total(self.bob, 'B'), 2)
+        self.assertNotIn('A', self.alice.synced)
+
+    def test_removal_clears_time(self):
+        self.alice.sync()
+        self.alice.tracker.remove_task(self.alice.tracker.tasks['A'])
+        self.alice.sync()
+        self.bob.sync()
+        self.assertEqual(self.get_team_total(self.bob, 'A'), 0)
+        self.assertEqual(self.alice.push(), 0)
+
+    def test_archived_tasks_are_pushed_without_being_created(self):
+        folder = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(folder, 't.trk')
+            self.alice.tracker.datastore.filename = filename
+            self.alice.tracker.tasks['A'].archived = True
+            self.alice.tracker.update()
+            self.alice.tracker.save()
+
+            client = sync_client.SyncClient(tracker.Tracker(datastore.DataStore(filename)), 'carol', self.server.url)
+            try:
+                self.assertEqual(client.push(), 1)
+                self.assertIsInstance(client.tracker.tasks['A'], task_proxy.TaskProxy)
+                self.assertIsNone(client.tracker.tasks['A'].task)
+            finally:
+                client.close()
+        finally:
+            shutil.rmtree(folder)
+        self.bob.sync()
+        self.assertEqual(self.bob.team_time[('carol', 'A', 'Build', 0)], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
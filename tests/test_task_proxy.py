@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import datastore
+import task_proxy
+import tracker
+
+
+class TaskProxyTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 't.trk')
+        _tracker = tracker.Tracker(datastore.DataStore(self.filename))
+        _tracker.add_week()
+        _tracker.add_week()
+        for task_name in ('A', 'B'):
+            _tracker.create_new_task(task_name)
+            _tracker.tasks[task_name].add_subtask('Build')
+            _tracker.tasks[task_name].weeks[0].set_time_in_entry(0, 2)
+        _tracker.tasks['A'].archived = True
+        _tracker.update()
+        _tracker.save()
+
+        self.tracker = tracker.Tracker(datastore.DataStore(self.filename))
+        self.proxy = self.tracker.tasks['A']
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_archived_tasks_are_proxies_until_used(self):
+        self.assertIsInstance(self.proxy, task_proxy.TaskProxy)
+        self.assertNotIsInstance(self.tracker.tasks['B'], task_proxy.TaskProxy)
+        self.assertTrue(self.proxy.archived)
+        self.assertFalse(self.proxy.is_dirty)
+        self.assertEqual(self.proxy.get_week_totals(), {1: 2})
+        self.assertEqual(self.proxy.get_time_for_week(1), 2)
+        self.assertEqual(self.tracker.week_totals, [0, 4])
+        self.assertEqual(str(self.proxy), 'A')
+        self.assertIsNone(self.proxy.task)
+
+    def test_materialize(self):
+        self.assertEqual([_subtask.name for _subtask in self.proxy.subtasks], ['Build'])
+        _task = self.proxy.task
+        self.assertIsNotNone(_task)
+        self.assertIs(self.tracker.tasks['A'], _task)
+        self.assertIs(_task.tracker, self.tracker)
+        self.assertEqual(self.tracker.week_totals, [0, 4])
+
+        # References to the proxy carry on working.
+        self.proxy.weeks[0].set_time_in_entry(0, 3)
+        self.assertEqual(_task.get_time_for_week(1), 3)
+        self.assertEqual(self.tracker.week_totals, [0, 5])
+
+    def test_setattr(self):
+        self.proxy.archive_after_update = True
+        self.assertIsNone(self.proxy.task)
+        self.proxy.archived = False
+        self.assertIsNotNone(self.proxy.task)
+        self.assertFalse(self.tracker.tasks['A'].archived)
+        self.assertTrue(self.tracker.tasks['A'].archive_after_update)
+
+    def test_reload_week_totals(self):
+        raw_task = dict(self.tracker.datastore.raw_data['tasks']['A'])
+        raw_task['weeks'] = [[1], [0.5]]
+        raw_task['first_week_id'] = 0
+        self.tracker.datastore.raw_data['tasks']['A'] = raw_task
+
+        self.proxy.reload_week_totals()
+        self.assertIsNone(self.proxy.task)
+        self.assertEqual(self.proxy.get_week_totals(), {0: 1, 1: 0.5})
+        self.assertEqual(self.tracker.week_totals, [1, 2.5])
+        self.assertEqual(self.tracker.get_week_task_count(0), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import logging
+import unittest
+
+import weekslot
+
+
+class DailyBreakdownTest(unittest.TestCase):
+    def test_set_get_and_clear(self):
+        days = weekslot.DailyBreakdown()
+        self.assertEqual(days.set(2, 4, 1.5), 0)
+        self.assertEqual(days.set(0, 6, 0.5), 0)
+        self.assertEqual(days.set(2, 0, 0.25), 0)
+        self.assertEqual(len(days), 3)
+        self.assertEqual(days.get(2, 4), 1.5)
+        self.assertEqual(days.get(2, 5), 0)
+        self.assertEqual(days.get(1, 0), 0)
+        self.assertEqual(days.entries(), [[0, 6, 0.5], [2, 0, 0.25], [2, 4, 1.5]])
+
+        self.assertEqual(days.set(2, 4, 2), 1.5)
+        self.assertEqual(days.get(2, 4), 2)
+        self.assertEqual(days.set(2, 4, 0), 2)
+        self.assertEqual(days.set(2, 4, 0), 0)
+        self.assertEqual(days.entries(), [[0, 6, 0.5], [2, 0, 0.25]])
+
+    def test_only_days_with_time_are_stored(self):
+        days = weekslot.DailyBreakdown([[1, 3, 2], [0, 1, 0], [0, 2, 1]])
+        self.assertEqual(len(days), 2)
+        self.assertEqual(days.entries(), [[0, 2, 1], [1, 3, 2]])
+
+
+class WeekSlotDaysTest(unittest.TestCase):
+    def setUp(self):
+        self.week = weekslot.WeekSlot(0, [0, 0])
+
+    def test_days_add_to_the_week(self):
+        self.week.set_time_in_entry(1, 1)
+        self.week.set_time_for_day(1, 2, 0.5)
+        self.week.set_time_for_day(1, 3, 0.25)
+        self.assertEqual(self.week.time_tracked, [0, 1.75])
+        self.assertEqual(self.week.get_time_for_day(1, 2), 0.5)
+        self.assertEqual(self.week.get_daily_values(), [[1, 2, 0.5], [1, 3, 0.25]])
+
+        self.week.set_time_for_day(1, 2, 0)
+        self.week.set_time_for_day(1, 3, 0)
+        self.assertEqual(self.week.time_tracked, [0, 1])
+        self.assertIsNone(self.week.days)
+        self.assertEqual(self.week.get_daily_values(), [])
+
+    def test_entries_out_of_range(self):
+        logging.disable(logging.ERROR)
+        try:
+            self.week.set_time_for_day(0, weekslot.DAYS_PER_WEEK, 1)
+            self.week.set_time_for_day(2, 0, 1)
+        finally:
+            logging.disable(logging.NOTSET)
+        self.assertIsNone(self.week.days)
+        self.assertEqual(self.week.time_tracked, [0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
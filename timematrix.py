@@ -0,0 +1,246 @@
+import logging
+
+"""
+Storage for the time tracked against a task: a 2-D matrix of weeks (rows) by subtasks (columns).
+Weeks that pre-date a subtask are padded with zeros, so every row can be summed the same way.
+
+NumpyTimeMatrix is used when NumPy is installed, so that totals are vectorized reductions.
+Otherwise ListTimeMatrix provides the same interface in pure Python.
+NumPy is only imported when the first matrix is created, to keep importing the tracker fast.
+"""
+
+# Set to False to always use the pure Python matrix. None means use NumPy if it can be imported.
+USE_NUMPY = None
+numpy = None
+
+
+def use_numpy():
+    """
+    Whether time matrices are backed by NumPy. Imports NumPy the first time it is called.
+    :return bool:
+    """
+    global USE_NUMPY, numpy
+    if USE_NUMPY is None:
+        try:
+            import numpy
+            USE_NUMPY = True
+        except ImportError:
+            logging.debug("NumPy is not installed, using pure Python time matrices.")
+            USE_NUMPY = False
+    return USE_NUMPY
+
+
+def create_time_matrix():
+    """
+    Creates an empty time matrix, backed by NumPy if it is available.
+    :return NumpyTimeMatrix|ListTimeMatrix:
+    """
+    if use_numpy():
+        return NumpyTimeMatrix()
+    return ListTimeMatrix()
+
+
+class ListTimeMatrix(object):
+    """
+    Pure Python time matrix. Rows are lists that are only as long as the highest column that has been set in them;
+    anything beyond the end of a row is zero.
+    """
+    def __init__(self):
+        self.data = []  # [[<time tracked>, ...]]
+        self.columns = 0
+
+    @property
+    def rows(self):
+        return len(self.data)
+
+    def add_row(self):
+        """
+        Adds a row of zeros.
+        :return int: Index of the new row.
+        """
+        self.data.append([])
+        return len(self.data) - 1
+
+    def remove_last_row(self):
+        self.data.pop()
+
+    def get(self, row, column):
+        values = self.data[row]
+        if column < len(values):
+            return values[column]
+        return 0
+
+    def set(self, row, column, value):
+        values = self.data[row]
+        if column >= len(values):
+            values.extend([0] * (column + 1 - len(values)))
+        values[column] = value
+        self.columns = max(self.columns, column + 1)
+
+    def set_row(self, row, values):
+        """
+        Overwrites the first values of a row.
+        :param int row: Row index.
+        :param list values: List of floats.
+        """
+        self.data[row][:len(values)] = values
+        self.columns = max(self.columns, len(values))
+
+    def row_values(self, row, width):
+        """
+        Gets the first values of a row.
+        :param int row: Row index.
+        :param int width: Number of values to get.
+        :return list: List of floats.
+        """
+        values = self.data[row][:width]
+        if len(values) < width:
+            values.extend([0] * (width - len(values)))
+        return values
+
+    def row_sum(self, row):
+        return sum(self.data[row])
+
+    def row_sums(self):
+        """
+        Sums each row over all columns.
+        :return list: List of floats, one per row.
+        """
+        return [sum(values) for values in self.data]
+
+    def column_sum(self, column):
+        count = 0
+        for values in self.data:
+            if column < len(values):
+                count += values[column]
+        return count
+
+    def column_sums(self, columns):
+        """
+        Sums each column over all rows.
+        :param int columns: Number of columns to sum.
+        :return list: List of floats, one per column.
+        """
+        counter = [0] * columns
+        for values in self.data:
+            for column, value in enumerate(values[:columns]):
+                counter[column] += value
+        return counter
+
+    def total(self):
+        count = 0
+        for values in self.data:
+            count += sum(values)
+        return count
+
+
+class NumpyTimeMatrix(object):
+    """
+    Time matrix backed by a 2-D NumPy array of floats. The array is over-allocated and doubled in size when full,
+    so adding weeks and subtasks is amortized constant time.
+    """
+    INITIAL_ROWS = 16
+    INITIAL_COLUMNS = 4
+
+    def __init__(self):
+        self.data = numpy.zeros((self.INITIAL_ROWS, self.INITIAL_COLUMNS))
+        self.rows = 0
+        self.columns = 0
+
+    @property
+    def used(self):
+        """
+        View of the part of the array that is in use.
+        :return numpy.ndarray:
+        """
+        return self.data[:self.rows, :self.columns]
+
+    def _grow(self, rows, columns):
+        """
+        Reallocate the array so it can hold at least the given number of rows and columns.
+        """
+        new_rows, new_columns = self.data.shape
+        while new_rows < rows:
+            new_rows *= 2
+        while new_columns < columns:
+            new_columns *= 2
+
+        logging.debug("Growing time matrix to %d x %d" % (new_rows, new_columns))
+        data = numpy.zeros((new_rows, new_columns))
+        data[:self.data.shape[0], :self.data.shape[1]] = self.data
+        self.data = data
+
+    def add_row(self):
+        """
+        Adds a row of zeros.
+        :return int: Index of the new row.
+        """
+        if self.rows == self.data.shape[0]:
+            self._grow(self.rows + 1, self.columns)
+        self.rows += 1
+        return self.rows - 1
+
+    def remove_last_row(self):
+        # Cleared, so that the row starts as zeros if it is added again.
+        self.rows -= 1
+        self.data[self.rows] = 0
+
+    def get(self, row, column):
+        if column < self.columns:
+            return float(self.data[row, column])
+        return 0
+
+    def set(self, row, column, value):
+        if column >= self.data.shape[1]:
+            self._grow(self.rows, column + 1)
+        self.data[row, column] = value
+        self.columns = max(self.columns, column + 1)
+
+    def set_row(self, row, values):
+        """
+        Overwrites the first values of a row.
+        :param int row: Row index.
+        :param list values: List of floats.
+        """
+        if len(values) > self.data.shape[1]:
+            self._grow(self.rows, len(values))
+        self.data[row, :len(values)] = values
+        self.columns = max(self.columns, len(values))
+
+    def row_values(self, row, width):
+        """
+        Gets the first values of a row.
+        :param int row: Row index.
+        :param int width: Number of values to get.
+        :return list: List of floats.
+        """
+        if width > self.data.shape[1]:
+            return self.data[row].tolist() + [0.0] * (width - self.data.shape[1])
+        return self.data[row, :width].tolist()
+
+    def row_sum(self, row):
+        return float(self.data[row, :self.columns].sum())
+
+    def row_sums(self):
+        """
+        Sums each row over all columns.
+        :return list: List of floats, one per row.
+        """
+        return self.used.sum(axis=1).tolist()
+
+    def column_sum(self, column):
+        if column >= self.columns:
+            return 0
+        return float(self.data[:self.rows, column].sum())
+
+    def column_sums(self, columns):
+        """
+        Sums each column over all rows.
+        :param int columns: Number of columns to sum.
+        :return list: List of floats, one per column.
+        """
+        sums = self.used.sum(axis=0).tolist()[:columns]
+        return sums + [0.0] * (columns - len(sums))
+
+    def total(self):
+        return float(self.used.sum())
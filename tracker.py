@@ -1,31 +1,27 @@
-import Tkinter
 import datetime
 import logging
 
-from datastore import DataStore
+import background_loader
+import history
+import summary
 import task
-from display import tracker_display
-
-
-# logging.basicConfig(level=logging.DEBUG)
-
-save_folder = "C:\\Users\\mh3\\Documents\\Status reports\\"
-filename = "time_tracker.trk"
+import task_proxy
 
 
 class Tracker(object):
     """
+    Holds all of the tasks and weeks being tracked. Has no dependency on the display, so can be used headless;
+    call attach_display to show it in a Tkinter window.
     :type first_date: datetime.datetime
     :type _archived_week_index: int
     """
-    def __init__(self, tkinter_root, _datastore):
+    def __init__(self, _datastore):
         """
-        :param Tkinter.Tk tkinter_root: Root display object.
         :param datastore.DataStore _datastore: Datastore object.
         :return:
         """
-        self.parent = tkinter_root
         self.datastore = _datastore
+        self.tracker_display = None
 
         self.tasks = {}  # {task_name: task.Task}
         self.task_order = []  # [task_names]
@@ -34,9 +30,33 @@ class Tracker(object):
 
         self.week_index = 0
 
+        # Per-week totals across all tasks, kept up to date by the tasks as time is tracked.
+        self.week_totals = []  # [<time tracked>], by week index.
+        self.week_task_counts = []  # [<number of tasks with time tracked>], by week index.
+
+        # Incremented whenever anything changes, e.g. so autosave can tell whether there is anything to save.
+        self.change_count = 0
+
+        # Set while loading in the background; see load_in_background.
+        self.loader = None
+
+        # Changes that can be undone. Each call to update closes the changes made since into one undoable step.
+        self.history = history.CommandLog()
+
+        # Week summaries, cached until the tracker changes.
+        self.summaries = summary.SummaryEngine(self)
+
         self.load()
 
-        self.tracker_display = tracker_display.TrackerDisplay(self.parent, self)
+    def attach_display(self, tkinter_root):
+        """
+        Create a display for this tracker. The display package (and so Tkinter) is only imported when this is called.
+        :param Tkinter.Tk tkinter_root: Root display object.
+        :return display.tracker_display.TrackerDisplay: The new display.
+        """
+        from display import tracker_display
+        self.tracker_display = tracker_display.TrackerDisplay(tkinter_root, self)
+        return self.tracker_display
 
     @property
     def archived_week_index(self):
@@ -62,16 +82,47 @@ class Tracker(object):
 
         self.week_index = 0
 
+        self.week_totals = []
+        self.week_task_counts = []
+
+        self.history.clear()
+
     def _get_details_from_datastore(self):
         """
         Populate this tracker with details from the datastore.
+        Archived tasks are loaded as proxies, which only create the task when something needs more than its weekly
+        totals, so loading time and memory depend on the tasks in use rather than the whole history.
         """
         logging.debug("Tracker: Reading from datastore")
         self.first_date = self.datastore.first_date
         self._archived_week_index = self.datastore.archived_week_index
         for task_name in self.datastore.task_order:
-            _task = self.datastore.create_task(task_name)
-            self._handle_new_task(_task)
+            self._handle_new_task(self.create_stored_task(task_name))
+
+    def create_stored_task(self, task_name):
+        """
+        Create a task from the datastore, ready to be added to this tracker. Archived tasks are created as proxies.
+        Doesn't change this tracker, so can be run on a worker thread.
+        :param str task_name: Name of the stored task.
+        :return task.Task|task_proxy.TaskProxy: The new task.
+        """
+        if self.datastore.is_task_archived(task_name):
+            return task_proxy.TaskProxy(task_name, self.datastore)
+        return self.datastore.create_task(task_name)
+
+    def restore_details(self, highest_week_id, first_date, archived_week_index):
+        """
+        Set up the weeks and dates of a freshly reinitialised tracker from stored details, ready for tasks to be added.
+        :param int highest_week_id: Number of weeks stored.
+        :param datetime.datetime first_date: Date of the first week.
+        :param int archived_week_index: Index of the first week shown.
+        """
+        self.week_index = 0
+        for week_id in range(highest_week_id):
+            self.add_week(init_setup=True)
+
+        self.first_date = first_date
+        self._archived_week_index = archived_week_index
 
     def get_week_name(self, week_id):
         """
@@ -86,8 +137,11 @@ class Tracker(object):
     def create_new_task(self, task_name):
         """
         Create a new task. Will be created with a week slot for the latest week.
+        If loading in the background, waits for loading to finish first, so that a stored task with the same name isn't
+        turned away as a duplicate of the new one.
         :param str task_name: Name of the new task.
         """
+        self.finish_loading()
         # Create task with week slot for latest existing week.
         # That week has index self.week_index - 1
         if self.week_index == 0:
@@ -96,14 +150,28 @@ class Tracker(object):
 
         _task = task.Task(task_name, self.week_index - 1)
         self._handle_new_task(_task)
+        if self.tasks.get(task_name) is _task:
+            self.history.record(history.CreateTask(self, _task))
+
+    def remove_task(self, _task):
+        """
+        Remove a task from this tracker, e.g. when creating it is undone. Opposite of _handle_new_task.
+        :param task.Task _task: Task to remove.
+        """
+        for week_index, total in _task.get_week_totals().iteritems():
+            self.week_total_changed(week_index, total, 0)
+        del self.tasks[_task.task_name]
+        self.task_order.remove(_task.task_name)
+        _task.tracker = None
+        self.change_count += 1
 
     def get_task_and_index(self, task_name):
         return self.tasks[task_name], self.task_order.index(task_name)
 
     def get_archived_task_list(self):
         """
-        Gets a list of all tasks that are archived.
-        :return list[task.Task]: List of task objects that are archived.
+        Gets a list of all tasks that are archived. Tasks that haven't been used since loading are proxies.
+        :return list[task.Task|task_proxy.TaskProxy]: List of task objects that are archived.
         """
         archived_tasks = []
         for _task in self.tasks.itervalues():
@@ -131,6 +199,9 @@ class Tracker(object):
         """
         old_name = _task.task_name
         _task.task_name = new_name  # Set the new name
+        _task.mark_dirty()
+        self.change_count += 1
+        self.history.record(history.RenameTask(self, _task, old_name, new_name))
 
         # Change the name in the tasks dict
         del self.tasks[old_name]
@@ -149,6 +220,11 @@ class Tracker(object):
         if self.check_task_name_validity(name):
             self.task_order.append(name)
             self.tasks[name] = _task
+            self.change_count += 1
+
+            _task.tracker = self
+            for week_index, total in _task.get_week_totals().iteritems():
+                self.week_total_changed(week_index, 0, total)
         else:
             logging.debug("Task name already exists, aborting creation.")
 
@@ -162,23 +238,108 @@ class Tracker(object):
         """
         logging.debug("Tracker: adding week. init_setup: %s" % init_setup)
         if not init_setup:
-            for _task in self.tasks.itervalues():
+            # Archived tasks don't get the week, so only the rest need it removing if this is undone.
+            week_tasks = [_task for _task in self.tasks.itervalues() if not _task.archived]
+            for _task in week_tasks:
                 _task.add_week(self.week_index)
+            self.history.record(history.AddWeek(self, week_tasks))
 
         self.week_index += 1
+        self.change_count += 1
+        # The tasks' new weeks may already have extended the totals, via week_total_changed.
+        if len(self.week_totals) < self.week_index:
+            self.week_totals.append(0)
+            self.week_task_counts.append(0)
+
+    def remove_last_week(self, week_tasks):
+        """
+        Remove the most recent week, e.g. when adding it is undone. Opposite of add_week.
+        :param list[task.Task] week_tasks: Tasks that the week was added to.
+        """
+        logging.debug("Tracker: removing week %d" % (self.week_index - 1))
+        for _task in week_tasks:
+            _task.remove_last_week()
+
+        self.week_index -= 1
+        self.change_count += 1
+        del self.week_totals[self.week_index:]
+        del self.week_task_counts[self.week_index:]
+        if self._archived_week_index > self.week_index:
+            self._archived_week_index = self.week_index
+
+    def week_total_changed(self, week_index, old_total, new_total):
+        """
+        Called by a task when the time it has tracked in a week changes. Keeps the per-week totals up to date.
+        :param int week_index: Index of the week that has changed.
+        :param float old_total: Time the task had tracked in the week before the change.
+        :param float new_total: Time the task has tracked in the week after the change.
+        """
+        if week_index >= len(self.week_totals):
+            extra_weeks = week_index + 1 - len(self.week_totals)
+            self.week_totals.extend([0] * extra_weeks)
+            self.week_task_counts.extend([0] * extra_weeks)
+
+        self.week_totals[week_index] += new_total - old_total
+        self.change_count += 1
+        self.week_task_counts[week_index] += (new_total != 0) - (old_total != 0)
+
+    def get_week_total(self, week_index):
+        """
+        Gets the total time tracked across all tasks in a week.
+        :param int week_index: Index of the week.
+        :return float: Time tracked.
+        """
+        if 0 <= week_index < len(self.week_totals):
+            return self.week_totals[week_index]
+        return 0
+
+    def get_week_task_count(self, week_index):
+        """
+        Gets the number of tasks that have time tracked in a week.
+        :param int week_index: Index of the week.
+        :return int: Number of tasks.
+        """
+        if 0 <= week_index < len(self.week_task_counts):
+            return self.week_task_counts[week_index]
+        return 0
 
     def update(self):
         """
-        Complete redraw the display. Does not recreate the Tkinter root.
+        Bring the display (if there is one) up to date with this tracker. Only the widgets affected by changes are
+        redrawn. Call this after changing the tracker's tasks directly (e.g. subtask estimates), so the change is seen.
         :return:
         """
-        self.tracker_display.destroy()
-        self.tracker_display = tracker_display.TrackerDisplay(self.parent, self)
+        self.change_count += 1
+        self.history.commit()
+        if self.tracker_display is not None:
+            self.tracker_display.refresh()
+
+    def undo(self):
+        """
+        Undo the most recent change (or group of changes made between updates).
+        :return bool: Whether there was anything to undo.
+        """
+        if not self.history.undo():
+            return False
+        self.update()
+        return True
+
+    def redo(self):
+        """
+        Redo the most recently undone change.
+        :return bool: Whether there was anything to redo.
+        """
+        if not self.history.redo():
+            return False
+        self.update()
+        return True
 
     def save(self):
         """
         Triggers the associated datastore to save all data about this Tracker object.
+        If loading in the background, waits for loading to finish first, since the tasks not yet loaded would be lost.
         """
+        self.finish_loading()
         self.datastore.save_to_file(self)
 
     def load(self):
@@ -194,47 +355,41 @@ class Tracker(object):
 
         self._get_details_from_datastore()
 
+    def finish_loading(self):
+        """
+        If loading in the background, block until all of the stored tasks have been added. Must be called on the Tk
+        thread.
+        """
+        if self.loader is not None:
+            self.loader.finish()
+
+    def load_in_background(self, tkinter_root, on_progress=None):
+        """
+        Reload from the datastore's file on a worker thread, so the UI isn't held up. This tracker is emptied straight
+        away, and tasks are added to it in batches on the Tk thread as they are ready. self.loader is set until loading
+        has finished.
+        :param Tkinter.Tk tkinter_root: Root display object, used to schedule adding tasks on the Tk thread.
+        :param on_progress: Called after each batch; see background_loader.BackgroundLoader.
+        """
+        self._re_initialise()
+        self._archived_week_index = 0  # There are no weeks to show until the stored details are loaded.
+        self.loader = background_loader.BackgroundLoader(self, tkinter_root, on_progress)
+        self.loader.start()
+
     def create_weekly_summary(self, week_index):
         """
         Produces a formatted, human-readable summary of all tasks that had work done on them in a given week.
         :param int week_index: Index of the week to summarise.
         :return string: Formatted summary of any tasks that have had changes made in the given week.
         """
-        summary = ""
-        tasks_to_include = []
-
-        for _name, _task in self.tasks.iteritems():
-            time_spent = _task.get_time_for_week(week_index)
-            if time_spent > 0:
-                tasks_to_include.append(_task)
-
-        summary += "Week beginning: %s\n\n" % self.get_week_name(week_index)
-        for _task in tasks_to_include:
-            summary += _task.week_summary(week_index) + "\n\n"
-
-        return summary
-
-    def copy_week_summary_to_clipboard(self, week_index):
-        self.parent.clipboard_clear()
-        self.parent.clipboard_append(self.create_weekly_summary(week_index))
-
-
-
-
-root = Tkinter.Tk()
-root.wm_title("Time Tracker")
-root.resizable()
-
-
-datastore = DataStore(save_folder + filename)
-tracker = Tracker(root, datastore)
-
-
-def save_and_exit():
-    tracker.save()
-    exit()
-
-root.protocol("WM_DELETE_WINDOW", save_and_exit)
-root.mainloop()
-
+        return self.summaries.get_week_summary_text(week_index)
 
+    def create_range_summary(self, first_week_index, last_week_index):
+        """
+        Produces a formatted, human-readable summary of all tasks that had work done on them in a range of weeks, with
+        the time tracked in each week added together.
+        :param int first_week_index: Index of the first week to summarise.
+        :param int last_week_index: Index of the last week to summarise, inclusive.
+        :return string: Formatted summary of any tasks with time tracked in the weeks.
+        """
+        return self.summaries.get_range_summary_text(first_week_index, last_week_index)
@@ -1,20 +1,65 @@
+import array
+import bisect
 import logging
+import history
+import timematrix
+
+DAYS_PER_WEEK = 7
 
 
 class WeekSlot(object):
     """
     Object that stores the time tracked against each task and its subtasks in a given week.
+    The values are held in a row of the owning task's time matrix; this object is a view onto that row.
     """
-    def __init__(self, week_index, details):
+    def __init__(self, week_index, details, task=None, days=None):
         """
 
         :param int week_index: Index of week
         :param list details: Initial values to store. List of floats.
+        :param task.Task task: Task that owns this week. Told when this week changes.
+            If no task is given, the week has a time matrix of its own.
+        :param list days: Time tracked on individual days, as [[<subtask index>, <day>, <time tracked>], ...].
+            Already included in details.
         :return:
         """
         logging.debug("Creating week with index: %d\twith details: %s" % (week_index, details))
-        self.time_tracked = details
         self.index = week_index
+        self.task = task
+
+        if task is None:
+            self.time_matrix = timematrix.create_time_matrix()
+        else:
+            self.time_matrix = task.time_matrix
+        self.row = self.time_matrix.add_row()
+        # Number of subtasks that existed in this week. Cells beyond this are padding.
+        self.width = len(details)
+        self.time_matrix.set_row(self.row, details)
+
+        # Time tracked on individual days, if there is any. Most weeks are only tracked weekly, so have None.
+        # The values in the time matrix are the weekly totals, including the time tracked on each day.
+        self.days = DailyBreakdown(days) if days else None
+
+        # Whether this week has changed since it was last saved.
+        self.dirty = False
+        self.mark_dirty()
+
+    @property
+    def time_tracked(self):
+        """
+        Copy of the time tracked against each subtask this week.
+        :return list: List of floats.
+        """
+        return self.time_matrix.row_values(self.row, self.width)
+
+    def mark_dirty(self):
+        """
+        Flag this week as changed, so that it is written on the next save.
+        """
+        if not self.dirty:
+            self.dirty = True
+            if self.task is not None:
+                self.task.dirty_weeks.add(self)
 
     def add_subtask(self):
         """
@@ -22,7 +67,30 @@ class WeekSlot(object):
         :return:
         """
         logging.debug("Adding new blank subtask to a week with index %d" % self.index)
-        self.time_tracked.append(0)
+        self.width += 1
+        self.mark_dirty()
+
+    def widen(self, width):
+        """
+        Gives this week values for more subtasks, e.g. when importing time against a subtask from before it was added.
+        The new values are zero.
+        :param int width: Number of subtasks to have values for.
+        """
+        if width > self.width:
+            self.width = width
+            self.mark_dirty()
+
+    def remove_subtask(self):
+        """
+        Removes the last subtask, e.g. when adding it is undone. Its entry is cleared first, so totals stay correct.
+        :return:
+        """
+        logging.debug("Removing last subtask from a week with index %d" % self.index)
+        for day in range(DAYS_PER_WEEK):
+            self.set_time_for_day(self.width - 1, day, 0)
+        self.set_time_in_entry(self.width - 1, 0)
+        self.width -= 1
+        self.mark_dirty()
 
     def get_total_time_spent(self):
         """
@@ -30,11 +98,9 @@ class WeekSlot(object):
         in this week.
         :return float:
         """
-        count = 0
-        for value in self.time_tracked:
-            count += value
-
-        return count
+        if self.task is not None:
+            return self.task.row_totals[self.row]
+        return self.time_matrix.row_sum(self.row)
 
     def get_time_in_entry(self, index):
         """
@@ -44,12 +110,11 @@ class WeekSlot(object):
         :param int index: Index to get entered data from.
         :return:
         """
-        logging.debug("Getting time for week index %d in subtask slot %d" % (self.index, index))
-        if index > len(self.time_tracked) - 1:
+        if index >= self.width:
             # Return 0 for weeks that existed before this subtask was added.
             return 0
         else:
-            return self.time_tracked[index]
+            return self.time_matrix.get(self.row, index)
 
     def update_values(self, values):
         """
@@ -58,9 +123,141 @@ class WeekSlot(object):
         E.g. If len(values) is less than the number of stored values, the last stored values will remain unchanged.
         :param list values: List of floats to overwrite stored values with
         """
-        if len(values) > len(self.time_tracked):
+        if len(values) > self.width:
             logging.error("Too many values provided for week %d. Expected %d values, got %d" %
-                          (self.index, len(self.time_tracked), len(values)))
+                          (self.index, self.width, len(values)))
+            values = values[:self.width]
 
         for i, value in enumerate(values):
-            self.time_tracked[i] = value
+            self.set_time_in_entry(i, value)
+
+    def set_time_in_entry(self, index, value):
+        """
+        Sets the time in a specific tracking entry box. Opposite of get_time_in_entry.
+        :param int index: Index of the entry to set. Must be within this week's width.
+        :param float value: Time tracked.
+        """
+        old_value = self.write_entry(index, value)
+        if old_value != value and self.task is not None:
+            self.task.record_change(history.SetCell(self.task, self.index, index, old_value, value))
+
+    def write_entry(self, index, value):
+        """
+        Sets the time in a tracking entry box, keeping the totals up to date, without recording it in the history.
+        :param int index: Index of the entry to set.
+        :param float value: Time tracked.
+        :return float: Time tracked before.
+        """
+        old_value = self.time_matrix.get(self.row, index)
+        if old_value != value:
+            self.time_matrix.set(self.row, index, value)
+            if self.task is not None:
+                self.task.cell_changed(self, index, old_value, value)
+            self.mark_dirty()
+        return old_value
+
+    def get_time_for_day(self, index, day):
+        """
+        Gets the time tracked against an entry on a particular day of this week.
+        :param int index: Index of the entry, as for get_time_in_entry.
+        :param int day: Day of the week, from 0 (the first day of the week) to DAYS_PER_WEEK - 1.
+        :return float:
+        """
+        if self.days is None:
+            return 0
+        return self.days.get(index, day)
+
+    def set_time_for_day(self, index, day, value):
+        """
+        Sets the time tracked against an entry on a particular day of this week. The entry's weekly value changes by
+        the same amount, so it stays the total for the week. Time in the weekly value that isn't against any day (e.g.
+        from before days were tracked) is left as it is.
+        :param int index: Index of the entry, as for set_time_in_entry.
+        :param int day: Day of the week, from 0 (the first day of the week) to DAYS_PER_WEEK - 1.
+        :param float value: Time tracked.
+        """
+        if not 0 <= day < DAYS_PER_WEEK or index >= self.width:
+            logging.error("No entry %d on day %d of week %d" % (index, day, self.index))
+            return
+        if self.days is None:
+            if value == 0:
+                return
+            self.days = DailyBreakdown()
+
+        old_value = self.days.set(index, day, value)
+        if old_value == value:
+            return
+        if not self.days:
+            self.days = None
+
+        self.write_entry(index, self.time_matrix.get(self.row, index) + value - old_value)
+        if self.task is not None:
+            self.task.record_change(history.SetDay(self.task, self.index, index, day, old_value, value))
+
+    def get_daily_values(self):
+        """
+        Gets the time tracked on individual days, e.g. for storing.
+        :return list: [[<subtask index>, <day>, <time tracked>], ...], or an empty list if there is none.
+        """
+        if self.days is None:
+            return []
+        return self.days.entries()
+
+
+class DailyBreakdown(object):
+    """
+    Time tracked against each entry of a week on individual days. Only days with time tracked are stored, as two
+    compact arrays sorted by entry then day, so a week costs 10 bytes per day tracked rather than a value for every
+    day of every entry.
+    """
+    __slots__ = ('keys', 'values')
+
+    def __init__(self, entries=()):
+        """
+        :param entries: [[<subtask index>, <day>, <time tracked>], ...], in any order.
+        """
+        self.keys = array.array('H')  # <subtask index> * DAYS_PER_WEEK + <day>
+        self.values = array.array('d')
+        for index, day, value in sorted(entries):
+            if value:
+                self.keys.append(index * DAYS_PER_WEEK + day)
+                self.values.append(value)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, index, day):
+        key = index * DAYS_PER_WEEK + day
+        position = bisect.bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return self.values[position]
+        return 0
+
+    def set(self, index, day, value):
+        """
+        :param int index: Index of the entry.
+        :param int day: Day of the week.
+        :param float value: Time tracked. Zero removes the day.
+        :return float: Time tracked before.
+        """
+        key = index * DAYS_PER_WEEK + day
+        position = bisect.bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            old_value = self.values[position]
+            if value:
+                self.values[position] = value
+            else:
+                del self.keys[position]
+                del self.values[position]
+            return old_value
+
+        if value:
+            self.keys.insert(position, key)
+            self.values.insert(position, value)
+        return 0
+
+    def entries(self):
+        """
+        :return list: [[<subtask index>, <day>, <time tracked>], ...], sorted by entry then day.
+        """
+        return [[key // DAYS_PER_WEEK, key % DAYS_PER_WEEK, value] for key, value in zip(self.keys, self.values)]